@@ -3,12 +3,26 @@ import streamlit as st
 
 dotenv.load_dotenv()
 
+from repository.file_gc import start_background_gc  # noqa: E402  (reads settings from .env)
+
+
+@st.cache_resource
+def file_gc():
+    """Start the file garbage collector once per server process."""
+    return start_background_gc()
+
+
+file_gc()
+
 pages = {
     "Main": [
         st.Page("pages/upload.py", title="Upload", icon="📃"),
         st.Page("pages/view_receipts.py", title="View Receipts", icon="📚"),
         st.Page("pages/products.py", title="All Products", icon="🛍️"),
+        st.Page("pages/search.py", title="Search", icon="🔎"),
         st.Page("pages/statistik.py", title="Statistics", icon="📊"),
+        st.Page("pages/uva.py", title="UVA", icon="🧾"),
+        st.Page("pages/audit.py", title="Audit", icon="🔍"),
         st.Page("pages/kalkül.py", title="Import Kalkül ZIP", icon="📦"),
         st.Page("pages/biokontrolle.py", title="Biokontrolle", icon="🌱"),
         st.Page("pages/kaeseinnahmen.py", title="Käseinnahmen", icon="🧀"),
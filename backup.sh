@@ -20,6 +20,10 @@ mkdir -p "$BACKUP_DIR"
 TIMESTAMP=$(date +"%Y-%m-%d_%H-%M-%S")
 BACKUP_FILE="$BACKUP_DIR/backup_$TIMESTAMP.tar.gz"
 
+# Move the WAL into the database file, so receipts.db alone is a complete copy
+python3 -c "import sqlite3; sqlite3.connect('$DB_FILE').execute('PRAGMA wal_checkpoint(TRUNCATE)')" \
+    || echo "WAL checkpoint failed, backup may miss the latest changes"
+
 # Compute new checksum
 NEW_CHECKSUM=$(tar cf - "$DB_FILE" "$IMG_DIR" | sha256sum | awk '{print $1}')
 
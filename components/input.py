@@ -1,6 +1,8 @@
 import json
 import streamlit as st
-from receipt_parser.taxation import DEFAULT_RATES, _round, build_receipt_tax_summary
+from receipt_parser.dates import parse_receipt_date
+from receipt_parser.money import Money
+from receipt_parser.taxation import DEFAULT_RATES, build_receipt_tax_summary
 from receipt_parser.llm import extract_tax_summary
 
 from models.product import BioCategory, ProductUnit
@@ -29,6 +31,8 @@ def get_receipt_inputs(receipt: ReceiptDB, receipt_id: int = 0, expand_tax: bool
     receipt_date = st.text_input(
         "Receipt Date", value=receipt.date, key=f"date_{receipt_id}"
     )
+    if receipt_date and parse_receipt_date(receipt_date) is None:
+        st.warning("Date not recognised (e.g. 14.03.2025); the receipt will be missing from date filters and the UVA.")
     total_gross_amount = st.text_input(
         "Total Gross Amount",
         value=str(receipt.total_gross_amount),
@@ -114,13 +118,9 @@ def get_receipt_inputs(receipt: ReceiptDB, receipt_id: int = 0, expand_tax: bool
                     step=0.01,
                     key=key,
                 )
-                if tax_val:
-                    net = _round(tax_val * 100.0 / rate)
-                    gross = _round(net + tax_val)
-                else:
-                    net = 0.0
-                    gross = 0.0
-                tax_summary_data[str(rate)] = {"net_sum": net, "tax_sum": _round(tax_val), "gross_sum": gross}
+                tax = Money.of(tax_val)
+                net = tax.net_from_tax(rate)
+                tax_summary_data[str(rate)] = {"net_sum": net.euros, "tax_sum": tax.euros, "gross_sum": (net + tax).euros}
 
             nonzero_rates = [r for r in DEFAULT_RATES if tax_summary_data[str(r)]["tax_sum"] != 0.0]
             has_mixed_taxes = len(nonzero_rates) > 1
@@ -0,0 +1,22 @@
+import streamlit as st
+
+from repository.price_history import PriceHistoryIndex, PriceOutlier
+
+
+@st.cache_resource
+def _price_history_index() -> PriceHistoryIndex:
+    return PriceHistoryIndex()
+
+
+def get_price_history() -> PriceHistoryIndex:
+    """Shared price history index, brought up to date with the products table on every call."""
+    index = _price_history_index()
+    index.refresh()
+    return index
+
+
+def price_outlier_message(outlier: PriceOutlier) -> str:
+    return (
+        f"Unusual price: {outlier.price:.2f} € is {outlier.ratio:.1f}x the typical "
+        f"{outlier.typical_price:.2f} € ({outlier.history_count} earlier purchases)"
+    )
@@ -35,7 +35,7 @@ def get_unclassified_products(
     regex_id: Optional[str] = None,
 ) -> list[ProductDB]:
     """
-    Get all unclassified products (product_class_reference IS NULL) 
+    Get all unclassified products (product_class_pk IS NULL) 
     that belong to käseinnahmen receipts (is_credit=TRUE).
     Optionally filter by regex pattern if regex_id is provided.
     
@@ -48,9 +48,9 @@ def get_unclassified_products(
     with SessionLocal() as session:
         unclassified = (
             session.query(ProductDB)
-            .join(ReceiptDB, ProductDB.receipt_id == ReceiptDB.id)
+            .join(ReceiptDB, ProductDB.receipt_pk == ReceiptDB.pk)
             .filter(
-                ProductDB.product_class_reference.is_(None),
+                ProductDB.product_class_pk.is_(None),
                 ReceiptDB.is_credit == True,
             )
             .all()
@@ -65,14 +65,14 @@ def get_unclassified_products(
 
 
 def assign_product_class(
-    product_ids: list[str], product_class_id: str
+    product_pks: list[int], product_class_pk: int
 ) -> int:
     """
     Assign a product class to multiple products.
     
     Args:
-        product_ids: List of ProductDB IDs to update
-        product_class_id: SortimentDB ID to assign
+        product_pks: List of ProductDB pks to update
+        product_class_pk: SortimentDB pk to assign
         
     Returns:
         Number of products updated
@@ -80,8 +80,8 @@ def assign_product_class(
     with SessionLocal() as session:
         updated = (
             session.query(ProductDB)
-            .filter(ProductDB.id.in_(product_ids))
-            .update({ProductDB.product_class_reference: product_class_id})
+            .filter(ProductDB.pk.in_(product_pks))
+            .update({ProductDB.product_class_pk: product_class_pk})
         )
         session.commit()
         return updated
@@ -118,10 +118,10 @@ def get_product_class_aggregation(
     receipts_df: pd.DataFrame,
 ) -> pd.DataFrame:
     """
-    Aggregate product data by product_class_reference.
+    Aggregate product data by product_class_pk.
     
     Args:
-        products: List of ProductDB objects with product_class_reference
+        products: List of ProductDB objects with product_class_pk
         receipts_df: DataFrame with receipt metadata (indexed by receipt_id)
         
     Returns:
@@ -133,12 +133,12 @@ def get_product_class_aggregation(
     # Convert to DataFrame
     data = []
     for product in products:
-        if product.product_class_reference:
+        if product.product_class_pk:
             data.append({
-                "product_class_id": product.product_class_reference,
+                "product_class_pk": product.product_class_pk,
                 "amount": product.amount or 0,
                 "price": product.price or 0,
-                "receipt_id": product.receipt_id,
+                "receipt_pk": product.receipt_pk,
                 "product_name": product.name,
             })
     
@@ -150,15 +150,15 @@ def get_product_class_aggregation(
     # Get sortiment names
     with SessionLocal() as session:
         sortiments = session.query(SortimentDB).all()
-        sortiment_map = {s.id: s.name for s in sortiments}
+        sortiment_map = {s.pk: s.name for s in sortiments}
     
-    df["product_class"] = df["product_class_id"].map(sortiment_map)
+    df["product_class"] = df["product_class_pk"].map(sortiment_map)
     
     # Aggregate by product class
     agg_df = df.groupby("product_class").agg({
         "amount": "sum",
         "price": "sum",
-        "receipt_id": "count",
+        "receipt_pk": "count",
     }).reset_index()
     agg_df.columns = ["Product Class", "Total Amount", "Total Price", "Count"]
     
@@ -187,7 +187,7 @@ def get_product_aggregation_by_name(
             "amount": product.amount or 0,
             "unit": product.unit.value if product.unit else "Unknown",
             "price": product.price or 0,
-            "receipt_id": product.receipt_id,
+            "receipt_pk": product.receipt_pk,
         })
     
     df = pd.DataFrame(data)
@@ -198,7 +198,7 @@ def get_product_aggregation_by_name(
         .agg({
             "amount": "sum",
             "price": "sum",
-            "receipt_id": "count",
+            "receipt_pk": "count",
         })
         .reset_index()
     )
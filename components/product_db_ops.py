@@ -1,18 +1,19 @@
 from sqlalchemy import func
 
-from repository.receipt_repository import ProductDB, SessionLocal
+from repository.receipt_repository import ProductDB, ReceiptDB, SessionLocal
 
 
-def get_products_for_receipt(receipt_id):
+def get_products_for_receipt(receipt_pk: int):
     with SessionLocal() as session:
-        return session.query(ProductDB).filter(ProductDB.receipt_id == receipt_id).all()
+        return session.query(ProductDB).filter(ProductDB.receipt_pk == receipt_pk).all()
 
 
-def get_products_counts():
-    """For each product id, get the count of products with that receipt_id"""
+def get_products_counts(receipt_ids: list[str] | None = None):
+    """For each receipt id, get the count of products of that receipt"""
     with SessionLocal() as session:
-        return (
-            session.query(ProductDB.receipt_id, func.count(ProductDB.id))
-            .group_by(ProductDB.receipt_id)
-            .all()
+        query = session.query(ReceiptDB.id, func.count(ProductDB.pk)).join(
+            ReceiptDB, ProductDB.receipt_pk == ReceiptDB.pk
         )
+        if receipt_ids is not None:
+            query = query.filter(ReceiptDB.id.in_(receipt_ids))
+        return query.group_by(ReceiptDB.pk).all()
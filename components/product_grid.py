@@ -1,23 +1,28 @@
 import streamlit as st
 
 from components.input import get_product_inputs
+from components.price_check import get_price_history, price_outlier_message
 from repository.receipt_repository import ProductDB, SessionLocal, SortimentDB
 
 
-def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=True):
+def product_grid_ui(
+    receipt_pk, is_bio, products=None, prefix="", show_price=True, company_name=None
+):
     """
     Render a grid UI for adding and editing products for a given receipt.
     Args:
-        receipt_id: ID of the related receipt
+        receipt_pk: pk of the related receipt
         is_bio: bool, default value for is_bio
         products: list of ProductDB objects
         prefix: str, prefix for Streamlit keys
         show_price: bool, whether to show the price input
+        company_name: str, company of the receipt, used to flag unusual prices
     Returns:
         None (handles add/edit/delete via Streamlit forms)
     """
     if products is None:
         products = []
+    price_history = get_price_history() if show_price else None
     max_cols = 4
     total_products = len(products) + 1  # +1 for the add form
     rows = (total_products + max_cols - 1) // max_cols
@@ -47,7 +52,7 @@ def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=Tru
                         if st.form_submit_button("Add Product", icon="➕"):
                             with SessionLocal() as session:
                                 new_product = ProductDB(
-                                    receipt_id=str(receipt_id),
+                                    receipt_pk=receipt_pk,
                                     name=product_inputs["name"],
                                     is_bio=product_inputs["is_bio"],
                                     bio_category=product_inputs["bio_category"],
@@ -74,15 +79,17 @@ def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=Tru
                             prefix=f"{prefix}edit_{item.id}_",
                             show_price=show_price,
                         )
+                        if price_history:
+                            outlier = price_history.check(
+                                item.name, company_name, item.price, product_pk=item.pk
+                            )
+                            if outlier:
+                                st.warning(price_outlier_message(outlier), icon="⚠️")
                         
                         # Display product class reference if assigned
-                        if item.product_class_reference:
+                        if item.product_class_pk:
                             with SessionLocal() as session:
-                                sortiment = (
-                                    session.query(SortimentDB)
-                                    .filter(SortimentDB.id == item.product_class_reference)
-                                    .first()
-                                )
+                                sortiment = session.get(SortimentDB, item.product_class_pk)
                                 if sortiment:
                                     st.info(f"🏷️ Product Class: **{sortiment.name}**")
                         
@@ -90,7 +97,7 @@ def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=Tru
                         with col_save:
                             if st.form_submit_button("Save Product"):
                                 with SessionLocal() as session:
-                                    prod = session.query(ProductDB).get(item.id)
+                                    prod = session.query(ProductDB).get(item.pk)
                                     if prod:
                                         prod.name = product_inputs["name"]
                                         prod.is_bio = product_inputs["is_bio"]
@@ -104,7 +111,7 @@ def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=Tru
                                     # pre-populated from chatgpt
                                     else:
                                         new_product = ProductDB(
-                                            receipt_id=str(receipt_id),
+                                            receipt_pk=receipt_pk,
                                             name=product_inputs["name"],
                                             is_bio=product_inputs["is_bio"],
                                             bio_category=product_inputs["bio_category"],
@@ -119,7 +126,7 @@ def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=Tru
                         with col_delete:
                             if st.form_submit_button("Delete Product"):
                                 with SessionLocal() as session:
-                                    prod = session.query(ProductDB).get(item.id)
+                                    prod = session.query(ProductDB).get(item.pk)
                                     if prod:
                                         session.delete(prod)
                                         session.commit()
@@ -127,7 +134,7 @@ def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=Tru
                                 st.rerun()
                     
                     # Remove class button (outside form)
-                    if item.product_class_reference:
+                    if item.product_class_pk:
                         if st.button(
                             "Remove Product Class",
                             key=f"remove_class_{item.id}",
@@ -136,9 +143,9 @@ def product_grid_ui(receipt_id, is_bio, products=None, prefix="", show_price=Tru
                             use_container_width=True,
                         ):
                             with SessionLocal() as session:
-                                prod = session.query(ProductDB).get(item.id)
+                                prod = session.query(ProductDB).get(item.pk)
                                 if prod:
-                                    prod.product_class_reference = None
+                                    prod.product_class_pk = None
                                     session.commit()
                             st.success("Product class removed!")
                             st.rerun()
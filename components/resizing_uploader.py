@@ -0,0 +1,43 @@
+import base64
+import io
+import os
+from pathlib import Path
+
+import streamlit.components.v1 as components
+
+# Longest edge in pixels; 3840 still covers the "High Resolution" scale factor of encode_image
+UPLOAD_MAX_EDGE = int(os.getenv("UPLOAD_MAX_EDGE", "3840"))
+UPLOAD_JPEG_QUALITY = float(os.getenv("UPLOAD_JPEG_QUALITY", "0.85"))
+
+_component = components.declare_component(
+    "resizing_uploader",
+    path=str(Path(__file__).parent / "frontend" / "resizing_uploader"),
+)
+
+
+def resizing_file_uploader(
+    label: str,
+    key: str,
+    max_edge: int = UPLOAD_MAX_EDGE,
+    quality: float = UPLOAD_JPEG_QUALITY,
+) -> list[io.BytesIO]:
+    """
+    File uploader that downscales and recompresses images in the browser before sending them.
+    Args:
+        label: str, label shown above the file input
+        key: str, unique Streamlit key
+        max_edge: int, maximum length of the longest image edge in pixels
+        quality: float, JPEG quality (0-1) used for recompression
+    Returns:
+        list of BytesIO objects with a `name` attribute, like st.file_uploader.
+        PDFs and formats the browser cannot decode (e.g. HEIC) are passed through unchanged.
+    """
+    files = _component(
+        label=label, max_edge=max_edge, quality=quality, key=key, default=[]
+    )
+    uploaded_files = []
+    for file in files or []:
+        uploaded_file = io.BytesIO(base64.b64decode(file["data"]))
+        uploaded_file.name = file["name"]
+        uploaded_files.append(uploaded_file)
+    return uploaded_files
@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 """
 Database initialization script for the product classification feature.
-Run this once to set up the new tables and schema changes.
+The sortiment and regex tables and the product class column are part of the regular
+schema, so this applies the pending migrations via scripts/migrate.py.
 
 Usage:
     python initialize_classification_feature.py
@@ -14,13 +15,7 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from scripts.update_schema import (
-    create_sortiment_table,
-    create_regex_table,
-    add_product_class_reference,
-)
-
-DB_PATH = "receipts.db"
+from scripts.migrate import migrate
 
 
 def initialize_database():
@@ -28,17 +23,7 @@ def initialize_database():
     print("🔄 Initializing product classification feature...")
     
     try:
-        print("\n1️⃣  Creating sortiment table...")
-        create_sortiment_table(DB_PATH)
-        print("   ✅ Sortiment table ready")
-        
-        print("\n2️⃣  Creating regex table...")
-        create_regex_table(DB_PATH)
-        print("   ✅ Regex table ready")
-        
-        print("\n3️⃣  Adding product_class_reference column...")
-        add_product_class_reference(DB_PATH)
-        print("   ✅ Product classification column added")
+        migrate(chunk_size=2000)
         
         print("\n✨ Database initialization complete!")
         print("\nNext steps:")
@@ -30,3 +30,20 @@ class Product(BaseModel):
     price: float | None = Field(
         None, description="Price of the product per unit (optional)"
     )
+    tax_rate: int | None = Field(
+        None,
+        description="VAT rate in percent applied to this line (e.g. 10, 13, 20), only if shown on the receipt",
+    )
+
+
+class ProductPrice(BaseModel):
+    name: str = Field(..., description="Name of the product exactly as given in the request")
+    price: float | None = Field(
+        None, description="Price of the product per unit as printed on the receipt"
+    )
+
+
+class ProductPriceList(BaseModel):
+    prices: list[ProductPrice] = Field(
+        default=[], description="Prices of the requested products"
+    )
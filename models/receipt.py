@@ -45,3 +45,13 @@ class Receipt(BaseModel):
     tax_summary: Optional[dict] = Field(
         default=None, description="Receipt-level tax summary mapping rate->sums"
     )
+    transcription: Optional[str] = Field(
+        default=None,
+        description="Plain-text transcription of everything printed or written on the receipt, line by line",
+    )
+
+
+class ReceiptTranscription(BaseModel):
+    transcription: str = Field(
+        ..., description="Plain-text transcription of the receipt, line by line"
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 
 
 class TaxEntry(BaseModel):
@@ -23,3 +23,14 @@ class TaxValidationResult(BaseModel):
     vat_total: float
     diff: float
     reason: Optional[str] = None
+
+
+class TaxSolveResult(BaseModel):
+    """Result of the local mixed-rate solver.
+
+    status is 'unique' if exactly one rate split fits, 'ambiguous' if several do
+    (candidates lists them) and 'unsolvable' if none does or too little is known.
+    """
+    status: Literal["unique", "ambiguous", "unsolvable"]
+    tax_summary: dict = {}
+    candidates: list[dict] = []
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class UvaRateLine(BaseModel):
+    rate: int
+    kennzahl: Optional[str]  # None for rates without their own line on the form
+    net_cents: int
+    tax_cents: int
+
+
+class UvaResult(BaseModel):
+    """Figures of the Umsatzsteuervoranmeldung (U30) for one month or quarter, in cents."""
+    period: str
+    turnover_cents: int  # KZ 000, total net turnover from credit notes
+    rates: list[UvaRateLine]
+    input_vat_cents: int  # KZ 060, Vorsteuer from expense receipts
+    credit_ids: list[str]
+    expense_ids: list[str]
+    unresolved_ids: list[str]  # credit notes without a usable tax breakdown
+    computed_on: datetime
+
+    @property
+    def output_vat_cents(self) -> int:
+        return sum(line.tax_cents for line in self.rates)
+
+    @property
+    def payable_cents(self) -> int:
+        """Zahllast (positive) or Gutschrift (negative)."""
+        return self.output_vat_cents - self.input_vat_cents
@@ -0,0 +1,46 @@
+from urllib.parse import quote_plus
+
+import streamlit as st
+
+from repository.audit import get_audit_report, run_audit
+
+st.title("Audit")
+st.write(
+    "Checks all receipts for totals that don't add up: gross vs. net + VAT, tax breakdown vs. VAT, "
+    "products vs. total, credit notes without tax breakdown, duplicates and unreadable dates."
+)
+
+col_run, col_full = st.columns(2)
+with col_run:
+    if st.button("🔍 Check changed receipts"):
+        run = run_audit()
+        st.success(f"Checked {run.checked} receipt(s) in {run.seconds:.2f}s")
+with col_full:
+    if st.button("Check all receipts"):
+        run = run_audit(full=True)
+        st.success(f"Checked {run.checked} receipt(s) in {run.seconds:.2f}s")
+
+report = get_audit_report()
+if report.empty:
+    st.info("No suspicious receipts. Run a check to update the report.")
+else:
+    st.subheader(f"Suspicious receipts ({len(report)})")
+    rules = sorted({rule for rules in report["rules"] for rule in rules.split(", ")})
+    selected_rules = st.multiselect("Rules", rules, default=rules)
+    report = report[report["rules"].apply(lambda r: any(rule in r.split(", ") for rule in selected_rules))].copy()
+    report["Details"] = [f"/receipt_detail?id={quote_plus(str(i))}" for i in report["receipt_id"]]
+    st.dataframe(
+        report.drop(columns=["receipt_id"]),
+        column_config={
+            "date": "📅 Date",
+            "company_name": "🏢 Company",
+            "total_gross_amount": st.column_config.NumberColumn("💰 Brutto (€)", format="euro"),
+            "is_credit": "Einnahme",
+            "score": st.column_config.NumberColumn("Score", format="%.1f"),
+            "rules": "Rules",
+            "details": st.column_config.TextColumn("Findings", width="large"),
+            "Details": st.column_config.LinkColumn("🔍 Details", display_text="Edit"),
+        },
+        hide_index=True,
+        use_container_width=True,
+    )
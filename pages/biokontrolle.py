@@ -1,47 +1,32 @@
-from urllib.parse import quote_plus
-
-import pandas as pd
 import streamlit as st
 
 from models.product import BioCategory
-from pages.utils import highlight_url
-from repository.receipt_repository import ProductDB, ReceiptDB, SessionLocal
+from pages.cached_data import load_bio_products
+from pages.utils import highlight_url, select_archived_years
 
 st.title("Biokontrolle Produkte")
 
-with SessionLocal() as session:
-    query = (
-        session.query(ProductDB, ReceiptDB)
-        .join(ReceiptDB, ProductDB.receipt_id == ReceiptDB.id)
-        .filter(
-            ReceiptDB.is_credit == False,  # Only include non-credit receipts
-            ProductDB.is_bio == True,  # Only include bio products
-        )
-    )
-    all_rows = query.all()
-    if not all_rows:
-        st.info("No products found.")
-        st.stop()
-    data = []
-    for prod, rec in all_rows:
-        data.append(
-            {
-                "id": prod.id,
-                "receipt_id": prod.receipt_id,
-                "name": prod.name,
-                "amount": prod.amount,
-                "unit": prod.unit.value if hasattr(prod.unit, "value") else prod.unit,
-                "price": prod.price,
-                "is_bio": prod.is_bio,
-                "bio_category": prod.bio_category.value if prod.bio_category else None,
-                "company_name": rec.company_name,
-                "is_credit": rec.is_credit,
-                "date": rec.date,
-                "receipt_number": rec.receipt_number,
-                "receipt_url": f"/receipt_detail?id={quote_plus(str(rec.id))}",
-            }
-        )
-    df = pd.DataFrame(data)
+df = load_bio_products(select_archived_years())
+if df.empty:
+    st.info("No products found.")
+    st.stop()
+df = df[
+    [
+        "id",
+        "receipt_id",
+        "name",
+        "amount",
+        "unit",
+        "price",
+        "is_bio",
+        "bio_category",
+        "company_name",
+        "is_credit",
+        "date",
+        "receipt_number",
+        "receipt_url",
+    ]
+]
 
 # Sidebar filters
 st.sidebar.header("Filter Biokontrolle")
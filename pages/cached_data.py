@@ -0,0 +1,88 @@
+"""
+Page datasets cached across reruns and sessions with st.cache_data.
+Each loader is keyed on the data versions of the tables it reads (see DATA_VERSION_DDL),
+so reruns are cache hits and any write to one of those tables, from any tab or script,
+makes the next call load fresh data.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from repository.read_models import bio_products_frame, kaese_products_frame, products_frame
+from repository.receipt_repository import ReceiptFilter, ReceiptRepository
+from repository.statistics import get_receipt_stats
+from repository.triggers import get_data_versions
+
+# Old versions are useless once a table changed, so only a few entries are kept
+MAX_ENTRIES = 4
+
+
+def _versions(*tables: str) -> tuple[int, ...]:
+    versions = get_data_versions()
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+# Archives never change, so the archived years to include are simply part of the key
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _products(versions: tuple[int, ...], archive_years: tuple[int, ...]) -> pd.DataFrame:
+    return products_frame(archive_years=archive_years)
+
+
+def load_products(archive_years: tuple[int, ...] = ()) -> pd.DataFrame:
+    return _products(_versions("products", "receipts", "sortiment"), archive_years)
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _bio_products(versions: tuple[int, ...], archive_years: tuple[int, ...]) -> pd.DataFrame:
+    return bio_products_frame(archive_years)
+
+
+def load_bio_products(archive_years: tuple[int, ...] = ()) -> pd.DataFrame:
+    return _bio_products(_versions("products", "receipts"), archive_years)
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _kaese_products(versions: tuple[int, ...], archive_years: tuple[int, ...]) -> pd.DataFrame:
+    return kaese_products_frame(archive_years)
+
+
+def load_kaese_products(archive_years: tuple[int, ...] = ()) -> pd.DataFrame:
+    return _kaese_products(_versions("products", "receipts", "sortiment"), archive_years)
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _receipt_stats(versions: tuple[int, ...], archive_years: tuple[int, ...]) -> pd.DataFrame:
+    return get_receipt_stats(archive_years)
+
+
+def load_receipt_stats(archive_years: tuple[int, ...] = ()) -> pd.DataFrame:
+    # receipt_stats is maintained by triggers on receipts
+    return _receipt_stats(_versions("receipts"), archive_years)
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _distinct_receipt_values(column: str, versions: tuple[int, ...]) -> list[str]:
+    return ReceiptRepository().get_distinct_values(column)
+
+
+def load_distinct_receipt_values(column: str) -> list[str]:
+    return _distinct_receipt_values(column, _versions("receipts"))
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _companies(versions: tuple[int, ...]) -> dict[int, str]:
+    return ReceiptRepository().get_companies()
+
+
+def load_companies() -> dict[int, str]:
+    return _companies(_versions("companies"))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _receipt_count(filters: ReceiptFilter, versions: tuple[int, ...]) -> int:
+    return ReceiptRepository().count_receipts(filters)
+
+
+def load_receipt_count(filters: ReceiptFilter | None = None) -> int:
+    # The missing products filter looks at products
+    return _receipt_count(filters or ReceiptFilter(), _versions("receipts", "products"))
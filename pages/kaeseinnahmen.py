@@ -1,52 +1,32 @@
-from urllib.parse import quote_plus
-
 import pandas as pd
 import streamlit as st
-from sqlalchemy import or_
-
-from models.receipt import ReceiptSource
-from pages.utils import highlight_url
-from repository.receipt_repository import ProductDB, ReceiptDB, SessionLocal, SortimentDB
 
-KAESEINNAHMEN_COMPANIES = ["Hofladen", "Kemmts Eina", "Wochenmarkt", "Marktwagen"]
+from pages.utils import highlight_url, select_archived_years
+from pages.cached_data import load_kaese_products
 
 st.title("Käseinnahmen Produkte")
 
-with SessionLocal() as session:
-    query = (
-        session.query(ProductDB, ReceiptDB)
-        .join(ReceiptDB, ProductDB.receipt_id == ReceiptDB.id)
-        .filter(
-            ReceiptDB.is_credit == True,
-            or_(
-                ReceiptDB.company_name.in_(KAESEINNAHMEN_COMPANIES),
-                ReceiptDB.source == ReceiptSource.RECHNUNGSAPP,
-            ),
-        )
-    )
-    all_rows = query.all()
-    if not all_rows:
-        st.info("No products found.")
-        st.stop()
-    data = []
-    for prod, rec in all_rows:
-        data.append(
-            {
-                "id": prod.id,
-                "receipt_id": prod.receipt_id,
-                "name": prod.name,
-                "amount": prod.amount,
-                "unit": prod.unit.value if hasattr(prod.unit, "value") else prod.unit,
-                "price": prod.price,
-                "company_name": rec.company_name,
-                "is_credit": rec.is_credit,
-                "date": rec.date,
-                "receipt_number": rec.receipt_number,
-                "receipt_url": f"/receipt_detail?id={quote_plus(str(rec.id))}",
-                "product_class_id": prod.product_class_reference,
-            }
-        )
-    df = pd.DataFrame(data)
+df = load_kaese_products(select_archived_years())
+if df.empty:
+    st.info("No products found.")
+    st.stop()
+df = df[
+    [
+        "id",
+        "receipt_id",
+        "name",
+        "amount",
+        "unit",
+        "price",
+        "company_name",
+        "is_credit",
+        "date",
+        "receipt_number",
+        "receipt_url",
+        "product_class_id",
+        "product_class",
+    ]
+]
 
 # Filter: is_credit=True, company in KAESEINNAHMEN_COMPANIES
 # Sidebar filter
@@ -68,16 +48,6 @@ st.subheader("📊 By Product Class")
 classified_products = filtered[filtered["product_class_id"].notna()].copy()
 
 if not classified_products.empty:
-    # Get sortiment names
-    product_class_ids = classified_products["product_class_id"].unique()
-    with SessionLocal() as session:
-        sortiments = session.query(SortimentDB).filter(
-            SortimentDB.id.in_(product_class_ids)
-        ).all()
-        sortiment_map = {s.id: s.name for s in sortiments}
-    
-    classified_products["product_class"] = classified_products["product_class_id"].map(sortiment_map)
-    
     # Aggregate by product class
     class_agg = (
         classified_products.groupby("product_class", as_index=False)
@@ -152,7 +122,9 @@ st.dataframe(
         key: val for key, val in column_config.items() if key in filtered.columns
     },
     column_order=[
-        col for col in df.columns if col not in ["id", "receipt_id", "is_credit", "product_class_id"]
+        col
+        for col in df.columns
+        if col not in ["id", "receipt_id", "is_credit", "product_class_id", "product_class"]
     ],
 )
 
@@ -6,6 +6,7 @@ import pandas as pd
 import streamlit as st
 
 from models.receipt import ReceiptSource
+from repository.file_gc import register_upload
 from repository.receipt_repository import ReceiptDB, ReceiptRepository
 
 st.title("Import Rechnungsapp ZIP")
@@ -51,6 +52,7 @@ if uploaded_zip:
                 if not os.path.exists(dest_pdf):
                     with open(src_pdf, "rb") as fsrc, open(dest_pdf, "wb") as fdst:
                         fdst.write(fsrc.read())
+                    register_upload(dest_pdf)
                 storno = row["Stornorechnung?"]
                 if storno:
                     # flip signs
@@ -36,6 +36,7 @@ def product_reference_page():
     with SessionLocal() as session:
         sortiments = session.query(SortimentDB).order_by(SortimentDB.name).all()
         sortiment_map = {s.id: s.name for s in sortiments}
+        sortiment_pks = {s.id: s.pk for s in sortiments}
     
     if not sortiments:
         st.warning("No product classes found. Create some in the Sortiment page first.")
@@ -275,7 +276,7 @@ def product_reference_page():
                 all_matches.extend(matches)
             
             # Remove duplicates (a product might match multiple regexes)
-            unique_matches = list({p.id: p for p in all_matches}.values())
+            unique_matches = list({p.pk: p for p in all_matches}.values())
             
             if not unique_matches:
                 st.info("No products match the regex patterns for this product class.")
@@ -286,7 +287,7 @@ def product_reference_page():
                         "Amount": p.amount,
                         "Unit": p.unit.value if p.unit else "N/A",
                         "Price": p.price or 0,
-                        "Receipt ID": p.receipt_id[:8] + "...",
+                        "Receipt": p.receipt_pk,
                     }
                     for p in unique_matches
                 ])
@@ -298,9 +299,9 @@ def product_reference_page():
                     use_container_width=True,
                     type="primary",
                 ):
-                    product_ids = [p.id for p in unique_matches]
+                    product_pks = [p.pk for p in unique_matches]
                     updated_count = assign_product_class(
-                        product_ids, selected_sortiment_id
+                        product_pks, sortiment_pks[selected_sortiment_id]
                     )
                     st.success(
                         f"✅ Assigned {updated_count} products to "
@@ -327,8 +328,8 @@ def product_reference_page():
                 with SessionLocal() as session:
                     updated = (
                         session.query(ProductDB)
-                        .filter(ProductDB.product_class_reference == selected_sortiment_id)
-                        .update({ProductDB.product_class_reference: None})
+                        .filter(ProductDB.product_class_pk == sortiment_pks[selected_sortiment_id])
+                        .update({ProductDB.product_class_pk: None})
                     )
                     session.commit()
                     st.success(
@@ -349,7 +350,7 @@ def product_reference_page():
                 with SessionLocal() as session:
                     updated = (
                         session.query(ProductDB)
-                        .update({ProductDB.product_class_reference: None})
+                        .update({ProductDB.product_class_pk: None})
                     )
                     session.commit()
                     st.success(f"✅ Unassigned {updated} products from all classes")
@@ -361,7 +362,7 @@ def product_reference_page():
             total_products = session.query(ProductDB).count()
             classified = (
                 session.query(ProductDB)
-                .filter(ProductDB.product_class_reference.isnot(None))
+                .filter(ProductDB.product_class_pk.isnot(None))
                 .count()
             )
             unclassified = total_products - classified
@@ -5,59 +5,40 @@ Browse and search all products with comprehensive filtering options.
 Link directly to receipts for editing.
 """
 
-from urllib.parse import quote_plus
-
-import pandas as pd
 import streamlit as st
 
-from repository.receipt_repository import ProductDB, ReceiptDB, SortimentDB, SessionLocal
+from pages.cached_data import load_products
+from pages.utils import select_archived_years
+from repository.triggers import fold_search_text
 
 st.title("🛍️ All Products")
 st.write("Browse and search all products with flexible filtering.")
 
 # Fetch all products with their receipt and product class info
-with SessionLocal() as session:
-    query = session.query(ProductDB, ReceiptDB, SortimentDB).join(
-        ReceiptDB, ProductDB.receipt_id == ReceiptDB.id
-    ).outerjoin(
-        SortimentDB, ProductDB.product_class_reference == SortimentDB.id
-    )
-    all_rows = query.all()
-
-    if not all_rows:
-        st.info("No products found.")
-        st.stop()
-
-    data = []
-    for prod, rec, sortiment in all_rows:
-        product_class_name = sortiment.name if sortiment else None
-        has_class = product_class_name is not None
-        
-        data.append(
-            {
-                "id": prod.id,
-                "receipt_id": prod.receipt_id,
-                "name": prod.name,
-                "amount": prod.amount,
-                "unit": prod.unit.value if hasattr(prod.unit, "value") else prod.unit,
-                "price": prod.price,
-                "is_bio": prod.is_bio,
-                "bio_category": (
-                    prod.bio_category.value
-                    if hasattr(prod.bio_category, "value")
-                    else prod.bio_category
-                ),
-                "product_class": product_class_name,
-                "has_product_class": has_class,
-                "company_name": rec.company_name,
-                "is_credit": rec.is_credit,
-                "date": rec.date,
-                "receipt_number": rec.receipt_number,
-                "receipt_url": f"/receipt_detail?id={quote_plus(str(rec.id))}",
-            }
-        )
-
-df = pd.DataFrame(data)
+df = load_products(select_archived_years())
+if df.empty:
+    st.info("No products found.")
+    st.stop()
+df["has_product_class"] = df["product_class"].notna()
+df = df[
+    [
+        "id",
+        "receipt_id",
+        "name",
+        "amount",
+        "unit",
+        "price",
+        "is_bio",
+        "bio_category",
+        "product_class",
+        "has_product_class",
+        "company_name",
+        "is_credit",
+        "date",
+        "receipt_number",
+        "receipt_url",
+    ]
+]
 
 # Sidebar filters
 st.sidebar.header("🔍 Filters")
@@ -110,8 +91,9 @@ class_ref_filter = st.sidebar.selectbox("Product Class Reference", options=class
 filtered = df.copy()
 
 if name_search:
+    # Folded like the search index, so "Käse" also finds "Kaese"
     filtered = filtered[
-        filtered["name"].str.contains(name_search, case=False, na=False)
+        filtered["name"].fillna("").map(fold_search_text).str.contains(fold_search_text(name_search), regex=False)
     ]
 
 filtered = filtered[
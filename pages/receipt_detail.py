@@ -9,6 +9,7 @@ from components.product_grid import product_grid_ui
 from models.receipt import Receipt
 from receipt_parser.llm import Prompt, extract_receipt_data
 from receipt_parser.taxation import has_mixed_taxes_from_summary, validate_tax_summary
+from repository.archive import find_archived_receipt
 from repository.receipt_repository import (
     ProductDB,
     ReceiptDB,
@@ -36,6 +37,31 @@ receipt_id = query_params.get("id", None)
 
 if receipt_id:
     receipt = receipt_repo.get_receipt_by_id(receipt_id)
+    archived = None if receipt else find_archived_receipt(receipt_id)
+    if archived:
+        year, archived_receipt, archived_products = archived
+        st.info(f"This receipt is archived with the year {year} and can only be viewed.")
+        st.json(
+            {
+                column.key: getattr(archived_receipt, column.key)
+                for column in ReceiptDB.__table__.columns
+                if column.key != "transcription"
+            },
+            expanded=True,
+        )
+        st.dataframe(
+            [
+                {"name": p.name, "amount": p.amount, "unit": p.unit.value if p.unit else None, "price": p.price}
+                for p in archived_products
+            ],
+            use_container_width=True,
+        )
+        for file_path in archived_receipt.file_paths or []:
+            if file_path.endswith(".pdf"):
+                pdf_viewer(file_path)
+            else:
+                st.image(file_path, caption="Receipt Image", use_container_width=True)
+        st.stop()
     col_1, col_2 = st.columns(2)
     with col_1:
         # Load images when expanded
@@ -132,9 +158,10 @@ if not show_products:
     )
 
 if show_products:
+    receipt_pk = receipt.pk
     with SessionLocal() as session:
         products = (
-            session.query(ProductDB).filter(ProductDB.receipt_id == receipt_id).all()
+            session.query(ProductDB).filter(ProductDB.receipt_pk == receipt_pk).all()
         )
     if not products:
         custom_prompt = st.text_area(
@@ -158,25 +185,26 @@ if show_products:
             receipt = Receipt(**extracted_data)
             products = receipt.products
             if products:
-                for p in products:
-                    p_db = ProductDB(
-                        receipt_id=receipt_id,
-                        name=p.name,
-                        amount=p.amount,
-                        price=p.price,
-                        is_bio=inputs["is_bio"],
-                        unit=p.unit,
-                        bio_category=p.bio_category,
-                    )
-                    with SessionLocal() as session:
-                        session.add(p_db)
-                        session.commit()
-
+                receipt_repo.add_products(
+                    receipt_pk,
+                    [
+                        ProductDB(
+                            name=p.name,
+                            amount=p.amount,
+                            price=p.price,
+                            is_bio=inputs["is_bio"],
+                            unit=p.unit,
+                            bio_category=p.bio_category,
+                        )
+                        for p in products
+                    ],
+                )
                 st.rerun()
     product_grid_ui(
-        receipt_id=receipt_id,
+        receipt_pk=receipt_pk,
         is_bio=inputs["is_bio"],
         products=products,
         prefix="detail_",
         show_price=True,
+        company_name=inputs["company_name"],
     )
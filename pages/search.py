@@ -0,0 +1,81 @@
+"""
+Search Page
+
+Search receipts (company, description, comment, receipt number, transcription) and
+product names at once. Hits are ranked by relevance and link to the receipt.
+"""
+
+import time
+
+import streamlit as st
+
+from repository.receipt_repository import ReceiptRepository
+from repository.search import MIN_TERM_LENGTH, search
+
+# Creates the search indexes if they are missing
+ReceiptRepository()
+
+st.title("🔎 Search")
+
+query = st.text_input(
+    "Search receipts and products",
+    placeholder="e.g. Bergkäse, Hofladen, RE-2024, Euterwolle",
+    help=(
+        "Searches the receipt fields, the full text of the receipts and product names. Every word must "
+        f"occur; words match inside longer words. Words need at least {MIN_TERM_LENGTH} letters."
+    ),
+)
+kind_options = {"All": ("receipt", "product"), "Receipts": ("receipt",), "Products": ("product",)}
+kind_filter = st.radio("Show", options=list(kind_options), horizontal=True)
+page_size = st.sidebar.selectbox("Hits per page", options=[25, 50, 100], index=0)
+
+if not query:
+    st.stop()
+
+# Back to the first page when the search changes
+search_key = (query, kind_filter, page_size)
+if st.session_state.get("search_key") != search_key:
+    st.session_state["search_key"] = search_key
+    st.session_state["search_page"] = 0
+page_number = st.session_state["search_page"]
+
+start = time.perf_counter()
+results = search(query, kinds=kind_options[kind_filter], limit=page_size, offset=page_number * page_size)
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+if results.hits.empty:
+    st.info("No hits.")
+    st.stop()
+
+st.dataframe(
+    results.hits,
+    column_order=["kind", "date", "company_name", "name", "comment", "amount", "receipt_number", "excerpt", "receipt_url"],
+    column_config={
+        "kind": "Art",
+        "date": "📅 Date",
+        "company_name": "🏢 Company",
+        "name": st.column_config.TextColumn("Produkt / Beschreibung", width="large"),
+        "comment": "Kommentar",
+        "amount": st.column_config.NumberColumn("💰 Betrag (€)", format="euro"),
+        "receipt_number": "Nr.",
+        "excerpt": st.column_config.TextColumn("Treffer", width="large"),
+        "receipt_url": st.column_config.LinkColumn("🔍 Details", display_text="Edit"),
+    },
+    hide_index=True,
+    use_container_width=True,
+)
+
+first_shown = page_number * page_size + 1
+prev_col, info_col, next_col = st.columns([1, 4, 1])
+with prev_col:
+    if st.button("◀ Previous", disabled=page_number == 0):
+        st.session_state["search_page"] -= 1
+        st.rerun()
+with info_col:
+    st.caption(
+        f"Hits {first_shown}–{first_shown + len(results.hits) - 1} of {results.total} ({elapsed_ms:.0f} ms)"
+    )
+with next_col:
+    if st.button("Next ▶", disabled=first_shown + len(results.hits) > results.total):
+        st.session_state["search_page"] += 1
+        st.rerun()
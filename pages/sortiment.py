@@ -8,7 +8,7 @@ View, add, and edit sortiment records with regex pattern counts.
 import streamlit as st
 
 from components.product_classification import get_sortiment_with_regex_count
-from repository.receipt_repository import SortimentDB, SessionLocal
+from repository.receipt_repository import ProductDB, RegexDB, SortimentDB, SessionLocal
 
 
 def sortiment_page():
@@ -99,6 +99,13 @@ def sortiment_page():
                             .first()
                         )
                         if sortiment_obj:
+                            # Unlink products and drop the class's regexes, foreign keys are enforced
+                            session.query(ProductDB).filter(
+                                ProductDB.product_class_pk == sortiment_obj.pk
+                            ).update({ProductDB.product_class_pk: None}, synchronize_session=False)
+                            session.query(RegexDB).filter(RegexDB.product_class_id == sortiment_obj.id).delete(
+                                synchronize_session=False
+                            )
                             session.delete(sortiment_obj)
                             session.commit()
                             st.success("Product class deleted!")
@@ -1,67 +1,20 @@
 import altair as alt
-import pandas as pd
 import streamlit as st
-from sqlalchemy import or_
 
 from models.product import ProductUnit
-from models.receipt import ReceiptSource
-from repository.receipt_repository import ProductDB, ReceiptDB, SessionLocal, SortimentDB
+from pages.cached_data import load_kaese_products
 
-KAESEINNAHMEN_COMPANIES = ["Hofladen", "Kemmts Eina", "Wochenmarkt", "Marktwagen"]
 
-
-def show_kaese_statistics():
+def show_kaese_statistics(archive_years: tuple[int, ...] = ()):
     """Display cheese statistics with aggregation by type and unit."""
     st.header("Käse Statistik")
 
     # Load käse data
-    with SessionLocal() as session:
-        query = (
-            session.query(ProductDB, ReceiptDB)
-            .join(ReceiptDB, ProductDB.receipt_id == ReceiptDB.id)
-            .filter(
-                ReceiptDB.is_credit == True,
-                or_(
-                    ReceiptDB.company_name.in_(KAESEINNAHMEN_COMPANIES),
-                    ReceiptDB.source == ReceiptSource.RECHNUNGSAPP,
-                ),
-            )
-        )
-        all_rows = query.all()
-        if not all_rows:
-            st.info("No cheese products found.")
-            return
-        
-        data = []
-        for prod, rec in all_rows:
-            data.append(
-                {
-                    "id": prod.id,
-                    "receipt_id": prod.receipt_id,
-                    "name": prod.name,
-                    "amount": prod.amount,
-                    "unit": prod.unit.value if hasattr(prod.unit, "value") else prod.unit,
-                    "price": prod.price,
-                    "company_name": rec.company_name,
-                    "is_credit": rec.is_credit,
-                    "date": rec.date,
-                    "receipt_number": rec.receipt_number,
-                    "product_class_id": prod.product_class_reference,
-                }
-            )
-        kaese_df = pd.DataFrame(data)
-
-    # Get product class names
-    product_class_ids = kaese_df[kaese_df["product_class_id"].notna()]["product_class_id"].unique()
-    sortiment_map = {}
-    if len(product_class_ids) > 0:
-        with SessionLocal() as session:
-            sortiments = session.query(SortimentDB).filter(
-                SortimentDB.id.in_(product_class_ids)
-            ).all()
-            sortiment_map = {s.id: s.name for s in sortiments}
-
-    kaese_df["cheese_type"] = kaese_df["product_class_id"].map(sortiment_map)
+    kaese_df = load_kaese_products(archive_years)
+    if kaese_df.empty:
+        st.info("No cheese products found.")
+        return
+    kaese_df = kaese_df.rename(columns={"product_class": "cheese_type"})
 
     # Sidebar filter
     st.sidebar.header("Filter Käse")
@@ -2,22 +2,26 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
-from pages.utils import get_location
+from pages.utils import get_location, sum_euros_by
+from receipt_parser.money import sum_euros
 from repository.receipt_repository import ReceiptRepository
 
 
 def show_overview_statistics(df):
-    """Display overview statistics: income/expense summary, monthly trends, VAT comparison, and top companies."""
+    """
+    Display overview statistics: income/expense summary, monthly trends, VAT comparison, and top companies.
+    df holds the receipt totals per month, direction, company and source (see get_receipt_stats).
+    """
     st.header("Überblick")
 
     # 1. Summarize all expanses and all incomes (is_credit False/True) and visualize via Bar Chart
-    income = df[df["is_credit"]]["total_gross_amount"].sum()
-    expanse = df[~df["is_credit"]]["total_gross_amount"].sum()
+    income = sum_euros(df[df["is_credit"]]["total_gross_amount"])
+    expanse = sum_euros(df[~df["is_credit"]]["total_gross_amount"])
     gewinn = income - expanse
 
     # 1. Summarize all expanses and all incomes (is_credit False/True) and visualize via Bar Chart
-    income = df[df["is_credit"]]["total_gross_amount"].sum()
-    expanse = df[~df["is_credit"]]["total_gross_amount"].sum()
+    income = sum_euros(df[df["is_credit"]]["total_gross_amount"])
+    expanse = sum_euros(df[~df["is_credit"]]["total_gross_amount"])
     gewinn = income - expanse
 
     bar_data = pd.DataFrame(
@@ -58,13 +62,8 @@ def show_overview_statistics(df):
     st.markdown(f"**Gewinn:** :{gewinn_color}[{gewinn:.2f} €]")
 
     # 2. Line Chart of Income vs Expanses for each month
-    if "date" in df.columns:
-        df["month"] = df["date"].dt.to_period("M")
-        monthly = (
-            df.groupby(["month", "is_credit"])
-            .agg({"total_gross_amount": "sum"})
-            .reset_index()
-        )
+    if "month" in df.columns:
+        monthly = sum_euros_by(df, ["month", "is_credit"], ["total_gross_amount"]).reset_index()
         # Convert month back to timestamp for proper sorting in Altair
         monthly["month"] = monthly["month"].dt.to_timestamp()
         monthly["Type"] = monthly["is_credit"].map({True: "Income", False: "Expanse"})
@@ -85,10 +84,8 @@ def show_overview_statistics(df):
         st.altair_chart(line_chart, use_container_width=True)
 
     # 3. Bar Chart for the VAT. Compare the total USt. Einnahmen and the USt. Ausgaben.
-    income_vat = df[df["is_credit"]]["vat_amount"].sum()
-    expanse_vat = df[~df["is_credit"]]["vat_amount"].sum()
-    income_vat = df[df["is_credit"]].get("vat_amount", pd.Series([])).sum()
-    expanse_vat = df[~df["is_credit"]].get("vat_amount", pd.Series([])).sum()
+    income_vat = sum_euros(df[df["is_credit"]].get("vat_amount", pd.Series([])))
+    expanse_vat = sum_euros(df[~df["is_credit"]].get("vat_amount", pd.Series([])))
     vat_delta = expanse_vat - income_vat  # VAT to pay back (expenses) minus VAT to pay (income)
     vat_data = pd.DataFrame(
         {
@@ -132,9 +129,7 @@ def show_overview_statistics(df):
         "Number of top companies to show", min_value=1, max_value=60, value=5, step=1
     )
     expanse_companies = (
-        df[~df["is_credit"]]
-        .groupby("company_name")["total_net_amount"]
-        .sum()
+        sum_euros_by(df[~df["is_credit"]], "company_name", ["total_net_amount"])["total_net_amount"]
         .sort_values(ascending=False)
         .head(int(K))
     )
@@ -184,7 +179,7 @@ def show_overview_statistics(df):
 
     income_df["location"] = income_df.apply(get_location_extended, axis=1)
     location_income = (
-        income_df.groupby("location")["total_gross_amount"].sum().reset_index()
+        sum_euros_by(income_df, "location", ["total_gross_amount"]).reset_index()
     )
     location_income["Label"] = location_income["total_gross_amount"].apply(lambda x: f"€{x:,.2f}")
 
@@ -216,9 +211,9 @@ def show_overview_statistics(df):
     show_other = st.checkbox("Show other income companies (>200€)")
     if show_other:
         other_companies = (
-            income_df[income_df["location"] == "Other"]
-            .groupby("company_name")["total_net_amount"]
-            .sum()
+            sum_euros_by(income_df[income_df["location"] == "Other"], "company_name", ["total_net_amount"])[
+                "total_net_amount"
+            ]
             .sort_values(ascending=False)
         )
         other_companies = other_companies[other_companies > 200]
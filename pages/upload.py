@@ -1,7 +1,9 @@
 import os
 import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import quote_plus
 
 import streamlit as st
 from PIL import Image, ImageOps
@@ -9,15 +11,19 @@ from streamlit_pdf_viewer import pdf_viewer
 
 from components.input import get_receipt_inputs
 from components.product_db_ops import get_products_for_receipt
+from components.price_check import get_price_history, price_outlier_message
 from components.product_grid import product_grid_ui
+from components.resizing_uploader import resizing_file_uploader
 from models.receipt import Receipt, ReceiptSource
-from receipt_parser.llm import Prompt, extract_receipt_data
+from receipt_parser.llm import Prompt, extract_product_prices, extract_receipt_data
+from receipt_parser.segmentation import crop_regions, find_receipt_regions
 from receipt_parser.taxation import build_receipt_tax_summary, validate_tax_summary
+from repository.file_gc import register_upload
+from repository.file_index import remove_unreferenced_files
 from repository.receipt_repository import (
     ProductDB,
     ReceiptDB,
     ReceiptRepository,
-    SessionLocal,
 )
 
 
@@ -35,6 +41,9 @@ def init_session_state():
         "uploader_key": 0,
         "expanded": {},
         "prompt": Prompt.DEFAULT,
+        "receipt_regions": {},
+        "split_receipts": [],
+        "split_failures": [],
     }
     for key, value in default_values.items():
         if key not in st.session_state:
@@ -66,25 +75,129 @@ receipt_repo = ReceiptRepository()
 
 # Directory for saving images
 UPLOAD_FOLDER = "saved_images"
+# Parallel extraction queries when a photo is split into several receipts
+MAX_EXTRACTION_WORKERS = 4
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+
+def save_split_receipts(img_path, regions):
+    """Crop each detected receipt out of the photo and store it as its own image."""
+    split_paths = []
+    for crop in crop_regions(Image.open(img_path), regions):
+        img_name = datetime.now().strftime("%Y%m%d-%H%M%S")
+        crop_path = os.path.join(UPLOAD_FOLDER, f"{img_name}_{random.random() * 20}.jpg")
+        crop.convert("RGB").save(crop_path, format="JPEG", quality=90)
+        register_upload(crop_path)
+        split_paths.append(crop_path)
+    return split_paths
+
+
+def save_extracted_receipt(receipt: Receipt, file_paths):
+    """Store an extracted receipt and its products as is; it is reviewed on the detail page."""
+    db_receipt = ReceiptDB(
+        receipt_number=receipt.receipt_number,
+        date=receipt.date,
+        total_gross_amount=receipt.total_gross_amount,
+        total_net_amount=receipt.total_net_amount,
+        vat_amount=receipt.vat_amount,
+        company_name=receipt.company_name,
+        description=receipt.description,
+        is_credit=bool(receipt.is_credit),
+        is_bio=bool(receipt.is_bio),
+        file_paths=file_paths,
+        source=ReceiptSource.RECEIPT_SCANNER.value,
+        transcription=receipt.transcription,
+    )
+    if receipt.is_credit:
+        db_receipt.tax_summary = receipt.tax_summary or build_receipt_tax_summary({
+            "total_gross_amount": receipt.total_gross_amount,
+            "total_net_amount": receipt.total_net_amount,
+            "vat_amount": receipt.vat_amount,
+        })["tax_summary"]
+    products = [
+        ProductDB(
+            name=p.name,
+            amount=p.amount,
+            price=p.price,
+            is_bio=p.is_bio,
+            unit=p.unit,
+            bio_category=p.bio_category,
+        )
+        for p in receipt.products or []
+    ]
+    return receipt_repo.create_receipt_with_products(db_receipt, products)
+
+
+def extract_split_receipts(split_paths, prompt_type, custom_prompt, img_scale_factor):
+    """
+    Extract and save every cropped receipt on its own, so one failure does not lose the others.
+    The crops of failed receipts are removed again.
+    Returns:
+        (saved ReceiptDBs, list of (crop path, error) of the receipts that failed)
+    """
+    saved, failed = [], []
+    with ThreadPoolExecutor(max_workers=min(len(split_paths), MAX_EXTRACTION_WORKERS)) as executor:
+        futures = {
+            path: executor.submit(extract_receipt_data, [path], prompt_type, custom_prompt, img_scale_factor)
+            for path in split_paths
+        }
+        for path, future in futures.items():
+            try:
+                saved.append(save_extracted_receipt(Receipt(**future.result()), [path]))
+            except Exception as e:
+                print(f"Extraction of split receipt {path} failed: {e!r}")
+                failed.append((path, e))
+    remove_unreferenced_files([path for path, _ in failed])
+    return saved, failed
+
+
 # Streamlit UI
 st.title("Receipt Information Extraction App")
 st.write("Upload a receipt image or capture one with your smartphone.")
 
-uploaded_files = st.file_uploader(
-    "Choose a receipt image",
-    type=["jpg", "jpeg", "png", ".HEIC", "pdf", ".PDF"],
-    accept_multiple_files=True,
-    key=f"uploader_{st.session_state.uploader_key}",
+if st.session_state.split_failures:
+    st.error(
+        f"{len(st.session_state.split_failures)} of "
+        f"{len(st.session_state.split_failures) + len(st.session_state.split_receipts)} receipts in the photo "
+        "could not be extracted and were not saved. The photo is still loaded to extract them by hand; "
+        "splitting it again would save the other receipts a second time.\n"
+        + "\n".join(f"- {error}" for error in st.session_state.split_failures)
+    )
+if st.session_state.split_receipts:
+    st.success(f"Saved {len(st.session_state.split_receipts)} receipts from one photo. Please review them:")
+    for split_receipt in st.session_state.split_receipts:
+        st.markdown(
+            f"- [{split_receipt.company_name or 'Unknown'} ({split_receipt.date or '-'}, "
+            f"{split_receipt.total_gross_amount} €)](/receipt_detail?id={quote_plus(str(split_receipt.id))})"
+        )
+
+keep_original = st.toggle(
+    "Keep original resolution",
+    value=False,
+    key="keep_original",
+    help="By default images are downscaled in the browser before uploading.",
 )
+if keep_original:
+    uploaded_files = st.file_uploader(
+        "Choose a receipt image",
+        type=["jpg", "jpeg", "png", ".HEIC", "pdf", ".PDF"],
+        accept_multiple_files=True,
+        key=f"uploader_{st.session_state.uploader_key}",
+    )
+else:
+    uploaded_files = resizing_file_uploader(
+        "Choose a receipt image",
+        key=f"resizing_uploader_{st.session_state.uploader_key}",
+    )
 
 if uploaded_files:
     if st.button(
         "Confirm" if not st.session_state.file_paths else "Update", key="confirm"
     ):
         st.session_state.file_paths = []
+        st.session_state.split_receipts = []
+        st.session_state.split_failures = []
         for uploaded_file in uploaded_files:
             print("uf", uploaded_file)
             img_name = datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -94,6 +207,7 @@ if uploaded_files:
             )
             with open(image_path, "wb") as f:
                 f.write(uploaded_file.read())
+            register_upload(image_path)
 
             st.session_state.file_paths.append(image_path)
 
@@ -129,9 +243,41 @@ if st.session_state.file_paths:
         )
 
 high_res = st.toggle("High Resolution", value=False, key="high_res")
+stitch = False
+if len([p for p in st.session_state.file_paths if not p.lower().endswith(".pdf")]) > 1:
+    stitch = st.toggle(
+        "Photos of one long receipt",
+        value=False,
+        key="stitch",
+        help="Stitches overlapping photos into one image so overlapping lines are only read once.",
+    )
+
+# Several small receipts photographed together can be split into separate receipts
+if len(st.session_state.file_paths) == 1 and not st.session_state.file_paths[0].lower().endswith(".pdf"):
+    img_path = st.session_state.file_paths[0]
+    if img_path not in st.session_state.receipt_regions:
+        st.session_state.receipt_regions[img_path] = find_receipt_regions(Image.open(img_path))
+    regions = st.session_state.receipt_regions[img_path]
+    if len(regions) > 1:
+        st.info(f"{len(regions)} receipts detected in this photo.")
+        if st.button("Split into separate receipts and extract"):
+            split_paths = save_split_receipts(img_path, regions)
+            with st.spinner(f"Extracting {len(split_paths)} receipts..."):
+                saved, failed = extract_split_receipts(
+                    split_paths, Prompt(receipt_type), custom_prompt, 2 if high_res else 1
+                )
+            st.session_state.split_receipts = saved
+            st.session_state.split_failures = [f"{type(e).__name__}: {e}" for _, e in failed]
+            st.session_state.extracted_data = None
+            st.session_state.products = None
+            if not failed:
+                st.session_state.file_paths = []
+                st.session_state.uploader_key += 1
+            st.rerun()
+
 if st.session_state.file_paths and st.button("Extract Receipt Data"):
     extracted_data = extract_receipt_data(
-        st.session_state.file_paths, Prompt(receipt_type), custom_prompt, 2 if high_res else 1
+        st.session_state.file_paths, Prompt(receipt_type), custom_prompt, 2 if high_res else 1, stitch
     )
     receipt = Receipt(**extracted_data)  # Save the image path with the extracted data
     st.session_state.extracted_data = receipt
@@ -168,6 +314,32 @@ with col_2:
         if allow_products_unsaved:
             st.badge("To add products save first", icon="ℹ️")
 
+        # Flag implausible prices before saving, only those lines are re-read by the LLM
+        if st.session_state.products:
+            price_history = get_price_history()
+            suspicious = [
+                (p, outlier)
+                for p in st.session_state.products
+                if (outlier := price_history.check(p.name, inputs["company_name"], p.price))
+            ]
+            if suspicious:
+                st.warning(
+                    "Some extracted prices look wrong:\n"
+                    + "\n".join(
+                        f"- **{p.name}**: {price_outlier_message(outlier)}"
+                        for p, outlier in suspicious
+                    )
+                )
+                if st.button("Re-extract suspicious prices"):
+                    with st.spinner("Re-reading prices..."):
+                        prices = extract_product_prices(
+                            st.session_state.file_paths, [p.name for p, _ in suspicious]
+                        )
+                    for p, _ in suspicious:
+                        if p.name in prices:
+                            p.price = prices[p.name]
+                    st.rerun()
+
         if st.button("Save to Database"):
             # Update the extracted data with user inputs
             updated_receipt = ReceiptDB(
@@ -183,6 +355,7 @@ with col_2:
                 comment=inputs["comment"],
                 is_bio=inputs["is_bio"],
                 source=inputs["source"],
+                transcription=st.session_state.extracted_data.transcription,
             )
             if inputs["is_credit"]:
                 # Prefer user-edited tax breakdown; fall back to deterministic
@@ -199,24 +372,20 @@ with col_2:
                 val = validate_tax_summary(updated_receipt.vat_amount, updated_receipt.tax_summary or {})
                 if not val.ok:
                     st.warning(f"VAT mismatch: receipt.vat_amount={updated_receipt.vat_amount} vs tax_summary total={val.vat_total} (diff={val.diff})")
-            # Save updated receipt to the database
-            created_receipt = receipt_repo.create_receipt(updated_receipt)
+            # Save updated receipt with the extracted products, if any, to the database
+            products = [
+                ProductDB(
+                    name=p.name,
+                    amount=p.amount,
+                    price=p.price,
+                    is_bio=inputs["is_bio"],
+                    unit=p.unit,
+                    bio_category=p.bio_category,
+                )
+                for p in st.session_state.products or []
+            ]
+            created_receipt = receipt_repo.create_receipt_with_products(updated_receipt, products)
             st.session_state.created_receipt = created_receipt
-            # Save extracted products to DB if any
-            if st.session_state.products:
-                for p in st.session_state.products:
-                    p_db = ProductDB(
-                        receipt_id=created_receipt.id,
-                        name=p.name,
-                        amount=p.amount,
-                        price=p.price,
-                        is_bio=inputs["is_bio"],
-                        unit=p.unit,
-                        bio_category=p.bio_category,
-                    )
-                    with SessionLocal() as session:
-                        session.add(p_db)
-                        session.commit()
             st.session_state.products = None  # Clear extracted products after saving
             st.success("Receipt data saved successfully!")
 
@@ -227,13 +396,14 @@ if allow_products and created_receipt:
     st.markdown("---")
     st.subheader("Products")
     # Only show products from DB after save
-    products_db = get_products_for_receipt(created_receipt.id)
+    products_db = get_products_for_receipt(created_receipt.pk)
     product_grid_ui(
-        receipt_id=created_receipt.id,
+        receipt_pk=created_receipt.pk,
         is_bio=created_receipt.is_bio,
         products=products_db,
         prefix="upload_",
         show_price=True,
+        company_name=created_receipt.company_name,
     )
 
 if (created_receipt and not allow_products) or (
@@ -1,5 +1,11 @@
 import random
 
+import pandas as pd
+import streamlit as st
+
+from receipt_parser.money import to_cents_array
+from repository.archive import archived_years
+
 
 def highlight_url(row):
     # different shades of gray for each receipt_url
@@ -21,3 +27,25 @@ def get_location(row):
         return "Hofladen"
     else:
         return "Other"
+
+
+def sum_euros_by(df, by, columns):
+    """groupby(by)[columns].sum(), summed in integer cents so totals don't collect float error."""
+    # Column by column: DataFrame.apply on an empty frame doesn't return a frame
+    cents = pd.DataFrame({column: to_cents_array(df[column]) for column in columns}, index=df.index)
+    cents[by] = df[by]
+    return cents.groupby(by)[columns].sum() / 100
+
+
+def select_archived_years(key: str = "archived_years") -> tuple[int, ...]:
+    """Sidebar choice of archived years to include; empty and hidden without archives."""
+    years = archived_years()
+    if not years:
+        return ()
+    selected = st.sidebar.multiselect(
+        "Archived years",
+        options=years,
+        key=key,
+        help="Closed years are kept in separate archive files and only loaded when selected.",
+    )
+    return tuple(sorted(selected))
@@ -0,0 +1,142 @@
+import datetime
+from urllib.parse import quote_plus
+
+import pandas as pd
+import streamlit as st
+
+from pages.utils import get_location
+from receipt_parser.dates import month_key, quarter_key
+from repository.receipt_repository import ReceiptRepository
+from repository.uva import (
+    INPUT_VAT_KENNZAHL,
+    TURNOVER_KENNZAHL,
+    get_uva,
+    undated_receipt_ids,
+)
+
+receipt_repo = ReceiptRepository()
+
+st.title("Umsatzsteuervoranmeldung")
+
+today = datetime.date.today()
+# Default to the last finished period
+last_month = today.replace(day=1) - datetime.timedelta(days=1)
+last_quarter = datetime.date(today.year, ((today.month - 1) // 3) * 3 + 1, 1) - datetime.timedelta(days=1)
+
+col_type, col_year, col_period = st.columns(3)
+with col_type:
+    period_type = st.radio("Zeitraum", ["Quartal", "Monat"], horizontal=True)
+default_day = last_quarter if period_type == "Quartal" else last_month
+with col_year:
+    year = st.number_input("Jahr", min_value=2000, max_value=today.year + 1, value=default_day.year, step=1)
+with col_period:
+    if period_type == "Quartal":
+        options = [f"Q{q}" for q in range(1, 5)]
+        part = st.selectbox("Quartal", options, index=options.index(quarter_key(default_day).split("-")[1]))
+    else:
+        options = [f"{m:02d}" for m in range(1, 13)]
+        part = st.selectbox("Monat", options, index=options.index(month_key(default_day).split("-")[1]))
+period = f"{int(year)}-{part}"
+
+if st.button("🔃 Neu berechnen"):
+    st.rerun()
+
+result = get_uva(period)
+st.caption(f"Berechnet am {result.computed_on.strftime('%d.%m.%Y um %H:%M:%S')}")
+
+rows = [
+    {
+        "Kennzahl": TURNOVER_KENNZAHL,
+        "Bezeichnung": "Gesamtbetrag der Lieferungen und sonstigen Leistungen",
+        "Bemessungsgrundlage": result.turnover_cents / 100,
+        "Umsatzsteuer": None,
+    }
+]
+for line in result.rates:
+    rows.append(
+        {
+            "Kennzahl": line.kennzahl or "-",
+            "Bezeichnung": f"davon steuerpflichtig mit {line.rate}%",
+            "Bemessungsgrundlage": line.net_cents / 100,
+            "Umsatzsteuer": line.tax_cents / 100,
+        }
+    )
+rows.append(
+    {
+        "Kennzahl": INPUT_VAT_KENNZAHL,
+        "Bezeichnung": "Gesamtbetrag der Vorsteuern",
+        "Bemessungsgrundlage": None,
+        "Umsatzsteuer": result.input_vat_cents / 100,
+    }
+)
+st.dataframe(
+    pd.DataFrame(rows),
+    column_config={
+        "Bemessungsgrundlage": st.column_config.NumberColumn(format="euro"),
+        "Umsatzsteuer": st.column_config.NumberColumn(format="euro"),
+    },
+    hide_index=True,
+    use_container_width=True,
+)
+
+col_out, col_in, col_pay = st.columns(3)
+col_out.metric("Umsatzsteuer", f"€{result.output_vat_cents / 100:,.2f}")
+col_in.metric("Vorsteuer", f"€{result.input_vat_cents / 100:,.2f}")
+col_pay.metric(
+    "Zahllast" if result.payable_cents >= 0 else "Gutschrift",
+    f"€{abs(result.payable_cents) / 100:,.2f}",
+)
+
+if result.unresolved_ids:
+    st.warning(
+        f"{len(result.unresolved_ids)} Gutschrift(en) ohne Steueraufschlüsselung sind nicht enthalten. "
+        "Bitte in den Details ergänzen."
+    )
+undated = undated_receipt_ids()
+if undated:
+    st.warning(f"{len(undated)} Beleg(e) ohne lesbares Datum fallen in keinen Zeitraum.")
+
+
+def receipts_table(receipt_ids: list[str]) -> pd.DataFrame:
+    receipts = receipt_repo.get_receipts_by_ids(receipt_ids)
+    return pd.DataFrame(
+        [
+            {
+                "date": r.date,
+                "company_name": r.company_name,
+                "location": get_location(r.__dict__),
+                "total_net_amount": r.total_net_amount,
+                "vat_amount": r.vat_amount,
+                "total_gross_amount": r.total_gross_amount,
+                "tax_summary": ", ".join(f"{rate}%" for rate in (r.tax_summary or {})) if isinstance(r.tax_summary, dict) else "",
+                "unresolved": r.id in result.unresolved_ids,
+                "Details": f"/receipt_detail?id={quote_plus(str(r.id))}",
+            }
+            for r in receipts
+        ]
+    )
+
+
+column_config = {
+    "date": "📅 Date",
+    "company_name": "🏢 Company",
+    "location": "Verkaufsort",
+    "total_net_amount": st.column_config.NumberColumn("Netto (€)", format="euro"),
+    "vat_amount": st.column_config.NumberColumn("USt. (€)", format="euro"),
+    "total_gross_amount": st.column_config.NumberColumn("Brutto (€)", format="euro"),
+    "tax_summary": "Steuersätze",
+    "unresolved": "⚠️ Ohne Aufschlüsselung",
+    "Details": st.column_config.LinkColumn("🔍 Details", display_text="Edit"),
+}
+
+with st.expander(f"Einnahmen ({len(result.credit_ids)})"):
+    if result.credit_ids:
+        st.dataframe(receipts_table(result.credit_ids), column_config=column_config, hide_index=True, use_container_width=True)
+with st.expander(f"Ausgaben ({len(result.expense_ids)})"):
+    if result.expense_ids:
+        st.dataframe(
+            receipts_table(result.expense_ids).drop(columns=["tax_summary", "unresolved"]),
+            column_config=column_config,
+            hide_index=True,
+            use_container_width=True,
+        )
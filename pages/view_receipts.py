@@ -9,8 +9,12 @@ from streamlit_pdf_viewer import pdf_viewer
 
 from components.input import get_receipt_inputs
 from components.product_db_ops import get_products_counts
-from pages.utils import get_location
-from repository.receipt_repository import ReceiptDB, ReceiptRepository
+from pages.cached_data import load_companies, load_distinct_receipt_values, load_receipt_count
+from pages.utils import get_location, sum_euros_by
+from receipt_parser.taxation import DEFAULT_RATES
+from repository.archive import archived_years, archived_years_between
+from repository.read_models import receipts_frame
+from repository.receipt_repository import ReceiptDB, ReceiptFilter, ReceiptRepository, export_clauses
 
 # Initialize the database connection
 receipt_repo = ReceiptRepository()
@@ -24,8 +28,25 @@ def init_session_state():
 init_session_state()
 
 
-def get_cached_receipts():
-    return receipt_repo.get_all_receipts()
+# Receipt attributes shown in the table, in this order
+TABLE_COLUMNS = [
+    "date",
+    "company_name",
+    "total_gross_amount",
+    "total_net_amount",
+    "vat_amount",
+    "source",
+    "is_credit",
+    "is_bio",
+    "description",
+    "comment",
+]
+
+
+def receipts_to_df(receipts: list[ReceiptDB]) -> pd.DataFrame:
+    df = pd.DataFrame([[getattr(r, column) for column in TABLE_COLUMNS] for r in receipts], columns=TABLE_COLUMNS)
+    df["source"] = df["source"].fillna("RECEIPT_SCANNER")
+    return df
 
 
 def receipt_has_missing_products(receipt: ReceiptDB, product_dict: dict):
@@ -38,66 +59,79 @@ def receipt_has_missing_products(receipt: ReceiptDB, product_dict: dict):
     return not (should_contain_product and does_contain) or (not should_contain_product)
 
 
-# Fetch all receipts (cached)
-receipts = get_cached_receipts()
-products_count = {receipt_id: count for receipt_id, count in get_products_counts()}
+def _option_value(option):
+    return None if option == "All" else option
+
+
+# --- Filter UI ---
+st.sidebar.header("Filter Receipts")
+is_credit_filter = st.sidebar.selectbox(
+    "Einnahme (is_credit)", options=["All", True, False], index=0
+)
+is_bio_filter = st.sidebar.selectbox(
+    "Biokontrolle (is_bio)", options=["All", True, False], index=0
+)
+comment_filter = st.sidebar.selectbox(
+    "Kommentar", options=["All", "Has Comment", "No Comment"], index=0
+)
+companies = load_companies()
+company_filter = st.sidebar.selectbox(
+    "Company", options=["All", *companies], index=0, format_func=lambda option: companies.get(option, option)
+)
+products_filter = st.sidebar.selectbox(
+    "Missing Products", options=["All", True, False], index=0
+)
+source_filter = st.sidebar.selectbox(
+    "Quelle",
+    options=["All"] + load_distinct_receipt_values("source"),
+    index=0,
+)
+receipt_filter = ReceiptFilter(
+    is_credit=_option_value(is_credit_filter),
+    is_bio=_option_value(is_bio_filter),
+    has_comment={"All": None, "Has Comment": True, "No Comment": False}[comment_filter],
+    company_id=_option_value(company_filter),
+    source=_option_value(source_filter),
+    missing_products=_option_value(products_filter),
+)
+page_order = st.sidebar.selectbox(
+    "Sort by",
+    options=["created_on", "receipt_date"],
+    index=0,
+    format_func={"created_on": "Added", "receipt_date": "📅 Date"}.get,
+)
+page_size = st.sidebar.selectbox("Receipts per page", options=[50, 100, 250, 500], index=1)
+
+# Cursors of the pages shown so far; start over when the filters or the order change
+page_key = (receipt_filter, page_order, page_size)
+if st.session_state.get("receipts_page_key") != page_key:
+    st.session_state["receipts_page_key"] = page_key
+    st.session_state["receipts_page_cursors"] = [None]
+cursors = st.session_state["receipts_page_cursors"]
+
+total_count = load_receipt_count()
+receipt_count = load_receipt_count(receipt_filter)
+page = receipt_repo.get_receipts_page(receipt_filter, after=cursors[-1], limit=page_size, order_by=page_order)
+receipts = page.receipts
 
 # Streamlit UI
-st.title(f"View and Edit Receipts ({len(receipts)})")
+st.title(f"View and Edit Receipts ({total_count})")
 if st.button("🔃"):
     st.rerun()
 
 if receipts:
+    products_count = {
+        receipt_id: count
+        for receipt_id, count in get_products_counts([r.id for r in receipts])
+    }
     # Convert receipts to DataFrame
-    df = pd.DataFrame([r.__dict__ for r in receipts]).drop("_sa_instance_state", axis=1)
-    df["Details"] = [
+    filtered_df = receipts_to_df(receipts)
+    filtered_df["Details"] = [
         f"/receipt_detail?id={quote_plus(str(r.id))}" for r in receipts
     ]  # Clickable links
-    df["progress"] = df["total_gross_amount"]
-    df["source"] = [r.source or "RECEIPT_SCANNER" for r in receipts]
-    df["products"] = [receipt_has_missing_products(r, products_count) for r in receipts]
-
-    # --- Filter UI ---
-    st.sidebar.header("Filter Receipts")
-    is_credit_filter = st.sidebar.selectbox(
-        "Einnahme (is_credit)", options=["All", True, False], index=0
-    )
-    is_bio_filter = st.sidebar.selectbox(
-        "Biokontrolle (is_bio)", options=["All", True, False], index=0
-    )
-    comment_filter = st.sidebar.selectbox(
-        "Kommentar", options=["All", "Has Comment", "No Comment"], index=0
-    )
-    company_options = ["All"] + sorted(df["company_name"].dropna().unique().tolist())
-    company_filter = st.sidebar.selectbox("Company", options=company_options, index=0)
-    products_filter = st.sidebar.selectbox(
-        "Missing Products", options=["All", True, False], index=0
-    )
-    source_filter = st.sidebar.selectbox(
-        "Quelle",
-        options=["All"] + sorted(df["source"].dropna().unique().tolist()),
-        index=0,
-    )
-    filtered_df = df.copy()
-    if is_credit_filter != "All":
-        filtered_df = filtered_df[filtered_df["is_credit"] == is_credit_filter]
-    if is_bio_filter != "All":
-        filtered_df = filtered_df[filtered_df["is_bio"] == is_bio_filter]
-    if comment_filter == "Has Comment":
-        filtered_df = filtered_df[
-            filtered_df["comment"].notnull() & (filtered_df["comment"] != "")
-        ]
-    elif comment_filter == "No Comment":
-        filtered_df = filtered_df[
-            filtered_df["comment"].isnull() | (filtered_df["comment"] == "")
-        ]
-    if company_filter != "All":
-        filtered_df = filtered_df[filtered_df["company_name"] == company_filter]
-
-    if products_filter != "All":
-        filtered_df = filtered_df[filtered_df["products"] == products_filter]
-    if source_filter != "All":
-        filtered_df = filtered_df[filtered_df["source"] == source_filter]
+    filtered_df["progress"] = filtered_df["total_gross_amount"]
+    filtered_df["products"] = [receipt_has_missing_products(r, products_count) for r in receipts]
+
     main_cols = [
         "date",
         "company_name",
@@ -115,11 +149,6 @@ if receipts:
             [*main_cols, *[col for col in filtered_df.columns if col not in main_cols]]
         ),
         column_config={
-            "id": None,
-            "updated_on": None,
-            "created_on": None,
-            "receipt_number": None,
-            "file_paths": None,
             "date": "📅 Date",
             "total_gross_amount": st.column_config.NumberColumn(
                 "💰 Brutto (€)", format="euro"
@@ -146,10 +175,26 @@ if receipts:
         use_container_width=True,
     )
 
+    page_number = len(cursors)
+    first_shown = (page_number - 1) * page_size + 1
+    prev_col, info_col, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        if st.button("◀ Previous", disabled=page_number == 1):
+            cursors.pop()
+            st.rerun()
+    with info_col:
+        st.caption(
+            f"Page {page_number}: receipts {first_shown}–{first_shown + len(receipts) - 1} of {receipt_count}"
+        )
+    with next_col:
+        if st.button("Next ▶", disabled=page.next_cursor is None):
+            cursors.append(page.next_cursor)
+            st.rerun()
+
     # Sidebar for details
     receipt_id = st.session_state.get("selected_receipt")
     if receipt_id:
-        receipt = next((r for r in receipts if r.id == receipt_id), None)
+        receipt = receipt_repo.get_receipt_by_id(receipt_id)
         if receipt:
             st.sidebar.header("Receipt Details")
             st.sidebar.markdown(f"**Date:** {receipt.date}")
@@ -191,16 +236,20 @@ if receipts:
                 receipt_repo.update_receipt(receipt_id, updated_receipt)
                 st.success("Changes saved successfully!")
                 st.rerun()
-    # CSV and ZIP export buttons
+elif total_count:
+    st.write("No receipts match the filters.")
+
+if total_count:
+    # CSV and ZIP export buttons cover all receipts including the archived years, loaded only when requested
     if st.button("Download Data as CSV"):
-        csv_data = df.to_csv(index=False).encode("utf-8")
+        csv_data = receipts_frame(archive_years=archived_years()).to_csv(index=False).encode("utf-8")
         st.download_button("📥 Download CSV", csv_data, "receipts_data.csv", "text/csv")
 
     if st.button("Download Files as ZIP"):
         zip_buffer = io.BytesIO()
         with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            for receipt in receipts:
-                for file_path in receipt.file_paths:
+            for file_paths in receipts_frame(archive_years=archived_years())["file_paths"]:
+                for file_path in file_paths or []:
                     if os.path.exists(file_path):
                         zip_file.write(file_path, os.path.basename(file_path))
         zip_buffer.seek(0)
@@ -253,41 +302,24 @@ if receipts:
         }
 
         # Filter by created_on date and/or receipt date
-        df_to_export = df.copy()
-
-        if min_created_date or min_receipt_date or max_receipt_date:
-            df_to_export["created_on"] = pd.to_datetime(df_to_export["created_on"])
-            df_to_export["date"] = pd.to_datetime(df_to_export["date"], format="mixed")
-
-            # Create filter conditions
-            conditions = []
-
-            if min_created_date:
-                conditions.append(
-                    df_to_export["created_on"].dt.date >= min_created_date
-                )
-
-            if min_receipt_date:
-                conditions.append(df_to_export["date"].dt.date >= min_receipt_date)
-
-            # Combine conditions with OR logic
-            if len(conditions) == 2:
-                combined_filter = conditions[0] | conditions[1]
-            else:
-                combined_filter = conditions[0]
-
-            df_to_export = df_to_export[combined_filter] if not max_receipt_date else df_to_export[
-                (combined_filter) & (df_to_export["date"].dt.date <= max_receipt_date)
-            ]
-        else:
+        df_to_export = receipts_frame(
+            *export_clauses(
+                created_since=min_created_date,
+                date_from=min_receipt_date,
+                date_to=max_receipt_date,
+            ),
+            archive_years=archived_years_between(min_receipt_date, max_receipt_date),
+            vat_rates=DEFAULT_RATES,
+        )
+        if not (min_created_date or min_receipt_date or max_receipt_date):
             st.info(f"Exporting all {len(df_to_export)} receipts")
+        undated = df_to_export["receipt_date"].isna().sum()
+        if undated:
+            st.warning(f"{undated} receipts have no readable date and are exported without one.")
+        df_to_export["date"] = pd.to_datetime(df_to_export["receipt_date"])
 
         # Aggregat einnahmen
         df_to_export["location"] = df_to_export.apply(get_location, axis=1)
-        for rate in [10, 13, 20]:
-            df_to_export[f"vat_{rate}"] = df_to_export["tax_summary"].apply(
-                lambda ts: (ts or {}).get(str(rate), {}).get("tax_sum", 0.0) if isinstance(ts, dict) else 0.0
-            )
         df_export = (
             df_to_export[list(col_rename_mapping.keys())]
             .rename(columns=col_rename_mapping)
@@ -298,9 +330,9 @@ if receipts:
 
         # Drop Einnahme column for export
         df_einnahmen = df_einnahmen.drop(columns="Einnahme")
-        df_einnahmen_agg = df_einnahmen.groupby("Verkaufsort")[
-            ["USt.", "USt. 10%", "USt. 13%", "USt. 20%", "Netto", "Brutto"]
-        ].sum()
+        df_einnahmen_agg = sum_euros_by(
+            df_einnahmen, "Verkaufsort", ["USt.", "USt. 10%", "USt. 13%", "USt. 20%", "Netto", "Brutto"]
+        )
         df_ausgaben = df_ausgaben.drop(columns="Einnahme")
 
         # Export to Excel in-memory
@@ -0,0 +1,63 @@
+"""Parsing of the free-text receipt dates and the reporting periods they fall into.
+
+Receipt dates are stored as extracted (e.g. "2025-03-14", "14.03.2025", "14.03.25").
+Dotted and slashed dates are read day first, as printed on Austrian receipts.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import Optional
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%Y/%m/%d", "%Y.%m.%d")
+
+
+def parse_receipt_date(value) -> Optional[datetime.date]:
+    """Parse a stored receipt date. Returns None for empty or unreadable values."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    try:
+        # Timestamps like 2025-03-14T10:22:00
+        return datetime.datetime.fromisoformat(text).date()
+    except ValueError:
+        return None
+
+
+def month_key(day: datetime.date) -> str:
+    return f"{day.year}-{day.month:02d}"
+
+
+def quarter_key(day: datetime.date) -> str:
+    return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+
+
+def period_keys(day: Optional[datetime.date]) -> list[str]:
+    """Keys of the month and the quarter containing day."""
+    return [month_key(day), quarter_key(day)] if day else []
+
+
+def period_range(key: str) -> tuple[datetime.date, datetime.date]:
+    """First day and the day after the last day of a period key like '2025-03' or '2025-Q1'."""
+    year, part = key.split("-")
+    if part.startswith("Q"):
+        first_month = (int(part[1:]) - 1) * 3 + 1
+        months = 3
+    else:
+        first_month = int(part)
+        months = 1
+    start = datetime.date(int(year), first_month, 1)
+    end_month = first_month + months
+    end = datetime.date(int(year) + (end_month - 1) // 12, (end_month - 1) % 12 + 1, 1)
+    return start, end
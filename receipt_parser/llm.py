@@ -1,6 +1,7 @@
 import base64
 import hashlib
 import json
+import threading
 from enum import Enum
 from io import BytesIO
 from pathlib import Path
@@ -10,11 +11,16 @@ from openai import OpenAI
 from PIL import Image, ImageOps
 from pillow_heif import register_heif_opener
 
-from models.receipt import Receipt
+from models.product import ProductPriceList
+from models.receipt import Receipt, ReceiptTranscription
 from models.tax import TaxSummaryModel
+from receipt_parser.stitching import split_into_tiles, stitch_images
+from receipt_parser.taxation import build_receipt_tax_summary, solve_mixed_rates
 
 register_heif_opener()
 client = OpenAI()
+# cache.json is read and rewritten on every query, extractions may run in parallel threads
+_cache_lock = threading.Lock()
 
 
 class Prompt(Enum):
@@ -40,6 +46,34 @@ def encode_pdf(pdf_path, scale_factor):
     return base64_images
 
 
+def encode_tile(img):
+    """Encode an already tiled image as is, without the 1920x1080 thumbnail box."""
+    buffered = BytesIO()
+    img.convert("RGB").save(buffered, format="JPEG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def encode_images(img_paths: list[str], scale_factor, stitch=False) -> list[str]:
+    """Encode images and PDF pages for the model.
+
+    With stitch=True the photos are treated as overlapping shots of one long receipt:
+    they are stitched into one image without the overlaps and cut into model-sized tiles.
+    """
+    photo_paths = [p for p in img_paths if not p.endswith(".pdf")]
+    if stitch and len(photo_paths) > 1:
+        stitched = stitch_images([Image.open(p) for p in photo_paths])
+        base64_images = [encode_tile(tile) for tile in split_into_tiles(stitched)]
+    else:
+        base64_images = [encode_image(Image.open(p), scale_factor) for p in photo_paths]
+    base64_images += [
+        base64_image
+        for pdf_path in img_paths
+        if pdf_path.endswith(".pdf")
+        for base64_image in encode_pdf(pdf_path, scale_factor)
+    ]
+    return base64_images
+
+
 def get_prompt_text(prompt_type, custom_prompt=None):
     if prompt_type == Prompt.CUSTOM:
         return custom_prompt
@@ -63,20 +97,13 @@ def get_prompt_text(prompt_type, custom_prompt=None):
 
 
 def get_prompt(
-    img_paths: list[str], prompt_type: Prompt, custom_prompt: str | None, img_scale_factor=1
+    img_paths: list[str], prompt_type: Prompt, custom_prompt: str | None, img_scale_factor=1, stitch=False
 ) -> dict:
-    base64_images = [
-        encode_image(Image.open(img_path), img_scale_factor)
-        for img_path in img_paths
-        if not img_path.endswith(".pdf")
-    ]
-    base64_images += [
-        base64_image
-        for pdf_path in img_paths
-        if pdf_path.endswith(".pdf")
-        for base64_image in encode_pdf(pdf_path, img_scale_factor)
-    ]
-    print(get_prompt_text(prompt_type, custom_prompt))
+    base64_images = encode_images(img_paths, img_scale_factor, stitch)
+    prompt_text = get_prompt_text(prompt_type, custom_prompt)
+    if stitch:
+        prompt_text += " Note: The images are consecutive parts of ONE long receipt, from top to bottom. Extract it as a single receipt."
+    print(prompt_text)
     return {
         "model": "gpt-4.1",
         # "response_format": {"type": "json_object"},
@@ -103,6 +130,7 @@ def get_prompt(
                 "1. The receipt is relevant for organic monitoring (is_bio is true, and is_credit is false). "
                 "2. The receipt lists sold cheese products (only if is_credit is true). Leave bio_category empty."
                 "Leave the products empty if the receipt is not relevant for organic monitoring or does not list sold cheese products."
+                "Always fill 'transcription' with a plain-text transcription of the whole receipt, line by line, as it is printed or written."
                 "",
             },
             {
@@ -110,7 +138,7 @@ def get_prompt(
                 "content": [
                     {
                         "type": "input_text",
-                        "text": get_prompt_text(prompt_type, custom_prompt),
+                        "text": prompt_text,
                     },
                     *[
                         {
@@ -131,41 +159,34 @@ def get_prompt(
 def query_openai(query_dict: dict):
     dict_wo_text_format = query_dict.copy()
     dict_wo_text_format.pop("text_format", None)
-    if not Path("cache.json").exists():
-        empty_dict = {}
-        Path("cache.json").write_text(json.dumps(empty_dict))
-
-    cache = json.loads(Path("cache.json").read_text())
     hashed = hashlib.md5(json.dumps(dict_wo_text_format).encode()).hexdigest()
-    if hashed in cache:
-        print("Cache hit!")
-        return cache[hashed]
-    else:
-        response = client.responses.parse(**query_dict)
-        response_string = response.output_text
+    with _cache_lock:
+        if not Path("cache.json").exists():
+            empty_dict = {}
+            Path("cache.json").write_text(json.dumps(empty_dict))
+
+        cache = json.loads(Path("cache.json").read_text())
+        if hashed in cache:
+            print("Cache hit!")
+            return cache[hashed]
 
+    response = client.responses.parse(**query_dict)
+    response_string = response.output_text
+
+    with _cache_lock:
+        cache = json.loads(Path("cache.json").read_text())
         cache[hashed] = response_string
         Path("cache.json").write_text(json.dumps(cache))
-        return response_string
+    return response_string
 
 
-def extract_tax_summary(img_paths: list[str], receipt_data: dict) -> dict:
+def extract_tax_summary(img_paths: list[str], receipt_data: dict, stitch=False) -> dict:
     """Query the LLM with receipt images to extract a tax summary.
 
     receipt_data should contain known fields (total_gross_amount, total_net_amount, vat_amount).
     Returns a dict with 'has_mixed_taxes' and 'tax_summary', or empty dict on failure.
     """
-    base64_images = [
-        encode_image(Image.open(p), 1)
-        for p in img_paths
-        if not p.endswith(".pdf")
-    ]
-    base64_images += [
-        img
-        for p in img_paths
-        if p.endswith(".pdf")
-        for img in encode_pdf(p, 1)
-    ]
+    base64_images = encode_images(img_paths, 1, stitch)
 
     known = {k: receipt_data[k] for k in ("total_gross_amount", "total_net_amount", "vat_amount") if k in receipt_data}
     query = {
@@ -196,9 +217,85 @@ def extract_tax_summary(img_paths: list[str], receipt_data: dict) -> dict:
         return {}
 
 
-def extract_receipt_data(img_paths: list[str], prompt_type: Prompt, custom_prompt: str | None, img_scale_factor=1) -> dict:
-    """Run primary extraction and if tax_summary missing, issue a focused follow-up query to extract tax_summary."""
-    primary = query_openai(get_prompt(img_paths, prompt_type, custom_prompt, img_scale_factor))
+def extract_product_prices(img_paths: list[str], product_names: list[str]) -> dict[str, float]:
+    """Re-read only the unit prices of the given product lines, in high resolution.
+
+    Used for lines whose extracted price looks implausible compared to the price history.
+    Returns a dict mapping product name -> price for the prices that could be read.
+    """
+    base64_images = encode_images(img_paths, 2)
+
+    query = {
+        "model": "gpt-4.1",
+        "input": [
+            {"role": "system", "content": "Return only the requested structured prices. Do not add extra text."},
+            {"role": "user", "content": [
+                {"type": "input_text", "text": (
+                    "Read the unit price of ONLY these product lines from the receipt: "
+                    f"{json.dumps(product_names, ensure_ascii=False)}. "
+                    "Look carefully at the decimal separator (German receipts use a comma, e.g. 12,90 is 12.90). "
+                    "Return the names exactly as given. If a price cannot be read, return null."
+                )},
+                *[{"type": "input_image", "image_url": f"data:image/jpeg;base64,{img}", "detail": "high"} for img in base64_images],
+            ]},
+        ],
+        "text_format": ProductPriceList,
+    }
+
+    result = query_openai(query)
+    try:
+        parsed = ProductPriceList.model_validate_json(result)
+        return {p.name: p.price for p in parsed.prices if p.price is not None}
+    except Exception:
+        return {}
+
+
+def transcribe_receipt(img_paths: list[str]) -> str | None:
+    """Cheap follow-up query that only returns a plain-text transcription of the receipt.
+
+    Used for receipts that were extracted before transcriptions were stored.
+    """
+    base64_images = encode_images(img_paths, 1)
+    if not base64_images:
+        return None
+
+    query = {
+        "model": "gpt-4.1-mini",
+        "input": [
+            {"role": "system", "content": "You transcribe German receipts. Return only the requested structured output."},
+            {"role": "user", "content": [
+                {"type": "input_text", "text": (
+                    "Transcribe everything printed or handwritten on this receipt as plain text, line by line. "
+                    "Do not summarize or correct anything."
+                )},
+                *[{"type": "input_image", "image_url": f"data:image/jpeg;base64,{img}"} for img in base64_images],
+            ]},
+        ],
+        "text_format": ReceiptTranscription,
+    }
+
+    result = query_openai(query)
+    try:
+        return ReceiptTranscription.model_validate_json(result).transcription
+    except Exception:
+        return None
+
+
+def _product_lines(products: list[dict]) -> list[tuple[float | None, int | None]]:
+    """(line amount, tax rate) of the extracted products, as solve_mixed_rates takes them."""
+    return [
+        (
+            p["amount"] * p["price"] if p.get("amount") is not None and p.get("price") is not None else None,
+            p.get("tax_rate"),
+        )
+        for p in products
+    ]
+
+
+def extract_receipt_data(img_paths: list[str], prompt_type: Prompt, custom_prompt: str | None, img_scale_factor=1, stitch=False) -> dict:
+    """Run primary extraction and if tax_summary missing, derive it from the totals and product lines.
+    Only if that is ambiguous or impossible, issue a focused follow-up query to extract tax_summary."""
+    primary = query_openai(get_prompt(img_paths, prompt_type, custom_prompt, img_scale_factor, stitch))
     try:
         parsed = json.loads(primary)
     except Exception:
@@ -207,7 +304,32 @@ def extract_receipt_data(img_paths: list[str], prompt_type: Prompt, custom_promp
     if parsed.get("tax_summary") or not parsed.get("is_credit"):
         return parsed
 
-    follow_parsed = extract_tax_summary(img_paths, parsed)
+    # The solver before the single-rate shortcut: totals of a mixed receipt can fit one rate
+    # by chance, only the lines tell them apart
+    products = parsed.get("products") or []
+    totals = (parsed.get("total_gross_amount"), parsed.get("total_net_amount"), parsed.get("vat_amount"))
+    solved = solve_mixed_rates(*totals, _product_lines(products))
+    unpriced = [p["name"] for p in products if p.get("price") is None and p.get("tax_rate") is not None]
+    if solved.status != "unique" and unpriced:
+        # Lines with a rate but no price cannot split the totals; re-read just their prices
+        prices = extract_product_prices(img_paths, unpriced)
+        for p in products:
+            if p.get("price") is None and p["name"] in prices:
+                p["price"] = prices[p["name"]]
+        solved = solve_mixed_rates(*totals, _product_lines(products))
+    if solved.status == "unique":
+        parsed["tax_summary"] = solved.tax_summary
+        parsed["has_mixed_taxes"] = len(solved.tax_summary) > 1
+        return parsed
+
+    # Totals that do not quite add up can still match one rate, unless lines say otherwise
+    if solved.status == "unsolvable" and not any(p.get("tax_rate") is not None for p in products):
+        single = build_receipt_tax_summary(parsed)
+        if single["tax_summary"]:
+            parsed.update(single)
+            return parsed
+
+    follow_parsed = extract_tax_summary(img_paths, parsed, stitch)
     parsed["tax_summary"] = follow_parsed.get("tax_summary")
     parsed["has_mixed_taxes"] = follow_parsed.get("has_mixed_taxes", parsed.get("has_mixed_taxes"))
     return parsed
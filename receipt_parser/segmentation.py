@@ -0,0 +1,132 @@
+"""Detect several receipts photographed side by side in one image.
+
+Receipts are bright paper on a (usually darker) table. The image is downscaled,
+thresholded with Otsu's method and the connected paper regions are collected as
+bounding boxes, which can then be cropped into separate receipts.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+# Longest edge of the working copy used for detection
+DETECTION_SIZE = 400
+# Regions smaller than this fraction of the image are ignored (price tags, noise)
+MIN_AREA_FRACTION = 0.03
+# Paper regions are roughly rectangular, so they fill most of their bounding box
+MIN_FILL_RATIO = 0.5
+# Padding around each crop, relative to the crop size
+CROP_PADDING = 0.02
+
+Box = tuple[int, int, int, int]  # left, top, right, bottom in image pixels
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(hist)
+    means = np.cumsum(hist * np.arange(256))
+    total_weight, total_mean = weights[-1], means[-1]
+    background = weights[:-1]
+    foreground = total_weight - background
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(255)
+    between[valid] = (
+        total_mean * background[valid] - means[:-1][valid] * total_weight
+    ) ** 2 / (background[valid] * foreground[valid])
+    return int(np.argmax(between))
+
+
+def _label_regions(mask: np.ndarray) -> list[dict]:
+    """Connected components (4-connectivity) of a boolean mask using row runs and union-find."""
+    parent: list[int] = []
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    runs = []  # (row, start, end, run_id), end exclusive
+    previous_row: list[tuple[int, int, int]] = []
+    for y, row in enumerate(mask):
+        padded = np.concatenate(([False], row, [False]))
+        changes = np.flatnonzero(padded[1:] != padded[:-1])
+        current_row = []
+        for start, end in zip(changes[::2], changes[1::2]):
+            run_id = len(parent)
+            parent.append(run_id)
+            for prev_start, prev_end, prev_id in previous_row:
+                if prev_start < end and start < prev_end:
+                    root_a, root_b = find(run_id), find(prev_id)
+                    if root_a != root_b:
+                        parent[root_b] = root_a
+            current_row.append((int(start), int(end), run_id))
+            runs.append((y, int(start), int(end), run_id))
+        previous_row = current_row
+
+    regions: dict[int, dict] = {}
+    for y, start, end, run_id in runs:
+        root = find(run_id)
+        region = regions.setdefault(
+            root, {"left": start, "top": y, "right": end, "bottom": y + 1, "area": 0}
+        )
+        region["left"] = min(region["left"], start)
+        region["right"] = max(region["right"], end)
+        region["bottom"] = y + 1
+        region["area"] += end - start
+    return list(regions.values())
+
+
+def find_receipt_regions(img: Image.Image) -> list[Box]:
+    """
+    Find separate paper regions in a photo.
+    Args:
+        img: PIL image of the photo (EXIF orientation is applied here)
+    Returns:
+        List of bounding boxes in pixel coordinates of the oriented image, sorted
+        top-to-bottom and left-to-right. A single box means there is nothing to split.
+    """
+    img = ImageOps.exif_transpose(img)
+    width, height = img.size
+    small = img.convert("L")
+    small.thumbnail((DETECTION_SIZE, DETECTION_SIZE))
+    small = small.filter(ImageFilter.GaussianBlur(2))
+    gray = np.asarray(small)
+
+    mask_img = Image.fromarray(((gray > _otsu_threshold(gray)) * 255).astype(np.uint8))
+    # Closing joins the printed text into the paper, opening removes small specks
+    mask_img = mask_img.filter(ImageFilter.MaxFilter(5)).filter(ImageFilter.MinFilter(5))
+    mask_img = mask_img.filter(ImageFilter.MinFilter(5)).filter(ImageFilter.MaxFilter(5))
+    mask = np.asarray(mask_img) > 0
+
+    min_area = MIN_AREA_FRACTION * mask.size
+    regions = [
+        r
+        for r in _label_regions(mask)
+        if r["area"] >= min_area
+        and r["area"] >= MIN_FILL_RATIO * (r["right"] - r["left"]) * (r["bottom"] - r["top"])
+    ]
+    if len(regions) < 2:
+        return [(0, 0, width, height)]
+
+    scale_x, scale_y = width / mask.shape[1], height / mask.shape[0]
+    boxes = []
+    for r in regions:
+        pad_x = CROP_PADDING * (r["right"] - r["left"]) * scale_x
+        pad_y = CROP_PADDING * (r["bottom"] - r["top"]) * scale_y
+        boxes.append(
+            (
+                max(0, int(r["left"] * scale_x - pad_x)),
+                max(0, int(r["top"] * scale_y - pad_y)),
+                min(width, int(r["right"] * scale_x + pad_x)),
+                min(height, int(r["bottom"] * scale_y + pad_y)),
+            )
+        )
+    return sorted(boxes, key=lambda b: (b[1] // (height // 4 or 1), b[0]))
+
+
+def crop_regions(img: Image.Image, boxes: list[Box]) -> list[Image.Image]:
+    """Crop the regions returned by find_receipt_regions out of the (oriented) image."""
+    img = ImageOps.exif_transpose(img)
+    return [img.crop(box) for box in boxes]
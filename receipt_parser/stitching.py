@@ -0,0 +1,120 @@
+"""Stitch overlapping photos of one long receipt and tile the result for the model.
+
+Long receipts are photographed top to bottom in several overlapping shots. The
+overlap between consecutive shots is found by matching row profiles (mean
+darkness per pixel row) and then verified on the downscaled images, so the
+overlapping lines are only sent (and extracted) once.
+
+For high-detail images the model scales the short side to 768 px and bills
+512 px tiles. A tall receipt squeezed into one image would become unreadable,
+so the stitched image is cut into pieces of that width instead.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Width used for matching the photos against each other
+MATCH_WIDTH = 256
+# Overlap between consecutive photos, relative to the height of the shorter one
+MIN_OVERLAP_FRACTION = 0.05
+MAX_OVERLAP_FRACTION = 0.6
+# Minimum normalized cross-correlation for an overlap to be accepted
+MIN_MATCH_SCORE = 0.8
+# Number of row-profile candidates verified on the full 2D overlap
+PROFILE_CANDIDATES = 5
+
+# The model scales the short side of an image to 768 px and cuts it into 512 px tiles
+TILE_WIDTH = 768
+# 768 x 1536 is exactly 2 x 3 tiles of 512 px
+MAX_TILE_ASPECT = 2.0
+# Cuts are moved to the emptiest row within this fraction of the tile height
+CUT_SEARCH_FRACTION = 0.1
+
+
+def _ncc(a: np.ndarray, b: np.ndarray) -> float:
+    a = a - a.mean()
+    b = b - b.mean()
+    denominator = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / denominator) if denominator else 0.0
+
+
+def _resize_to_width(img: Image.Image, width: int) -> Image.Image:
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.LANCZOS)
+
+
+def find_overlap(upper: Image.Image, lower: Image.Image) -> int:
+    """
+    Find how many rows at the bottom of `upper` show the same content as the top of `lower`.
+    Both images must have the same width.
+    Returns:
+        Number of overlapping rows in pixels of the given images, 0 if no overlap was found.
+    """
+    scale = MATCH_WIDTH / upper.width
+    upper_gray = np.asarray(_resize_to_width(upper.convert("L"), MATCH_WIDTH), dtype=np.float64)
+    lower_gray = np.asarray(_resize_to_width(lower.convert("L"), MATCH_WIDTH), dtype=np.float64)
+    upper_profile = upper_gray.mean(axis=1)
+    lower_profile = lower_gray.mean(axis=1)
+
+    shorter = min(len(upper_profile), len(lower_profile))
+    min_overlap = max(8, int(MIN_OVERLAP_FRACTION * shorter))
+    max_overlap = int(MAX_OVERLAP_FRACTION * shorter)
+    if max_overlap <= min_overlap:
+        return 0
+
+    profile_scores = [
+        (_ncc(upper_profile[-k:], lower_profile[:k]), k)
+        for k in range(min_overlap, max_overlap + 1)
+    ]
+    candidates = sorted(profile_scores, reverse=True)[:PROFILE_CANDIDATES]
+
+    best_score, best_overlap = max(
+        (_ncc(upper_gray[-k:], lower_gray[:k]), k) for _, k in candidates
+    )
+    if best_score < MIN_MATCH_SCORE:
+        return 0
+    return round(best_overlap / scale)
+
+
+def stitch_images(images: list[Image.Image]) -> Image.Image:
+    """Stitch photos of one receipt (top to bottom) into one tall image without the overlaps."""
+    images = [ImageOps.exif_transpose(img).convert("RGB") for img in images]
+    width = min(img.width for img in images)
+    images = [_resize_to_width(img, width) if img.width != width else img for img in images]
+
+    parts = [images[0]]
+    for upper, lower in zip(images, images[1:]):
+        overlap = find_overlap(upper, lower)
+        parts.append(lower.crop((0, overlap, width, lower.height)))
+
+    stitched = Image.new("RGB", (width, sum(part.height for part in parts)), "white")
+    top = 0
+    for part in parts:
+        stitched.paste(part, (0, top))
+        top += part.height
+    return stitched
+
+
+def split_into_tiles(img: Image.Image) -> list[Image.Image]:
+    """
+    Cut a tall image into pieces that match the model's image tiling.
+    The image is scaled to TILE_WIDTH and cut every TILE_WIDTH * MAX_TILE_ASPECT rows,
+    with each cut moved to the emptiest row nearby so no text line is split.
+    """
+    if img.width > TILE_WIDTH:
+        img = _resize_to_width(img, TILE_WIDTH)
+    max_height = int(img.width * MAX_TILE_ASPECT)
+    if img.height <= max_height:
+        return [img]
+
+    darkness = 255 - np.asarray(img.convert("L"), dtype=np.float64).mean(axis=1)
+    search = int(CUT_SEARCH_FRACTION * max_height)
+    cuts = [0]
+    while img.height - cuts[-1] > max_height:
+        target = cuts[-1] + max_height
+        window = darkness[target - search : target]
+        cuts.append(target - search + int(np.argmin(window)))
+    cuts.append(img.height)
+    return [img.crop((0, top, img.width, bottom)) for top, bottom in zip(cuts, cuts[1:])]
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict, List, Optional
+import math
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Tuple
 
-from models.tax import TaxValidationResult
+import numpy as np
+
+from models.tax import TaxSolveResult, TaxValidationResult
+from receipt_parser.money import div_half_up, to_cents, to_cents_array
 
 
 DEFAULT_RATES = [10, 13, 20]
+# Product lines of one rate may add up to slightly more than the receipt's amount at that rate (discounts)
+LINE_SLACK = 0.02
 
 
 def _round(value: float) -> float:
     """Round to 2 decimal places using round-half-up (standard for currency)."""
-    return float(Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+    return to_cents(value) / 100
 
 
 def infer_single_rate_from_totals(
@@ -78,6 +85,310 @@ def build_receipt_tax_summary(
     return {"has_mixed_taxes": False, "tax_summary": {}}
 
 
+def _round_array(values: np.ndarray) -> np.ndarray:
+    return to_cents_array(values) / 100.0
+
+
+# Rounding to the cent moves a value by at most half a cent, plus float error (well below
+# 0.001 for amounts under 10**12)
+_ROUNDING_MARGIN = 0.006
+
+
+def _within_tolerance(
+    unrounded: np.ndarray, target: np.ndarray, tolerance: float, roundings: int, rounded
+) -> np.ndarray:
+    """|rounded value - target| <= tolerance per row, rounding only where it can change the answer.
+
+    `roundings` is how often the value is rounded to the cent on its way from `unrounded`;
+    `rounded(rows)` gives the rounded values of the rows closer than that to the tolerance.
+    """
+    margin = roundings * _ROUNDING_MARGIN
+    difference = np.subtract(unrounded, target)
+    np.abs(difference, out=difference)
+    hit = difference <= tolerance - margin
+    difference -= tolerance
+    np.abs(difference, out=difference)
+    close = np.flatnonzero(difference <= margin)
+    if close.size:
+        hit[close] = np.abs(rounded(close) - target[close]) <= tolerance
+    return hit
+
+
+def infer_single_rates(
+    gross,
+    net,
+    vat,
+    candidate_rates: List[int] = DEFAULT_RATES,
+    tolerance: float = 0.05,
+) -> np.ndarray:
+    """Vectorized `infer_single_rate_from_totals` for whole tables.
+
+    gross, net and vat are array-likes (e.g. DataFrame columns) with NaN for missing values.
+    Returns an int array with the inferred rate per row, 0 where no rate fits.
+    """
+    gross = np.asarray(gross, dtype=np.float64)
+    net = np.asarray(net, dtype=np.float64)
+    vat = np.asarray(vat, dtype=np.float64)
+    has_gross, has_net, has_vat = ~np.isnan(gross), ~np.isnan(net), ~np.isnan(vat)
+
+    # Same branches and float operations as the scalar version, so results match exactly;
+    # only rows within the rounding margin of the tolerance are rounded to the cent.
+    # Each row only runs the check for its missing values, and only until a rate matched.
+    def net_times_rate(i, rate):
+        value = net[i]
+        value *= rate
+        return _within_tolerance(value, vat[i], tolerance, 1, lambda close: _round_array(value[close]))
+
+    def net_plus_rate(i, rate):
+        value = net[i]
+        value *= 1 + rate
+        return _within_tolerance(value, gross[i], tolerance, 1, lambda close: _round_array(value[close]))
+
+    def gross_minus_net(i, rate):
+        g = gross[i]
+        derived_net = g / (1 + rate)
+        return _within_tolerance(
+            g - derived_net,
+            vat[i],
+            tolerance,
+            2,
+            lambda close: _round_array(g[close] - _round_array(derived_net[close])),
+        )
+
+    checks = [
+        (has_gross & has_net & has_vat, net_times_rate),
+        (has_gross & has_net & ~has_vat, net_plus_rate),
+        (has_gross & ~has_net & has_vat, gross_minus_net),
+    ]
+    rates = np.zeros(gross.shape, dtype=np.int64)
+    for rows, matches in checks:
+        remaining = np.flatnonzero(rows)
+        for r in candidate_rates:
+            if not remaining.size:
+                break
+            hit = matches(remaining, r / 100.0)
+            # Integer indices: indexing with a scattered boolean mask is several times slower
+            rates[remaining[np.flatnonzero(hit)]] = r
+            remaining = remaining[np.flatnonzero(~hit)]
+    return rates
+
+
+@dataclass
+class TaxSummaryBatch:
+    """Result of `build_tax_summaries`: one single-rate entry per row, amounts in cents."""
+
+    rate: np.ndarray  # 0 where no rate could be inferred
+    net_cents: np.ndarray
+    tax_cents: np.ndarray
+    gross_cents: np.ndarray
+
+    def tax_summary(self, row: int) -> Dict[str, Dict[str, float]]:
+        """tax_summary of one row, as `build_receipt_tax_summary` returns it."""
+        rate = int(self.rate[row])
+        if not rate:
+            return {}
+        return {
+            str(rate): {
+                "net_sum": int(self.net_cents[row]) / 100,
+                "tax_sum": int(self.tax_cents[row]) / 100,
+                "gross_sum": int(self.gross_cents[row]) / 100,
+            }
+        }
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Per-row dicts in the format of `build_receipt_tax_summary`.
+
+        Creating the dicts takes most of the time of a batch; use `tax_summary` for the rows
+        that need one.
+        """
+        keys = {rate: str(rate) for rate in np.unique(self.rate).tolist()}
+        return [
+            {
+                "has_mixed_taxes": False,
+                "tax_summary": {keys[rate]: {"net_sum": net, "tax_sum": tax, "gross_sum": gross}} if rate else {},
+            }
+            for rate, net, tax, gross in zip(
+                self.rate.tolist(),
+                (self.net_cents / 100.0).tolist(),
+                (self.tax_cents / 100.0).tolist(),
+                (self.gross_cents / 100.0).tolist(),
+            )
+        ]
+
+
+def build_tax_summaries(
+    gross,
+    net,
+    vat,
+    candidate_rates: List[int] = DEFAULT_RATES,
+    tolerance: float = 0.05,
+) -> TaxSummaryBatch:
+    """Vectorized `build_receipt_tax_summary` for whole tables.
+
+    gross, net and vat are array-likes (e.g. DataFrame columns) with NaN for missing values.
+    Gives exactly the same results as calling the scalar version row by row. On 100k rows
+    (scripts/bench_tax_batch.py) this is ~60-90x faster than the scalar loop as long as the
+    result stays in arrays; creating a dict per row with `TaxSummaryBatch.summaries()`
+    brings it down to ~4x.
+    """
+    gross = np.asarray(gross, dtype=np.float64)
+    net = np.asarray(net, dtype=np.float64)
+    vat = np.asarray(vat, dtype=np.float64)
+    rates = infer_single_rates(gross, net, vat, candidate_rates, tolerance)
+
+    # On whole columns, cheaper than gathering and scattering the rows with a rate. Rows
+    # without one may hold amounts out of range for cents, they are zeroed below.
+    has_rate = rates != 0
+    with np.errstate(invalid="ignore"):
+        net_cents = to_cents_array(np.where(np.isnan(net), gross / (1 + rates / 100.0), net))
+        tax_cents = to_cents_array(np.where(np.isnan(vat), gross - net_cents / 100.0, vat))
+        gross_cents = to_cents_array(gross)
+    for cents in (net_cents, tax_cents, gross_cents):
+        cents *= has_rate
+    return TaxSummaryBatch(rate=rates, net_cents=net_cents, tax_cents=tax_cents, gross_cents=gross_cents)
+
+
+# A split maps rate -> (net cents, tax cents)
+_Split = Dict[int, Tuple[int, int]]
+
+
+def _split_summary(split: _Split) -> Dict[str, Dict[str, float]]:
+    return {
+        str(rate): {"net_sum": net / 100, "tax_sum": tax / 100, "gross_sum": (net + tax) / 100}
+        for rate, (net, tax) in sorted(split.items())
+    }
+
+
+def _pair_split(net: int, vat: int, a: int, b: int, tol: int) -> Optional[_Split]:
+    """Split net (cents) into parts at rates a < b whose taxes add up to vat exactly.
+
+    a * n_a + b * n_b = 100 * vat with n_a + n_b = net has one solution; the cent values
+    around it are checked against the rounded tax of each part. Splits where one part's
+    tax is within the tolerance are rejected, as they are a single rate in disguise.
+    """
+    exact = (100 * vat - a * net) / (b - a)
+    best: Optional[Tuple[int, _Split]] = None
+    for net_b in {math.floor(exact), math.ceil(exact)}:
+        net_a = net - net_b
+        tax_a = div_half_up(net_a * a, 100)
+        tax_b = vat - tax_a
+        error = abs(tax_b - div_half_up(net_b * b, 100))
+        if best is None or error < best[0]:
+            best = (error, {a: (net_a, tax_a), b: (net_b, tax_b)})
+    if best is None or best[0] > tol:
+        return None
+    split = best[1]
+    if any(part_net * net <= 0 or abs(part_tax) <= tol for part_net, part_tax in split.values()):
+        return None
+    return split
+
+
+def _line_totals(lines: List[Tuple[Optional[float], Optional[int]]]) -> Tuple[Dict[int, int], bool, bool]:
+    """Sum line amounts per rate. Returns (cents per rate, any line without rate, all lines priced)."""
+    per_rate: Dict[int, int] = {}
+    has_unknown_rate = False
+    all_priced = True
+    for amount, rate in lines:
+        if rate is None:
+            has_unknown_rate = True
+            continue
+        per_rate.setdefault(rate, 0)
+        if amount is None:
+            all_priced = False
+        else:
+            per_rate[rate] += to_cents(amount)
+    return per_rate, has_unknown_rate, all_priced
+
+
+def _split_by_lines(total: int, vat: int, per_rate: Dict[int, int], tol: int, lines_are_net: bool) -> Optional[_Split]:
+    """Distribute the receipt total (gross or net cents) over the rates in proportion to the lines."""
+    line_total = sum(per_rate.values())
+    if line_total == 0 or (line_total > 0) != (total > 0):
+        return None
+    sign = 1 if line_total > 0 else -1
+    rates = sorted(per_rate)
+    amounts = {r: div_half_up(per_rate[r] * total * sign, line_total * sign) for r in rates}
+    amounts[rates[-1]] += total - sum(amounts.values())
+
+    split: _Split = {}
+    for r, amount in amounts.items():
+        if lines_are_net:
+            split[r] = (amount, div_half_up(amount * r, 100))
+        else:
+            part_net = div_half_up(amount * 100, 100 + r)
+            split[r] = (part_net, amount - part_net)
+    if abs(sum(tax for _, tax in split.values()) - vat) > tol * len(split):
+        return None
+    return split
+
+
+def _fits_lines(split: _Split, per_rate: Dict[int, int], has_unknown_rate: bool, tol: int) -> bool:
+    rates = set(split)
+    if not set(per_rate) <= rates:
+        return False
+    if not has_unknown_rate and per_rate and rates != set(per_rate):
+        return False
+    return all(
+        abs(sum(split[r])) >= abs(amount) * (1 - LINE_SLACK) - tol for r, amount in per_rate.items()
+    )
+
+
+def solve_mixed_rates(
+    gross: Optional[float],
+    net: Optional[float],
+    vat: Optional[float],
+    lines: Optional[List[Tuple[Optional[float], Optional[int]]]] = None,
+    candidate_rates: List[int] = DEFAULT_RATES,
+    tolerance: float = 0.05,
+) -> TaxSolveResult:
+    """Split a receipt's totals into per-rate tax entries without asking the model.
+
+    Works in integer cents. Two of gross/net/vat are needed. Product lines given as
+    (amount, rate) pairs, where rate may be None, restrict the candidate splits:
+    if every line has a rate and a price, the totals are distributed in proportion to
+    the lines; otherwise each single rate and each pair of candidate rates is solved
+    exactly and kept if it agrees with the lines.
+
+    Totals alone cannot tell apart three rates (two equations), so with the default
+    rates most mixed receipts come back ambiguous unless their lines carry rates.
+    """
+    if sum(v is not None for v in (gross, net, vat)) < 2:
+        return TaxSolveResult(status="unsolvable")
+    total_gross = to_cents(gross) if gross is not None else to_cents(net) + to_cents(vat)
+    total_net = to_cents(net) if net is not None else total_gross - to_cents(vat)
+    total_vat = to_cents(vat) if vat is not None else total_gross - total_net
+    tol = to_cents(tolerance)
+    if abs(total_net + total_vat - total_gross) > tol:
+        return TaxSolveResult(status="unsolvable")
+
+    per_rate, has_unknown_rate, all_priced = _line_totals(lines or [])
+    if per_rate and not has_unknown_rate and all_priced:
+        for lines_are_net, total in ((False, total_gross), (True, total_net)):
+            split = _split_by_lines(total, total_vat, per_rate, tol, lines_are_net)
+            if split is not None:
+                return TaxSolveResult(status="unique", tax_summary=_split_summary(split))
+
+    singles = [
+        {r: (total_net, total_vat)}
+        for r in candidate_rates
+        if abs(div_half_up(total_net * r, 100) - total_vat) <= tol
+    ]
+    singles = [split for split in singles if _fits_lines(split, per_rate, has_unknown_rate, tol)]
+    if singles:
+        return TaxSolveResult(status="unique", tax_summary=_split_summary(singles[0]))
+
+    pairs = [
+        _pair_split(total_net, total_vat, a, b, tol)
+        for a, b in combinations(sorted(candidate_rates), 2)
+    ]
+    splits = [split for split in pairs if split and _fits_lines(split, per_rate, has_unknown_rate, tol)]
+    if not splits:
+        return TaxSolveResult(status="unsolvable")
+    if len(splits) == 1:
+        return TaxSolveResult(status="unique", tax_summary=_split_summary(splits[0]))
+    return TaxSolveResult(status="ambiguous", candidates=[_split_summary(split) for split in splits])
+
+
 def has_mixed_taxes_from_summary(tax_summary: Dict[str, Dict[str, float]]) -> bool:
     """Return True if more than one rate has a non-zero tax_sum."""
     nonzero = sum(1 for v in tax_summary.values() if v.get("tax_sum", 0.0) != 0.0)
@@ -95,6 +406,6 @@ def validate_tax_summary(
     if not tax_summary:
         return TaxValidationResult(ok=False, vat_total=0.0, diff=float(vat_amount), reason="empty tax_summary")
 
-    total = _round(sum(float(v.get("tax_sum", 0.0)) for v in tax_summary.values()))
-    diff = _round(float(vat_amount) - total)
-    return TaxValidationResult(ok=abs(diff) <= tolerance, vat_total=total, diff=diff)
+    total = sum(to_cents(v.get("tax_sum", 0.0)) for v in tax_summary.values())
+    diff = to_cents(vat_amount) - total
+    return TaxValidationResult(ok=abs(diff) <= to_cents(tolerance), vat_total=total / 100, diff=diff / 100)
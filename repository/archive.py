@@ -0,0 +1,223 @@
+"""
+Closed years moved out of receipts.db into read-only files, one per year.
+archive_year copies the receipts dated in a year with their products to
+archive/receipts_<year>.db, together with snapshots of sortiment and companies and the
+year's receipt_stats and tax lines, so every archive can be read on its own. Only after the
+copy is verified are the receipts deleted from receipts.db and the year recorded in archives.
+
+Reads ATTACH the archives of the years they need read-only, run the same statement
+against each of them through SQLAlchemy's schema_translate_map and append the results
+to those of receipts.db.
+"""
+
+import datetime
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from repository.migrations import DB_PATH, checksum, connect
+from repository.tables import (
+    ArchiveDB,
+    Base,
+    CompanyDB,
+    ProductDB,
+    ReceiptDB,
+    ReceiptStatsDB,
+    ReceiptTaxLineDB,
+    SessionLocal,
+    SortimentDB,
+)
+from repository.triggers import rebuild_receipt_stats, rebuild_tax_lines
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(os.getenv("RECEIPT_ARCHIVE_DIR", "archive"))
+# The current and the previous year stay in receipts.db
+HOT_YEARS = 2
+
+ARCHIVE_TABLES = [
+    table.__table__ for table in (ReceiptDB, ProductDB, SortimentDB, CompanyDB, ReceiptStatsDB, ReceiptTaxLineDB)
+]
+_RECEIPT_COLUMNS = ", ".join(column.name for column in ReceiptDB.__table__.columns)
+_PRODUCT_COLUMNS = ", ".join(column.name for column in ProductDB.__table__.columns)
+
+
+@dataclass
+class ArchiveResult:
+    year: int
+    path: Path
+    receipt_count: int
+    product_count: int
+
+
+def archive_path(year: int) -> Path:
+    return ARCHIVE_DIR / f"receipts_{year}.db"
+
+
+def archive_schema(year: int) -> str:
+    return f"archive_{year}"
+
+
+def archived_years() -> list[int]:
+    with SessionLocal() as session:
+        return list(session.execute(select(ArchiveDB.year).order_by(ArchiveDB.year)).scalars())
+
+
+def archived_years_between(date_from: Optional[datetime.date], date_to: Optional[datetime.date]) -> list[int]:
+    """Archived years overlapping a date range; None means unbounded."""
+    return [
+        year
+        for year in archived_years()
+        if (date_from is None or year >= date_from.year) and (date_to is None or year <= date_to.year)
+    ]
+
+
+@contextmanager
+def attached_archives(connection, years: Iterable[int]):
+    """ATTACH the archives of years read-only to a SQLAlchemy connection for the duration of the block."""
+    years = list(years)
+    attached = {row[1] for row in connection.exec_driver_sql("PRAGMA database_list")}
+    new = [year for year in years if archive_schema(year) not in attached]
+    for year in new:
+        uri = f"file:{archive_path(year).resolve()}?mode=ro"
+        connection.exec_driver_sql(f"ATTACH DATABASE ? AS {archive_schema(year)}", (uri,))
+    try:
+        yield [archive_schema(year) for year in years]
+    finally:
+        for year in new:
+            connection.exec_driver_sql(f"DETACH DATABASE {archive_schema(year)}")
+
+
+def in_schema(statement, schema: str):
+    """The statement with its tables read from an attached schema."""
+    return statement.execution_options(schema_translate_map={None: schema})
+
+
+def read_frame(statement, archive_years: Iterable[int] = ()) -> pd.DataFrame:
+    """Result of a select() on the archives of archive_years followed by receipts.db."""
+    with SessionLocal() as session:
+        connection = session.connection()
+        with attached_archives(connection, sorted(archive_years)) as schemas:
+            frames = [pd.read_sql(in_schema(statement, schema), connection) for schema in schemas]
+        frames.append(pd.read_sql(statement, connection))
+    frames = [frame for frame in frames if not frame.empty] or frames[-1:]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def find_archived_receipt(receipt_id: str) -> Optional[tuple[int, ReceiptDB, list[ProductDB]]]:
+    """(year, receipt, products) of a receipt that was moved to an archive."""
+    years = archived_years()
+    with SessionLocal() as session, attached_archives(session.connection(), years) as schemas:
+        for year, schema in zip(years, schemas):
+            receipt = session.execute(in_schema(select(ReceiptDB).where(ReceiptDB.id == receipt_id), schema)).scalar()
+            if receipt is not None:
+                products = session.execute(
+                    in_schema(select(ProductDB).where(ProductDB.receipt_pk == receipt.pk), schema)
+                ).scalars().all()
+                return year, receipt, list(products)
+    return None
+
+
+def _year_clause(year: int) -> str:
+    return f"receipt_date >= '{year}-01-01' AND receipt_date < '{year + 1}-01-01'"
+
+
+def count_archivable(year: int) -> tuple[int, int]:
+    """Receipts and products of a year still in receipts.db."""
+    conn = connect()
+    try:
+        receipts = conn.execute(f"SELECT COUNT(*) FROM receipts WHERE {_year_clause(year)}").fetchone()[0]
+        products = conn.execute(
+            f"SELECT COUNT(*) FROM products WHERE receipt_pk IN (SELECT pk FROM receipts WHERE {_year_clause(year)})"
+        ).fetchone()[0]
+        return receipts, products
+    finally:
+        conn.close()
+
+
+def check_archivable(year: int) -> None:
+    """Raise if the year is not closed yet or already archived."""
+    if year > datetime.date.today().year - HOT_YEARS:
+        raise ValueError(f"{year} is not closed yet, the last {HOT_YEARS} years stay in receipts.db")
+    if archive_path(year).exists():
+        raise FileExistsError(f"{archive_path(year)} exists already")
+
+
+def archive_year(year: int, db_path: str = DB_PATH) -> ArchiveResult:
+    """
+    Move the receipts dated in a closed year and their products into the year's archive.
+    Receipts without a readable date stay in receipts.db.
+    """
+    check_archivable(year)
+    path = archive_path(year)
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    partial.unlink(missing_ok=True)
+
+    # Copy into a new file; the write lock on receipts.db is only taken for the delete
+    archive_engine = create_engine(f"sqlite:///{partial}")
+    Base.metadata.create_all(archive_engine, tables=ARCHIVE_TABLES)
+    with Session(archive_engine) as session:
+        connection = session.connection()
+        connection.exec_driver_sql("ATTACH DATABASE ? AS hot", (f"file:{Path(db_path).resolve()}?mode=ro",))
+        connection.exec_driver_sql(
+            f"INSERT INTO receipts ({_RECEIPT_COLUMNS}) SELECT {_RECEIPT_COLUMNS} FROM hot.receipts WHERE {_year_clause(year)}"
+        )
+        connection.exec_driver_sql(
+            f"INSERT INTO products ({_PRODUCT_COLUMNS}) SELECT {_PRODUCT_COLUMNS} FROM hot.products "
+            "WHERE receipt_pk IN (SELECT pk FROM main.receipts)"
+        )
+        for table in (SortimentDB, CompanyDB):
+            columns = ", ".join(column.name for column in table.__table__.columns)
+            connection.exec_driver_sql(
+                f"INSERT INTO {table.__tablename__} ({columns}) SELECT {columns} FROM hot.{table.__tablename__}"
+            )
+        rebuild_receipt_stats(session)
+        rebuild_tax_lines(session)
+        session.commit()
+    archive_engine.dispose()
+    partial.rename(path)
+    path.chmod(0o444)
+
+    conn = connect(db_path)
+    conn.execute("ATTACH DATABASE ? AS archive", (f"file:{path.resolve()}?mode=ro",))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Receipts written since the copy would be lost with the delete
+        queries = {
+            "receipts": f"SELECT {_RECEIPT_COLUMNS} FROM {{schema}}.receipts WHERE {_year_clause(year)} ORDER BY pk",
+            "products": f"SELECT {_PRODUCT_COLUMNS} FROM {{schema}}.products "
+            f"WHERE receipt_pk IN (SELECT pk FROM {{schema}}.receipts WHERE {_year_clause(year)}) ORDER BY pk",
+        }
+        counts = {}
+        for table, query in queries.items():
+            hot = checksum(conn, query.format(schema="main"), 1000)
+            archived = checksum(conn, query.format(schema="archive"), 1000)
+            if hot != archived:
+                raise RuntimeError(f"{table} of {year} changed during the copy; nothing was deleted, run again")
+            counts[table] = hot[0]
+        conn.execute("DELETE FROM main.products WHERE receipt_pk IN (SELECT pk FROM archive.receipts)")
+        conn.execute(f"DELETE FROM main.receipts WHERE {_year_clause(year)}")
+        conn.execute(
+            "INSERT INTO archives (year, path, receipt_count, product_count, archived_on) VALUES (?, ?, ?, ?, ?)",
+            (year, str(path), counts["receipts"], counts["products"], datetime.datetime.now().isoformat(sep=" ")),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.execute("DETACH DATABASE archive")
+        path.chmod(0o644)
+        path.unlink()
+        raise
+    finally:
+        conn.close()
+    logger.info("Archived %d receipts and %d products of %d to %s", counts["receipts"], counts["products"], year, path)
+    return ArchiveResult(year=year, path=path, receipt_count=counts["receipts"], product_count=counts["products"])
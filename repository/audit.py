@@ -0,0 +1,224 @@
+"""
+Consistency audit over all receipts.
+Every rule is one set-based SQL statement that writes its findings into audit_findings
+for the receipts in the temporary audit_targets table. An incremental run only targets
+receipts that are new, were updated, or whose products changed since they were last
+checked (tracked in audit_state); the duplicate rule compares receipts with each other
+and is always run over the whole table.
+"""
+
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import text
+
+from repository.receipt_repository import SessionLocal
+
+# Allowed difference between amounts that should match, in cents
+TOLERANCE_CENTS = 5
+# Product lines may differ from the receipt total by this much (rounding, deposits, discounts)
+PRODUCTS_TOLERANCE_CENTS = 100
+PRODUCTS_TOLERANCE_FRACTION = 0.05
+
+_PRODUCT_TOTALS = """
+    SELECT receipt_pk,
+           COUNT(*) AS product_count,
+           COALESCE(SUM(CAST(ROUND(amount * price * 100) AS INTEGER)), 0) AS total_cents,
+           COUNT(price) AS priced_count
+    FROM products
+    GROUP BY receipt_pk
+"""
+
+# name -> SELECT id, score, detail over receipts r joined with audit_targets.
+# Scores rank the report: a base weight per rule plus up to 10 points for the size of the
+# discrepancy (0.1 per euro, capped at 100 €).
+RULES = {
+    "gross_net_vat": """
+        SELECT r.id, 10 + MIN(ABS(d) / 100.0, 100) / 10 AS score,
+               printf('Brutto %.2f ≠ Netto %.2f + USt. %.2f', r.total_gross_amount, r.total_net_amount, r.vat_amount) AS detail
+        FROM (
+            SELECT *, ROUND(total_gross_amount * 100) - ROUND(total_net_amount * 100) - ROUND(vat_amount * 100) AS d
+            FROM receipts
+            WHERE total_gross_amount IS NOT NULL AND total_net_amount IS NOT NULL AND vat_amount IS NOT NULL
+        ) r
+        JOIN audit_targets t ON t.receipt_id = r.id
+        WHERE ABS(d) > :tolerance
+    """,
+    "missing_totals": """
+        SELECT r.id, 8 AS score, 'Brutto oder Netto/USt. fehlen' AS detail
+        FROM receipts r
+        JOIN audit_targets t ON t.receipt_id = r.id
+        WHERE r.total_gross_amount IS NULL OR (r.total_net_amount IS NULL AND r.vat_amount IS NULL)
+    """,
+    "tax_summary_vat": """
+        SELECT r.id, 10 + MIN(ABS(ROUND(COALESCE(r.vat_amount, 0) * 100) - s.tax_cents) / 100.0, 100) / 10 AS score,
+               printf('Steueraufschlüsselung %.2f ≠ USt. %.2f', s.tax_cents / 100.0, r.vat_amount) AS detail
+        FROM receipts r
+        JOIN audit_targets t ON t.receipt_id = r.id
+        JOIN (
+            SELECT receipts.id AS receipt_id,
+                   SUM(ROUND(COALESCE(json_extract(e.value, '$.tax_sum'), 0) * 100)) AS tax_cents,
+                   SUM(ROUND(COALESCE(json_extract(e.value, '$.gross_sum'), 0) * 100)) AS gross_cents
+            FROM receipts, json_each(receipts.tax_summary) e
+            WHERE json_valid(receipts.tax_summary) AND json_type(receipts.tax_summary) = 'object'
+            GROUP BY receipts.id
+        ) s ON s.receipt_id = r.id
+        WHERE ABS(ROUND(COALESCE(r.vat_amount, 0) * 100) - s.tax_cents) > :tolerance
+    """,
+    "tax_summary_entry": """
+        SELECT r.id, 6 + MIN(MAX(ABS(d)) / 100.0, 100) / 10 AS score,
+               'Steueraufschlüsselung: Netto + Steuer ≠ Brutto bei ' || group_concat(e_key || '%', ', ') AS detail
+        FROM receipts r
+        JOIN audit_targets t ON t.receipt_id = r.id
+        JOIN (
+            SELECT receipts.id AS receipt_id, e.key AS e_key,
+                   ROUND(COALESCE(json_extract(e.value, '$.gross_sum'), 0) * 100)
+                   - ROUND(COALESCE(json_extract(e.value, '$.net_sum'), 0) * 100)
+                   - ROUND(COALESCE(json_extract(e.value, '$.tax_sum'), 0) * 100) AS d
+            FROM receipts, json_each(receipts.tax_summary) e
+            WHERE json_valid(receipts.tax_summary) AND json_type(receipts.tax_summary) = 'object'
+        ) s ON s.receipt_id = r.id
+        WHERE ABS(d) > :tolerance
+        GROUP BY r.id
+    """,
+    "credit_without_tax_summary": """
+        SELECT r.id, 7 + MIN(ABS(r.vat_amount), 100) / 10 AS score,
+               printf('Gutschrift mit USt. %.2f ohne Steueraufschlüsselung', r.vat_amount) AS detail
+        FROM receipts r
+        JOIN audit_targets t ON t.receipt_id = r.id
+        WHERE r.is_credit AND COALESCE(r.vat_amount, 0) != 0
+          AND (r.tax_summary IS NULL OR NOT json_valid(r.tax_summary)
+               OR json_type(r.tax_summary) != 'object' OR r.tax_summary = '{}')
+    """,
+    "products_total": """
+        SELECT r.id, 5 + MIN(d / 100.0, 100) / 10 AS score,
+               printf('Produkte %.2f passen weder zu Brutto %.2f noch zu Netto %.2f', p.total_cents / 100.0,
+                      r.total_gross_amount, r.total_net_amount) AS detail
+        FROM (
+            SELECT p.*,
+                   MIN(ABS(p.total_cents - ROUND(COALESCE(r.total_gross_amount, 0) * 100)),
+                       ABS(p.total_cents - ROUND(COALESCE(r.total_net_amount, r.total_gross_amount, 0) * 100))) AS d
+            FROM ({product_totals}) p
+            JOIN receipts r ON r.pk = p.receipt_pk
+            WHERE p.priced_count = p.product_count
+        ) p
+        JOIN receipts r ON r.pk = p.receipt_pk
+        JOIN audit_targets t ON t.receipt_id = r.id
+        WHERE d > MAX(:products_tolerance, :products_fraction * ABS(ROUND(COALESCE(r.total_gross_amount, 0) * 100)))
+    """.format(product_totals=_PRODUCT_TOTALS),
+    "unparseable_date": """
+        SELECT r.id, 4 AS score, 'Datum nicht lesbar: ' || quote(r.date) AS detail
+        FROM receipts r
+        JOIN audit_targets t ON t.receipt_id = r.id
+        WHERE r.receipt_date IS NULL
+    """,
+}
+
+# Runs over all receipts, as a change to one receipt can make or break a duplicate of another
+DUPLICATE_RULE = """
+    SELECT r.id, 9 AS score, printf('%d Belege mit gleicher Firma, Datum und Brutto', d.n) AS detail
+    FROM receipts r
+    JOIN (
+        SELECT company_name, date, ROUND(total_gross_amount * 100) AS gross_cents, COUNT(*) AS n
+        FROM receipts
+        WHERE company_name IS NOT NULL AND date IS NOT NULL AND total_gross_amount IS NOT NULL
+        GROUP BY company_name, date, ROUND(total_gross_amount * 100)
+        HAVING COUNT(*) > 1
+    ) d ON d.company_name = r.company_name AND d.date = r.date
+       AND d.gross_cents = ROUND(r.total_gross_amount * 100)
+"""
+
+_CHANGED_RECEIPTS = """
+    SELECT r.id
+    FROM receipts r
+    LEFT JOIN audit_state s ON s.receipt_id = r.id
+    LEFT JOIN ({product_totals}) p ON p.receipt_pk = r.pk
+    WHERE s.receipt_id IS NULL
+       OR COALESCE(r.updated_on, r.created_on) >= s.checked_on
+       OR COALESCE(p.product_count, 0) != s.product_count
+       OR COALESCE(p.total_cents, 0) != s.product_total_cents
+""".format(product_totals=_PRODUCT_TOTALS)
+
+
+@dataclass
+class AuditRun:
+    checked: int
+    findings: int
+    seconds: float
+
+
+def run_audit(full: bool = False) -> AuditRun:
+    """
+    Check receipts against all rules and store the findings.
+    Args:
+        full: bool, check every receipt instead of only the ones changed since their last check
+    Returns:
+        AuditRun with the number of checked receipts and new findings
+    """
+    start = time.perf_counter()
+    params = {
+        "tolerance": TOLERANCE_CENTS,
+        "products_tolerance": PRODUCTS_TOLERANCE_CENTS,
+        "products_fraction": PRODUCTS_TOLERANCE_FRACTION,
+    }
+    with SessionLocal() as session:
+        session.execute(text("DROP TABLE IF EXISTS temp.audit_targets"))
+        session.execute(text("CREATE TEMP TABLE audit_targets (receipt_id TEXT PRIMARY KEY)"))
+        targets = "SELECT id FROM receipts" if full else _CHANGED_RECEIPTS
+        session.execute(text(f"INSERT INTO audit_targets (receipt_id) {targets}"))
+        checked = session.execute(text("SELECT COUNT(*) FROM audit_targets")).scalar()
+
+        # Forget receipts that were deleted, and old results of the receipts checked now
+        session.execute(text("DELETE FROM audit_findings WHERE receipt_id NOT IN (SELECT id FROM receipts)"))
+        session.execute(text("DELETE FROM audit_state WHERE receipt_id NOT IN (SELECT id FROM receipts)"))
+        session.execute(
+            text(
+                "DELETE FROM audit_findings WHERE receipt_id IN (SELECT receipt_id FROM audit_targets) "
+                "OR rule = 'duplicate'"
+            )
+        )
+
+        findings = 0
+        for rule, select in list(RULES.items()) + [("duplicate", DUPLICATE_RULE)]:
+            result = session.execute(
+                text(
+                    "INSERT INTO audit_findings (receipt_id, rule, score, detail, found_on) "
+                    f"SELECT id, :rule, score, detail, CURRENT_TIMESTAMP FROM ({select})"
+                ),
+                {"rule": rule, **{k: v for k, v in params.items() if f":{k}" in select}},
+            )
+            findings += result.rowcount
+
+        session.execute(
+            text(
+                f"""
+                INSERT OR REPLACE INTO audit_state (receipt_id, checked_on, product_count, product_total_cents)
+                SELECT t.receipt_id, CURRENT_TIMESTAMP, COALESCE(p.product_count, 0), COALESCE(p.total_cents, 0)
+                FROM audit_targets t
+                JOIN receipts r ON r.id = t.receipt_id
+                LEFT JOIN ({_PRODUCT_TOTALS}) p ON p.receipt_pk = r.pk
+                """
+            )
+        )
+        session.execute(text("DROP TABLE temp.audit_targets"))
+        session.commit()
+    return AuditRun(checked=checked, findings=findings, seconds=time.perf_counter() - start)
+
+
+def get_audit_report(limit: int | None = None) -> pd.DataFrame:
+    """Suspicious receipts ranked by their summed finding scores, one row per receipt."""
+    query = """
+        SELECT r.id AS receipt_id, r.date, r.company_name, r.total_gross_amount, r.is_credit,
+               SUM(f.score) AS score,
+               group_concat(f.rule, ', ') AS rules,
+               group_concat(f.detail, ' · ') AS details
+        FROM audit_findings f
+        JOIN receipts r ON r.id = f.receipt_id
+        GROUP BY r.id
+        ORDER BY score DESC
+    """
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    with SessionLocal() as session:
+        return pd.read_sql(text(query), session.connection())
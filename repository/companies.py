@@ -0,0 +1,150 @@
+"""
+Companies of the receipts. Every spelling of a company name seen on a receipt is an alias,
+stored under its company_key; only spellings with the same key join a company, similar
+ones are merged after review (scripts/backfill_companies.py --review). A session listener
+links new and renamed receipts to their company on every flush.
+"""
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, event, insert, inspect, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
+
+from repository.tables import CompanyAliasDB, CompanyDB, CompanyTrigramDB, ReceiptDB, SessionLocal
+from repository.triggers import fold_search_text
+
+# Legal forms and fillers that do not tell companies apart
+COMPANY_KEY_STOPWORDS = {
+    "gmbh", "mbh", "gesmbh", "ges", "kg", "og", "ag", "ohg", "eu", "e", "u", "co", "und", "nfg", "reg", "gen", "egen",
+}
+# Minimum trigram similarity for two companies to be listed as merge candidates by
+# scripts/backfill_companies.py --review. Similar spellings are never joined on their own:
+# "Hofladen Bio" is not "Hofladen", and company_name drives the location and cheese reports.
+COMPANY_SIMILARITY = 0.5
+
+
+def company_key(name: str) -> str:
+    """Normalized spelling of a company name: folded words without legal forms and punctuation."""
+    words = re.findall(r"\w+", fold_search_text(name or ""))
+    return " ".join(word for word in words if word not in COMPANY_KEY_STOPWORDS) or " ".join(words)
+
+
+def company_trigrams(key: str) -> set[str]:
+    """Trigrams of the words of a company key, padded at the word boundaries like pg_trgm."""
+    trigrams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def similar_companies(connection, name: str) -> list[tuple[int, float]]:
+    """(company id, similarity) of the companies with an alias similar to a spelling, most similar first."""
+    trigrams = company_trigrams(company_key(name))
+    if not trigrams:
+        return []
+    shared = func.count().label("shared")
+    candidates = connection.execute(
+        select(CompanyAliasDB.company_id, CompanyAliasDB.trigram_count, shared)
+        .join(CompanyTrigramDB, CompanyTrigramDB.alias_key == CompanyAliasDB.key)
+        .where(CompanyTrigramDB.trigram.in_(trigrams))
+        .group_by(CompanyAliasDB.key)
+        .order_by(shared.desc())
+        .limit(10)
+    ).all()
+    best: dict[int, float] = {}
+    for company_id, count, common in candidates:
+        similarity = common / (len(trigrams) + count - common)
+        if similarity >= COMPANY_SIMILARITY:
+            best[company_id] = max(similarity, best.get(company_id, 0.0))
+    return sorted(best.items(), key=lambda item: -item[1])
+
+
+def resolve_company(connection, name: Optional[str]) -> Optional[tuple[int, str]]:
+    """
+    (id, canonical name) of the company a spelling belongs to; None for an empty name.
+    Only spellings with the same company_key join a company; any other spelling becomes a
+    new company named after it. Similar companies are merged after review, see
+    scripts/backfill_companies.py --review.
+    """
+    key = company_key(name)
+    if not key:
+        return None
+    known = connection.execute(
+        select(CompanyDB.id, CompanyDB.name)
+        .join(CompanyAliasDB, CompanyAliasDB.company_id == CompanyDB.id)
+        .where(CompanyAliasDB.key == key)
+    ).first()
+    if known:
+        return tuple(known)
+
+    trigrams = company_trigrams(key)
+    connection.execute(sqlite_insert(CompanyDB).values(name=name.strip()).on_conflict_do_nothing())
+    company_id = connection.execute(select(CompanyDB.id).where(CompanyDB.name == name.strip())).scalar()
+    connection.execute(
+        insert(CompanyAliasDB).values(key=key, company_id=company_id, name=name.strip(), trigram_count=len(trigrams))
+    )
+    connection.execute(insert(CompanyTrigramDB), [{"trigram": trigram, "alias_key": key} for trigram in trigrams])
+    return company_id, connection.execute(select(CompanyDB.name).where(CompanyDB.id == company_id)).scalar()
+
+
+def merge_companies(session, source_id: int, target_id: int) -> int:
+    """Move the aliases and receipts of one company to another and delete it. Returns the number of receipts moved."""
+    target_name = session.execute(select(CompanyDB.name).where(CompanyDB.id == target_id)).scalar_one()
+    session.execute(update(CompanyAliasDB).where(CompanyAliasDB.company_id == source_id).values(company_id=target_id))
+    moved = session.execute(
+        update(ReceiptDB).where(ReceiptDB.company_id == source_id).values(company_id=target_id, company_name=target_name)
+    ).rowcount
+    session.execute(delete(CompanyDB).where(CompanyDB.id == source_id))
+    return moved
+
+
+def split_company_alias(session, name: str, receipt_ids: Iterable[str] = ()) -> tuple[int, int]:
+    """
+    Undo a wrong merge: move the alias of a spelling from its company to a company of its own,
+    named after the spelling. Receipts of the old company that still carry the spelling, and
+    the receipts given by id, move along. Returns (new company id, number of receipts moved).
+    """
+    key = company_key(name)
+    alias = session.get(CompanyAliasDB, key)
+    if alias is None:
+        raise ValueError(f"No company has the spelling {name!r}")
+    name = name.strip()
+    session.execute(sqlite_insert(CompanyDB).values(name=name).on_conflict_do_nothing())
+    company_id = session.execute(select(CompanyDB.id).where(CompanyDB.name == name)).scalar_one()
+    if company_id == alias.company_id:
+        raise ValueError(f"{name!r} is already a company of its own")
+    receipt_ids = set(receipt_ids)
+    pks = [
+        pk
+        for pk, receipt_id, company_name in session.execute(
+            select(ReceiptDB.pk, ReceiptDB.id, ReceiptDB.company_name).where(ReceiptDB.company_id == alias.company_id)
+        )
+        if receipt_id in receipt_ids or company_key(company_name) == key
+    ]
+    alias.company_id = company_id
+    if pks:
+        session.execute(update(ReceiptDB).where(ReceiptDB.pk.in_(pks)).values(company_id=company_id, company_name=name))
+    return company_id, len(pks)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _assign_companies(session, flush_context, instances):
+    """
+    Link new and renamed receipts to their company. New receipts get its canonical name; a
+    name the user edited is kept as typed.
+    """
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, ReceiptDB):
+            continue
+        renamed = inspect(obj).attrs.company_name.history.has_changes()
+        if obj in session.dirty and obj.company_id is not None and not renamed:
+            continue
+        company = resolve_company(session.connection(), obj.company_name)
+        if company is None:
+            obj.company_id = None
+        elif obj in session.new:
+            obj.company_id, obj.company_name = company
+        else:
+            obj.company_id = company[0]
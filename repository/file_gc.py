@@ -0,0 +1,155 @@
+"""
+Garbage collection of files in saved_images.
+stored_files indexes every stored file with the receipt that references it; it is kept
+up to date on every write of a receipt. A file without receipt is an upload that has not
+been saved yet or a file a receipt no longer uses, and is only removed once it has been
+unreferenced for the grace period, so uploads in progress are never deleted.
+collect() only reads the index; reconcile() compares index, receipts and directory in
+full and is run once at startup to pick up files from before the index existed.
+Receipts moved to an archive (repository/archive.py) keep their files: both read the
+file_paths of the archived receipts as well.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from repository.archive import archived_years, attached_archives
+from repository.file_index import remove_unreferenced_files, utc_now
+from repository.receipt_repository import ReceiptRepository, SessionLocal, StoredFileDB
+
+logger = logging.getLogger(__name__)
+
+FILE_DIR = "saved_images"
+GRACE_PERIOD = datetime.timedelta(hours=float(os.getenv("FILE_GC_GRACE_HOURS", "24")))
+GC_INTERVAL_SECONDS = float(os.getenv("FILE_GC_INTERVAL_MINUTES", "60")) * 60
+
+
+_REFERENCES = (
+    "SELECT f.value, r.id FROM {schema}.receipts r, json_each(r.file_paths) f WHERE json_valid(r.file_paths)"
+)
+
+
+def _referenced_files(session, include_hot: bool = True) -> dict[str, str]:
+    """Path -> id of the receipt referencing it, over the archives and (optionally) receipts.db."""
+    referenced = {}
+    with attached_archives(session.connection(), archived_years()) as schemas:
+        for schema in schemas:
+            referenced.update(session.execute(text(_REFERENCES.format(schema=schema))).all())
+    if include_hot:
+        referenced.update(session.execute(text(_REFERENCES.format(schema="main"))).all())
+    return referenced
+
+
+def register_upload(path: str) -> None:
+    """Add a newly written file to the index as not yet referenced."""
+    with SessionLocal() as session:
+        session.execute(
+            sqlite_insert(StoredFileDB)
+            .values(path=path, receipt_id=None, registered_on=utc_now())
+            .on_conflict_do_nothing(index_elements=[StoredFileDB.path])
+        )
+        session.commit()
+
+
+def find_garbage(grace_period: datetime.timedelta = GRACE_PERIOD) -> list[str]:
+    """Indexed files that have had no receipt for longer than the grace period."""
+    cutoff = utc_now() - grace_period
+    with SessionLocal() as session:
+        rows = (
+            session.query(StoredFileDB.path)
+            .filter(StoredFileDB.receipt_id.is_(None), StoredFileDB.registered_on < cutoff)
+            .order_by(StoredFileDB.registered_on)
+            .all()
+        )
+    return [path for (path,) in rows]
+
+
+def collect(grace_period: datetime.timedelta = GRACE_PERIOD) -> list[str]:
+    """Remove unreferenced files older than the grace period. Returns the removed paths."""
+    garbage = find_garbage(grace_period)
+    if not garbage:
+        return []
+    # The index only follows writes to receipts.db; files of archived receipts are linked again
+    with SessionLocal() as session:
+        archived = _referenced_files(session, include_hot=False)
+        for path in garbage:
+            if path in archived:
+                session.query(StoredFileDB).filter(StoredFileDB.path == path).update(
+                    {StoredFileDB.receipt_id: archived[path]}
+                )
+        session.commit()
+    removed = remove_unreferenced_files([path for path in garbage if path not in archived])
+    for path in removed:
+        logger.info("Deleted %s", path)
+    return removed
+
+
+def reconcile() -> dict[str, int]:
+    """
+    Rebuild the index from the receipts, including archived ones, and the directory.
+    Files referenced by a receipt are linked to it, files on disk the index does not know
+    are added as unreferenced (registered at their modification time), and index rows of
+    files that no longer exist are dropped.
+    """
+    os.makedirs(FILE_DIR, exist_ok=True)
+    disk_paths = {os.path.join(FILE_DIR, name) for name in os.listdir(FILE_DIR)}
+    with SessionLocal() as session:
+        referenced = _referenced_files(session)
+        indexed = {row.path: row for row in session.query(StoredFileDB)}
+        now = utc_now()
+        counts = {"linked": 0, "released": 0, "added": 0, "dropped": 0}
+
+        for path, row in indexed.items():
+            if path not in disk_paths:
+                session.delete(row)
+                counts["dropped"] += 1
+            elif path in referenced and row.receipt_id != referenced[path]:
+                row.receipt_id = referenced[path]
+                counts["linked"] += 1
+            elif path not in referenced and row.receipt_id is not None:
+                row.receipt_id = None
+                row.registered_on = now
+                counts["released"] += 1
+
+        for path in disk_paths - indexed.keys():
+            modified = datetime.datetime.fromtimestamp(os.path.getmtime(path), datetime.timezone.utc)
+            session.add(
+                StoredFileDB(
+                    path=path,
+                    receipt_id=referenced.get(path),
+                    registered_on=modified.replace(tzinfo=None),
+                )
+            )
+            counts["added"] += 1
+        session.commit()
+    return counts
+
+
+def _run_forever(interval_seconds: float) -> None:
+    try:
+        # Creates missing tables, the thread may start before any page touched the database
+        ReceiptRepository()
+        logger.info("File index reconciled: %s", reconcile())
+    except Exception:
+        logger.exception("Reconciling the file index failed")
+    while True:
+        try:
+            collect()
+        except Exception:
+            logger.exception("File garbage collection failed")
+        time.sleep(interval_seconds)
+
+
+def start_background_gc(interval_seconds: float = GC_INTERVAL_SECONDS) -> threading.Thread:
+    """Start a daemon thread that reconciles once and then collects garbage periodically."""
+    thread = threading.Thread(
+        target=_run_forever, args=(interval_seconds,), name="file-gc", daemon=True
+    )
+    thread.start()
+    return thread
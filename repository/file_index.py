@@ -0,0 +1,93 @@
+"""
+Index of the files in saved_images (stored_files). A session listener records on every
+flush which receipt references a file; repository/file_gc.py removes the files that have
+had no receipt for longer than the grace period.
+"""
+import datetime
+import json
+import os
+import uuid
+
+from sqlalchemy import delete, event, inspect, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from repository.archive import archived_years, attached_archives
+from repository.tables import ReceiptDB, SessionLocal, StoredFileDB
+
+def utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def receipt_file_paths(value) -> set[str]:
+    """The paths of a receipt's file_paths value; empty unless it is a list."""
+    return set(value) if isinstance(value, list) else set()
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _index_receipt_files(session, flush_context, instances):
+    """Keep stored_files in sync with the file_paths of the receipts in this flush."""
+    referenced: dict[str, str] = {}
+    released: dict[str, str] = {}
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, ReceiptDB):
+            continue
+        if obj.id is None:
+            obj.id = str(uuid.uuid4())
+        paths = receipt_file_paths(obj.file_paths)
+        referenced.update((path, obj.id) for path in paths)
+        if obj in session.dirty:
+            for old_paths in inspect(obj).attrs.file_paths.history.deleted:
+                released.update((path, obj.id) for path in receipt_file_paths(old_paths) - paths)
+    for obj in session.deleted:
+        if isinstance(obj, ReceiptDB):
+            released.update((path, obj.id) for path in receipt_file_paths(obj.file_paths))
+
+    connection = session.connection()
+    now = utc_now()
+    for path, receipt_id in released.items():
+        if path not in referenced:
+            connection.execute(
+                update(StoredFileDB)
+                .where(StoredFileDB.path == path, StoredFileDB.receipt_id == receipt_id)
+                .values(receipt_id=None, registered_on=now)
+            )
+    if referenced:
+        insert = sqlite_insert(StoredFileDB).values(
+            [{"path": path, "receipt_id": receipt_id, "registered_on": now} for path, receipt_id in referenced.items()]
+        )
+        connection.execute(
+            insert.on_conflict_do_update(
+                index_elements=[StoredFileDB.path], set_={"receipt_id": insert.excluded.receipt_id}
+            )
+        )
+
+
+def remove_unreferenced_files(paths: list[str]) -> list[str]:
+    """Delete files from disk and from stored_files unless a receipt still references them."""
+    if not paths:
+        return []
+    with SessionLocal() as session:
+        # Receipts can share a file, so the receipts' own lists, archived ones included, are
+        # the authority here
+        with attached_archives(session.connection(), archived_years()) as schemas:
+            still_referenced = {
+                row[0]
+                for schema in ["main", *schemas]
+                for row in session.execute(
+                    text(
+                        f"SELECT DISTINCT f.value FROM {schema}.receipts r, json_each(r.file_paths) f "
+                        "WHERE json_valid(r.file_paths) AND f.value IN (SELECT value FROM json_each(:paths))"
+                    ),
+                    {"paths": json.dumps(paths)},
+                )
+            }
+        removed = []
+        for path in paths:
+            if path in still_referenced:
+                continue
+            if os.path.exists(path):
+                os.remove(path)
+            removed.append(path)
+        session.execute(delete(StoredFileDB).where(StoredFileDB.path.in_(removed)))
+        session.commit()
+    return removed
@@ -0,0 +1,514 @@
+"""
+Versioned schema migrations.
+schema_migrations records every applied migration and run_migrations applies the missing
+ones in order. Each migration is idempotent, so one that was interrupted before it was
+recorded is simply run again.
+
+Changes ALTER TABLE cannot make (constraints, column types) go through rebuild_table:
+the table is copied into a new one in chunks of bounded size, one short transaction
+each, while triggers mirror concurrent writes into the copy. Progress is kept in
+schema_rebuilds, so an interrupted rebuild continues where it stopped. Before the swap
+the row count and a checksum of both tables must match; the swap itself follows the
+procedure from the SQLite documentation (drop the old table, rename the new one, never
+the other way round, which would rewrite the foreign keys of other tables).
+"""
+
+import datetime
+import hashlib
+import logging
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy.schema import CreateIndex
+
+from repository.sqlite_settings import SqliteSettings
+from repository.tables import ReceiptDB, engine
+from repository.triggers import TAX_LINES_FILL
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = engine.url.database
+REBUILD_CHUNK_SIZE = 2000
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+@dataclass
+class MigrationRun:
+    applied: list[str]
+    schema_version: int
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """
+    Connection for migrations: the usual settings, but foreign keys off (they cannot be
+    switched inside a transaction and would fire while tables are swapped) and explicit
+    transactions.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=SqliteSettings.from_env().busy_timeout_ms / 1000)
+    for pragma in SqliteSettings.from_env().pragmas():
+        if not pragma.startswith("PRAGMA foreign_keys"):
+            conn.execute(pragma)
+    conn.execute("PRAGMA foreign_keys=OFF")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_on TIMESTAMP NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_rebuilds ("
+        "table_name TEXT PRIMARY KEY, last_rowid INTEGER NOT NULL, rows_copied INTEGER NOT NULL)"
+    )
+    return conn
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    """Add a column unless the table already has it (or does not exist yet). Returns whether it was added."""
+    if not table_exists(conn, table) or column in table_columns(conn, table):
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    logger.info("Added column %s.%s", table, column)
+    return True
+
+
+def checksum(conn: sqlite3.Connection, query: str, chunk_size: int) -> tuple[int, str]:
+    """Row count and SHA-256 over the rows of a query ordered by rowid."""
+    digest = hashlib.sha256()
+    count = 0
+    cursor = conn.execute(query)
+    while rows := cursor.fetchmany(chunk_size):
+        for row in rows:
+            digest.update(repr(row).encode())
+        count += len(rows)
+    return count, digest.hexdigest()
+
+
+def rebuild_table(
+    conn: sqlite3.Connection,
+    table: str,
+    create_sql: str,
+    columns: Optional[dict[str, str]] = None,
+    chunk_size: Optional[int] = None,
+) -> None:
+    """
+    Replace a table by one created with create_sql, keeping rowids, indexes and triggers.
+    Args:
+        conn: connection from connect()
+        table: name of the table to rebuild
+        create_sql: CREATE TABLE statement for the new table, named {table}
+        columns: new column -> SQL expression over the old row; default copies the columns both tables have
+        chunk_size: rows copied per transaction, REBUILD_CHUNK_SIZE by default
+    """
+    chunk_size = chunk_size or REBUILD_CHUNK_SIZE
+    new_table = f"{table}__rebuild"
+    state = conn.execute("SELECT last_rowid, rows_copied FROM schema_rebuilds WHERE table_name = ?", (table,)).fetchone()
+    if state is None or not table_exists(conn, new_table):
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"DROP TABLE IF EXISTS {new_table}")
+        conn.execute(create_sql.format(table=new_table))
+        conn.execute("INSERT OR REPLACE INTO schema_rebuilds VALUES (?, 0, 0)", (table,))
+        conn.execute("COMMIT")
+        state = (0, 0)
+    last_rowid, copied = state
+
+    if columns is None:
+        old_columns = set(table_columns(conn, table))
+        columns = {column: column for column in table_columns(conn, new_table) if column in old_columns}
+    names = ", ".join(columns)
+    expressions = ", ".join(columns.values())
+    copy_rows = f"INSERT OR REPLACE INTO {new_table} (rowid, {names}) SELECT rowid, {expressions} FROM {table}"
+
+    # Mirror writes that happen between the chunks
+    conn.executescript(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}__rebuild_ai AFTER INSERT ON {table} BEGIN
+            {copy_rows} WHERE rowid = new.rowid;
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}__rebuild_au AFTER UPDATE ON {table} BEGIN
+            DELETE FROM {new_table} WHERE rowid = old.rowid;
+            {copy_rows} WHERE rowid = new.rowid;
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}__rebuild_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM {new_table} WHERE rowid = old.rowid;
+        END;
+        """
+    )
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        upper = conn.execute(
+            f"SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT 1 OFFSET ?",
+            (last_rowid, chunk_size - 1),
+        ).fetchone()
+        if upper is None:
+            upper = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()
+        upper = upper[0] if upper and upper[0] is not None else last_rowid
+        cursor = conn.execute(f"{copy_rows} WHERE rowid > ? AND rowid <= ?", (last_rowid, upper))
+        copied += cursor.rowcount
+        done = upper == last_rowid or cursor.rowcount < chunk_size
+        last_rowid = upper
+        conn.execute(
+            "UPDATE schema_rebuilds SET last_rowid = ?, rows_copied = ? WHERE table_name = ?",
+            (last_rowid, copied, table),
+        )
+        conn.execute("COMMIT")
+        logger.info("%s: copied %d/%d rows", table, copied, total)
+        if done:
+            break
+
+    # Swap under a write lock, after checking that the copy matches
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        source = checksum(conn, f"SELECT rowid, {expressions} FROM {table} ORDER BY rowid", chunk_size)
+        copy = checksum(conn, f"SELECT rowid, {names} FROM {new_table} ORDER BY rowid", chunk_size)
+        if source != copy:
+            raise RuntimeError(
+                f"Copy of {table} does not match ({source[0]} rows vs {copy[0]} rows, checksums differ: "
+                f"{source[1] != copy[1]}); {table} is unchanged"
+            )
+        for suffix in ("ai", "au", "ad"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}__rebuild_{suffix}")
+        schema = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+            (table,),
+        ).fetchall()
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+        for (sql,) in schema:
+            conn.execute(sql)
+        violations = conn.execute(f"PRAGMA foreign_key_check({table})").fetchall()
+        if violations:
+            raise RuntimeError(f"{len(violations)} rows of {table} violate foreign keys; {table} is unchanged")
+        conn.execute("DELETE FROM schema_rebuilds WHERE table_name = ?", (table,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    logger.info("%s: rebuilt, %d rows verified", table, copy[0])
+
+
+def _add_source(conn):
+    if add_column(conn, "receipts", "source", "TEXT"):
+        conn.execute("UPDATE receipts SET source = 'RECEIPT_SCANNER' WHERE source IS NULL")
+
+
+def _add_product_class_reference(conn):
+    # Superseded by product_class_pk in tables created with integer keys
+    if table_exists(conn, "products") and "product_class_pk" not in table_columns(conn, "products"):
+        add_column(conn, "products", "product_class_reference", "TEXT")
+
+
+def _add_tax_summary(conn):
+    add_column(conn, "receipts", "tax_summary", "TEXT")
+
+
+def _add_transcription(conn):
+    # Its own full-text index went with migration 12; receipts_search_fts covers it
+    add_column(conn, "receipts", "transcription", "TEXT")
+
+
+def _add_receipt_date(conn):
+    # Filled by scripts/backfill_receipt_dates.py
+    if table_exists(conn, "receipts"):
+        add_column(conn, "receipts", "receipt_date", "DATE")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_receipts_receipt_date ON receipts (receipt_date)")
+
+
+PRODUCTS_WITH_CASCADE = """
+    CREATE TABLE {table} (
+        id VARCHAR NOT NULL,
+        receipt_id VARCHAR NOT NULL,
+        name VARCHAR,
+        is_bio BOOLEAN,
+        bio_category VARCHAR(24),
+        amount FLOAT,
+        price FLOAT,
+        unit VARCHAR(5),
+        product_class_reference VARCHAR,
+        created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_on DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(receipt_id) REFERENCES receipts (id) ON DELETE CASCADE,
+        FOREIGN KEY(product_class_reference) REFERENCES sortiment (id) ON DELETE SET NULL
+    )
+"""
+
+
+def _products_cascade(conn):
+    """Products follow their receipt on delete and lose a deleted product class."""
+    if not table_exists(conn, "products"):
+        return
+    if any(row[6] == "CASCADE" for row in conn.execute("PRAGMA foreign_key_list(products)") if row[2] == "receipts"):
+        return
+    # The new foreign keys would reject them
+    orphans = conn.execute("DELETE FROM products WHERE receipt_id NOT IN (SELECT id FROM receipts)").rowcount
+    dangling = conn.execute(
+        "UPDATE products SET product_class_reference = NULL "
+        "WHERE product_class_reference IS NOT NULL AND product_class_reference NOT IN (SELECT id FROM sortiment)"
+    ).rowcount
+    if orphans or dangling:
+        logger.info("Removed %d orphaned products, cleared %d dangling product classes", orphans, dangling)
+    rebuild_table(conn, "products", PRODUCTS_WITH_CASCADE)
+
+
+def _add_company_id(conn):
+    # Filled by scripts/backfill_companies.py
+    add_column(conn, "receipts", "company_id", "INTEGER REFERENCES companies (id)")
+
+
+RECEIPTS_WITH_INTEGER_KEY = """
+    CREATE TABLE {table} (
+        created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_on DATETIME,
+        pk INTEGER NOT NULL,
+        id VARCHAR NOT NULL,
+        receipt_number VARCHAR,
+        date VARCHAR,
+        receipt_date DATE,
+        total_gross_amount FLOAT,
+        total_net_amount FLOAT,
+        vat_amount FLOAT,
+        company_name VARCHAR,
+        company_id INTEGER,
+        description VARCHAR,
+        comment VARCHAR,
+        is_credit BOOLEAN,
+        is_bio BOOLEAN,
+        tax_summary JSON,
+        file_paths JSON,
+        source VARCHAR,
+        transcription TEXT,
+        PRIMARY KEY (pk),
+        UNIQUE (id),
+        FOREIGN KEY(company_id) REFERENCES companies (id)
+    )
+"""
+
+SORTIMENT_WITH_INTEGER_KEY = """
+    CREATE TABLE {table} (
+        pk INTEGER NOT NULL,
+        id VARCHAR NOT NULL,
+        name VARCHAR NOT NULL,
+        created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_on DATETIME,
+        PRIMARY KEY (pk),
+        UNIQUE (id),
+        UNIQUE (name)
+    )
+"""
+
+PRODUCTS_WITH_INTEGER_KEYS = """
+    CREATE TABLE {table} (
+        pk INTEGER NOT NULL,
+        id VARCHAR NOT NULL,
+        receipt_pk INTEGER NOT NULL,
+        name VARCHAR,
+        is_bio BOOLEAN,
+        bio_category VARCHAR(24),
+        amount FLOAT,
+        price FLOAT,
+        unit VARCHAR(5),
+        product_class_pk INTEGER,
+        created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_on DATETIME,
+        PRIMARY KEY (pk),
+        UNIQUE (id),
+        FOREIGN KEY(receipt_pk) REFERENCES receipts (pk) ON DELETE CASCADE,
+        FOREIGN KEY(product_class_pk) REFERENCES sortiment (pk) ON DELETE SET NULL
+    )
+"""
+
+
+def _integer_keys_in(conn):
+    """
+    Rebuild receipts, sortiment and products with the old rowid as INTEGER PRIMARY KEY pk,
+    keeping the UUID in id, and point products at their receipt and class by pk.
+    The rowids do not change, so the full-text indexes keyed on them stay valid.
+    """
+    if table_exists(conn, "receipts") and "pk" not in table_columns(conn, "receipts"):
+        rebuild_table(conn, "receipts", RECEIPTS_WITH_INTEGER_KEY)
+    if table_exists(conn, "sortiment") and "pk" not in table_columns(conn, "sortiment"):
+        rebuild_table(conn, "sortiment", SORTIMENT_WITH_INTEGER_KEY)
+    if not table_exists(conn, "products") or "pk" in table_columns(conn, "products"):
+        return
+    orphans = conn.execute("DELETE FROM products WHERE receipt_id NOT IN (SELECT id FROM receipts)").rowcount
+    if orphans:
+        logger.info("Removed %d orphaned products", orphans)
+    columns = {
+        column: column
+        for column in ("id", "name", "is_bio", "bio_category", "amount", "price", "unit", "created_on", "updated_on")
+    }
+    columns["receipt_pk"] = "(SELECT receipts.rowid FROM receipts WHERE receipts.id = products.receipt_id)"
+    columns["product_class_pk"] = (
+        "(SELECT sortiment.rowid FROM sortiment WHERE sortiment.id = products.product_class_reference)"
+    )
+    # Indexes of the replaced columns would be re-created after the swap
+    conn.execute("DROP INDEX IF EXISTS ix_products_receipt_id")
+    conn.execute("DROP INDEX IF EXISTS ix_products_product_class_reference")
+    rebuild_table(conn, "products", PRODUCTS_WITH_INTEGER_KEYS, columns)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_products_receipt_pk ON products (receipt_pk)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_products_product_class_pk ON products (product_class_pk)")
+
+
+def _migrate_archives(conn, apply: Callable[[sqlite3.Connection], None]):
+    """Apply a migration to the read-only archive files of repository/archive.py as well."""
+    if not table_exists(conn, "archives"):
+        return
+    for (path,) in conn.execute("SELECT path FROM archives ORDER BY year").fetchall():
+        path = Path(path)
+        path.chmod(0o644)
+        archive = connect(str(path))
+        try:
+            apply(archive)
+            # Leave it as archive_year wrote it: no bookkeeping tables, rollback journal, packed
+            archive.execute("DROP TABLE schema_migrations")
+            archive.execute("DROP TABLE schema_rebuilds")
+            archive.execute("PRAGMA journal_mode=DELETE")
+            archive.execute("VACUUM")
+        finally:
+            archive.close()
+            path.chmod(0o444)
+
+
+def _integer_keys(conn):
+    _integer_keys_in(conn)
+    # The archives hold copies of the same tables and are read with the same statements
+    _migrate_archives(conn, _integer_keys_in)
+
+
+TAX_LINES_TABLE = """
+    CREATE TABLE IF NOT EXISTS receipt_tax_lines (
+        receipt_pk INTEGER NOT NULL,
+        rate INTEGER NOT NULL,
+        receipt_date DATE,
+        net_cents INTEGER NOT NULL,
+        tax_cents INTEGER NOT NULL,
+        gross_cents INTEGER NOT NULL,
+        PRIMARY KEY (receipt_pk, rate),
+        FOREIGN KEY(receipt_pk) REFERENCES receipts (pk) ON DELETE CASCADE
+    ) WITHOUT ROWID
+"""
+
+
+def _archive_tax_lines(archive):
+    if table_exists(archive, "receipt_tax_lines"):
+        return
+    archive.execute(TAX_LINES_TABLE)
+    archive.execute(
+        "CREATE INDEX IF NOT EXISTS ix_receipt_tax_lines_rate_receipt_date ON receipt_tax_lines (rate, receipt_date)"
+    )
+    archive.execute(TAX_LINES_FILL)
+
+
+def _tax_lines_in_archives(conn):
+    # receipts.db gets the table, its triggers and the backfill from ReceiptRepository.init_db
+    _migrate_archives(conn, _archive_tax_lines)
+
+
+# Receipt list indexes that ended on the free-text date or started with company_name; no
+# ReceiptFilter clause uses either column
+DEAD_FILTER_INDEXES = ["ix_receipts_is_credit_company_date", "ix_receipts_company_date", "ix_receipts_source_date"]
+
+
+# Receipt list page indexes on the plain column; the page key is coalesce(column, '')
+DEAD_PAGE_INDEXES = ["ix_receipts_created_on_id", "ix_receipts_company_id_created_on"]
+
+
+def _replace_receipt_indexes(conn, dead: list[str]):
+    if not table_exists(conn, "receipts"):
+        return
+    for name in dead:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    # The replacements, as the model declares them
+    for index in ReceiptDB.__table__.indexes:
+        conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect)))
+
+
+def _filter_indexes_in(conn):
+    _replace_receipt_indexes(conn, DEAD_FILTER_INDEXES)
+
+
+def _filter_indexes(conn):
+    _filter_indexes_in(conn)
+    _migrate_archives(conn, _filter_indexes_in)
+
+
+def _page_indexes_in(conn):
+    _replace_receipt_indexes(conn, DEAD_PAGE_INDEXES)
+
+
+def _page_indexes(conn):
+    _page_indexes_in(conn)
+    _migrate_archives(conn, _page_indexes_in)
+
+
+# Transcriptions had a second full-text index (unicode61, unfolded) next to the trigram
+# search index; they are a column of receipts_search_fts now
+DEAD_SEARCH_TRIGGERS = [f"receipts_{name}_{suffix}" for name in ("transcription", "search") for suffix in ("ai", "ad", "au")]
+
+
+def _transcriptions_in_search_index(conn):
+    for trigger in DEAD_SEARCH_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS receipt_transcriptions_fts")
+    # Recreated with the transcription column and refilled by ReceiptRepository.init_db
+    conn.execute("DROP TABLE IF EXISTS receipts_search_fts")
+
+
+# In order; the versions of released migrations never change
+MIGRATIONS = [
+    Migration(1, "add receipts.source", _add_source),
+    Migration(2, "add products.product_class_reference", _add_product_class_reference),
+    Migration(3, "add receipts.tax_summary", _add_tax_summary),
+    Migration(4, "add receipts.transcription with full-text index", _add_transcription),
+    Migration(5, "add receipts.receipt_date", _add_receipt_date),
+    Migration(6, "products: cascading foreign keys", _products_cascade),
+    Migration(7, "add receipts.company_id", _add_company_id),
+    Migration(8, "integer primary keys for receipts, sortiment and products", _integer_keys),
+    Migration(9, "receipt_tax_lines in archives", _tax_lines_in_archives),
+    Migration(10, "receipt filter indexes on company_id and receipt_date", _filter_indexes),
+    Migration(11, "receipt list page indexes with empty keys last", _page_indexes),
+    Migration(12, "transcriptions in the trigram search index", _transcriptions_in_search_index),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+
+def pending_migrations(conn: sqlite3.Connection) -> list[Migration]:
+    applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def run_migrations(db_path: str = DB_PATH) -> MigrationRun:
+    """Apply all pending migrations in order and record each one."""
+    conn = connect(db_path)
+    applied = []
+    try:
+        for migration in pending_migrations(conn):
+            logger.info("Migration %d: %s", migration.version, migration.name)
+            migration.apply(conn)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name, applied_on) VALUES (?, ?, ?)",
+                (migration.version, migration.name, datetime.datetime.now().isoformat(sep=" ")),
+            )
+            applied.append(migration.name)
+        return MigrationRun(applied=applied, schema_version=get_schema_version(conn))
+    finally:
+        conn.close()
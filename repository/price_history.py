@@ -0,0 +1,206 @@
+"""
+Index of historical unit prices per product name and company.
+Used to flag extracted product prices that are far off (e.g. a misread decimal, 12.90 vs 129.0)
+before they are saved.
+"""
+
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import func
+
+from repository.receipt_repository import DataVersionDB, ProductDB, ReceiptDB, SessionLocal
+
+# A price needs this much history before it can be flagged
+MIN_HISTORY = 3
+# Minimum deviation from the typical price in log10 units (0.5 ≈ factor 3.2)
+MIN_LOG_DEVIATION = 0.5
+# Deviation in standard deviations of the history's log prices
+MAX_STD_DEVIATION = 3.0
+# A misread decimal is a factor of 10, so noisy histories never raise the bar above ≈ factor 8
+MAX_LOG_DEVIATION = 0.9
+
+
+def normalize_key(value: Optional[str]) -> str:
+    """Lowercase, drop punctuation and collapse whitespace, so spelling variants share a key."""
+    if not value:
+        return ""
+    value = re.sub(r"[^\w\s]", " ", value.lower())
+    return " ".join(value.split())
+
+
+@dataclass
+class _PriceStats:
+    count: int = 0
+    sum_log: float = 0.0
+    sum_log_sq: float = 0.0
+
+    def add(self, log_price: float) -> None:
+        self.count += 1
+        self.sum_log += log_price
+        self.sum_log_sq += log_price * log_price
+
+    def without(self, log_price: float) -> "_PriceStats":
+        """Stats with one value removed, for checking a price that is already in the history."""
+        return _PriceStats(
+            self.count - 1, self.sum_log - log_price, self.sum_log_sq - log_price * log_price
+        )
+
+    @property
+    def mean(self) -> float:
+        return self.sum_log / self.count
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.sum_log_sq / self.count - self.mean**2, 0.0))
+
+
+@dataclass
+class PriceOutlier:
+    price: float
+    typical_price: float
+    history_count: int
+
+    @property
+    def ratio(self) -> float:
+        return self.price / self.typical_price
+
+
+class PriceHistoryIndex:
+    """
+    In-memory index of unit prices keyed by (normalized product name, normalized company).
+    A second entry per product name without company is kept as a fallback for new suppliers.
+    Lookups are two dict accesses; refresh() only reads products added since the last refresh,
+    unless products or receipts were changed or deleted, see refresh().
+    """
+
+    VERSIONED_TABLES = ("products", "receipts")
+
+    def __init__(self):
+        self._stats: dict[tuple[str, str], _PriceStats] = {}
+        # Product pk -> (name key, company key, log price) as indexed, for check()
+        self._entries: dict[int, tuple[str, str, float]] = {}
+        self._last_rowid = 0
+        self._last_receipt_pk = 0
+        self._versions: Optional[dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        name: Optional[str],
+        company_name: Optional[str],
+        price: Optional[float],
+        product_pk: Optional[int] = None,
+    ) -> None:
+        name_key = normalize_key(name)
+        if not name_key or not price or price <= 0:
+            return
+        log_price = math.log10(price)
+        company_key = normalize_key(company_name)
+        self._stats.setdefault((name_key, company_key), _PriceStats()).add(log_price)
+        if company_key:
+            self._stats.setdefault((name_key, ""), _PriceStats()).add(log_price)
+        if product_pk is not None:
+            self._entries[product_pk] = (name_key, company_key, log_price)
+
+    def _only_appended(self, session, versions: dict[str, int]) -> bool:
+        """
+        Whether products and receipts only got new rows since the last refresh.
+        Every insert, update and delete bumps its table's data version by one, so the
+        versions advanced by exactly the number of rows added only if nothing else changed.
+        """
+        if self._versions is None:
+            return False
+        new_products = session.query(func.count()).filter(ProductDB.pk > self._last_rowid).scalar()
+        new_receipts = session.query(func.count()).filter(ReceiptDB.pk > self._last_receipt_pk).scalar()
+        return (
+            versions["products"] - self._versions["products"] == new_products
+            and versions["receipts"] - self._versions["receipts"] == new_receipts
+        )
+
+    def refresh(self) -> int:
+        """
+        Add products inserted since the last refresh, or read the full history again if
+        products or receipts were edited or deleted since. Returns the number of rows read.
+        """
+        with self._lock:
+            with SessionLocal() as session:
+                # Versions first: a change while reading shows up as a mismatch next time
+                versions = dict(
+                    session.query(DataVersionDB.table_name, DataVersionDB.version)
+                    .filter(DataVersionDB.table_name.in_(self.VERSIONED_TABLES))
+                    .all()
+                )
+                versions = {table: versions.get(table, 0) for table in self.VERSIONED_TABLES}
+                if versions == self._versions:
+                    return 0
+                if not self._only_appended(session, versions):
+                    self._stats, self._entries = {}, {}
+                    self._last_rowid = self._last_receipt_pk = 0
+                last_receipt_pk = session.query(func.max(ReceiptDB.pk)).scalar() or 0
+                rows = (
+                    session.query(ProductDB.pk, ProductDB.name, ProductDB.price, ReceiptDB.company_name)
+                    .join(ReceiptDB, ProductDB.receipt_pk == ReceiptDB.pk)
+                    .filter(ProductDB.pk > self._last_rowid)
+                    .order_by(ProductDB.pk)
+                    .all()
+                )
+            for row_id, name, price, company_name in rows:
+                self.add(name, company_name, price, product_pk=row_id)
+                self._last_rowid = row_id
+            self._last_receipt_pk = last_receipt_pk
+            self._versions = versions
+            return len(rows)
+
+    def rebuild(self) -> int:
+        """Drop everything and read the full history again."""
+        with self._lock:
+            self._versions = None
+        return self.refresh()
+
+    def check(
+        self,
+        name: Optional[str],
+        company_name: Optional[str],
+        price: Optional[float],
+        product_pk: Optional[int] = None,
+    ) -> Optional[PriceOutlier]:
+        """
+        Check a unit price against the product's history.
+        Args:
+            name: product name as extracted
+            company_name: company of the receipt
+            price: unit price to check
+            product_pk: pk of a saved product, whose price as indexed is left out of its own history
+        Returns:
+            PriceOutlier if the price is far from the typical price, else None
+        """
+        name_key = normalize_key(name)
+        if not name_key or not price or price <= 0:
+            return None
+        log_price = math.log10(price)
+        entry = self._entries.get(product_pk) if product_pk is not None else None
+
+        def usable(key: tuple[str, str]) -> Optional[_PriceStats]:
+            stats = self._stats.get(key)
+            # The saved price counts towards its (name, company) key and the name-only fallback
+            if stats is not None and entry is not None and entry[0] == key[0] and key[1] in (entry[1], ""):
+                stats = stats.without(entry[2])
+            return stats if stats is not None and stats.count >= MIN_HISTORY else None
+
+        stats = usable((name_key, normalize_key(company_name)))
+        if stats is None:
+            stats = usable((name_key, ""))
+        if stats is None:
+            return None
+
+        deviation = abs(log_price - stats.mean)
+        threshold = min(max(MIN_LOG_DEVIATION, MAX_STD_DEVIATION * stats.std), MAX_LOG_DEVIATION)
+        if deviation < threshold:
+            return None
+        return PriceOutlier(
+            price=price, typical_price=10**stats.mean, history_count=stats.count
+        )
@@ -0,0 +1,115 @@
+"""
+Read models for the list and statistics pages.
+Each loader runs one projected SELECT with the joins done in SQL and reads the result
+straight into a DataFrame with pd.read_sql, instead of building ORM objects and turning
+them into dicts row by row. archive_years adds the rows of archived years (see
+repository/archive.py).
+"""
+
+from typing import Iterable
+from urllib.parse import quote_plus
+
+import pandas as pd
+from sqlalchemy import or_, select, type_coerce, String
+
+from models.product import BioCategory, ProductUnit
+from models.receipt import ReceiptSource
+from repository.archive import read_frame
+from repository.receipt_repository import ProductDB, ReceiptDB, ReceiptTaxLineDB, SortimentDB
+
+# Receipt columns of the receipt exports; the transcription is only needed for search and
+# pk is internal (exports and links use id)
+RECEIPT_COLUMNS = [
+    column for column in ReceiptDB.__table__.columns if column.key not in ("pk", "transcription")
+]
+
+# Companies of credit notes that list the sold cheese
+KAESEINNAHMEN_COMPANIES = ["Hofladen", "Kemmts Eina", "Wochenmarkt", "Marktwagen"]
+
+# Enum columns are stored by member name; the pages show the values
+_UNIT_VALUES = {member.name: member.value for member in ProductUnit}
+_BIO_CATEGORY_VALUES = {member.name: member.value for member in BioCategory}
+
+
+def receipt_urls(receipt_ids: pd.Series) -> pd.Series:
+    """Links to the receipt detail page."""
+    return "/receipt_detail?id=" + receipt_ids.astype(str).map(quote_plus)
+
+
+def _tax_cents(rate: int):
+    return (
+        select(ReceiptTaxLineDB.tax_cents)
+        .where(ReceiptTaxLineDB.receipt_pk == ReceiptDB.pk, ReceiptTaxLineDB.rate == rate)
+        .scalar_subquery()
+    )
+
+
+def receipts_frame(*where, archive_years: Iterable[int] = (), vat_rates: Iterable[int] = ()) -> pd.DataFrame:
+    """
+    Receipts matching all where clauses, ordered by receipt date.
+    The source of receipts from before the source column is filled in as RECEIPT_SCANNER.
+    vat_rates adds a vat_<rate> column per rate with the VAT of that rate from the tax lines
+    (0.0 if the receipt has none).
+    """
+    vat_rates = list(vat_rates)
+    columns = RECEIPT_COLUMNS + [_tax_cents(rate).label(f"vat_{rate}") for rate in vat_rates]
+    df = read_frame(select(*columns).where(*where).order_by(ReceiptDB.receipt_date), archive_years)
+    df["source"] = df["source"].fillna(ReceiptSource.RECEIPT_SCANNER.value)
+    for rate in vat_rates:
+        df[f"vat_{rate}"] = df[f"vat_{rate}"].fillna(0).astype("int64") / 100
+    return df
+
+
+def products_frame(*where, archive_years: Iterable[int] = ()) -> pd.DataFrame:
+    """
+    Products matching all where clauses with the company, direction, date and number of
+    their receipt and the name of their product class (product_class, None if unclassified).
+    unit and bio_category hold the enum values.
+    """
+    statement = (
+        select(
+            ProductDB.id,
+            ReceiptDB.id.label("receipt_id"),
+            ProductDB.name,
+            ProductDB.amount,
+            type_coerce(ProductDB.unit, String).label("unit"),
+            ProductDB.price,
+            ProductDB.is_bio,
+            type_coerce(ProductDB.bio_category, String).label("bio_category"),
+            SortimentDB.id.label("product_class_id"),
+            SortimentDB.name.label("product_class"),
+            ReceiptDB.company_name,
+            ReceiptDB.is_credit,
+            ReceiptDB.date,
+            ReceiptDB.receipt_number,
+        )
+        .join(ReceiptDB, ProductDB.receipt_pk == ReceiptDB.pk)
+        .outerjoin(SortimentDB, ProductDB.product_class_pk == SortimentDB.pk)
+        .where(*where)
+    )
+    df = read_frame(statement, archive_years)
+    df["unit"] = df["unit"].map(_UNIT_VALUES)
+    df["bio_category"] = df["bio_category"].map(_BIO_CATEGORY_VALUES)
+    df["receipt_url"] = receipt_urls(df["receipt_id"])
+    return df
+
+
+def bio_products_frame(archive_years: Iterable[int] = ()) -> pd.DataFrame:
+    """Bio products bought, for the Biokontrolle."""
+    return products_frame(
+        ReceiptDB.is_credit == False,  # noqa: E712  Only include non-credit receipts
+        ProductDB.is_bio == True,  # noqa: E712  Only include bio products
+        archive_years=archive_years,
+    )
+
+
+def kaese_products_frame(archive_years: Iterable[int] = ()) -> pd.DataFrame:
+    """Products of the cheese sales: credit notes of the shops and of the invoicing app."""
+    return products_frame(
+        ReceiptDB.is_credit == True,  # noqa: E712
+        or_(
+            ReceiptDB.company_name.in_(KAESEINNAHMEN_COMPANIES),
+            ReceiptDB.source == ReceiptSource.RECHNUNGSAPP,
+        ),
+        archive_years=archive_years,
+    )
@@ -1,114 +1,208 @@
 import datetime
-import os
-import uuid
+from dataclasses import dataclass
+from typing import Optional
 
 from sqlalchemy import (
-    JSON,
-    Boolean,
-    Column,
-    DateTime,
-    Float,
-    ForeignKey,
     String,
-    create_engine,
+    and_,
+    exists,
+    insert,
+    literal_column,
+    not_,
+    or_,
+    select,
+    text,
+    tuple_,
+    type_coerce,
 )
-from sqlalchemy import (
-    Enum as SAEnum,
-)
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.sql import func
 
-from models.product import BioCategory, ProductUnit
+# Registers the session listener that links receipts to their company
+import repository.companies  # noqa: F401
 from models.receipt import ReceiptSource
+from repository.file_index import receipt_file_paths, remove_unreferenced_files
+
+# The tables are imported from here by the rest of the app, see repository/tables.py
+from repository.tables import (  # noqa: F401
+    ArchiveDB,
+    AuditFindingDB,
+    AuditStateDB,
+    Base,
+    CompanyAliasDB,
+    CompanyDB,
+    CompanyTrigramDB,
+    DataVersionDB,
+    ProductDB,
+    ReceiptDB,
+    ReceiptStatsDB,
+    ReceiptTaxLineDB,
+    RegexDB,
+    SessionLocal,
+    SortimentDB,
+    StoredFileDB,
+    UvaCacheDB,
+    engine,
+)
+from repository.triggers import (
+    DATA_VERSION_DDL,
+    RECEIPT_STATS_DDL,
+    SEARCH_FTS_DDL,
+    SEARCH_INDEXES,
+    TAX_LINES_DDL,
+    UVA_CACHE_DDL,
+    rebuild_receipt_stats,
+    rebuild_search_index,
+    rebuild_tax_lines,
+)
+
+
+# Product columns taken over by _insert_products
+_PRODUCT_INSERT_COLUMNS = (
+    "name", "is_bio", "bio_category", "amount", "price", "unit", "product_class_pk"
+)
+
 
-DATABASE_URL = "sqlite:///./receipts.db"
-# Database URL (SQLite in this case)
-
-# Setup SQLAlchemy
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-# Create all tables
-Base.metadata.create_all(bind=engine)
-
-# Base = declarative_base()
-# # Define the Receipt table with SQLAlchemy
-
-
-class ReceiptDB(Base):
-    __tablename__ = "receipts"
-    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
-    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
-    id: str = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    receipt_number: str = Column(String, index=True)
-    date: str = Column(String)
-    total_gross_amount: float = Column(Float)
-    total_net_amount: float = Column(Float)
-    vat_amount: float = Column(Float)
-    company_name: str = Column(String)
-    description: str | None = Column(String)
-    comment: str | None = Column(String)
-    is_credit: bool = Column(Boolean, default=False)
-    is_bio: bool = Column(Boolean, default=False)
-    tax_summary: dict | None = Column(JSON, nullable=True)
-    file_paths: list[str] = Column(JSON)  # Store multiple image paths
-    source: str = Column(String, default=ReceiptSource.RECEIPT_SCANNER.value)
-
-    def should_have_products(self):
-        """Determine if a receipt should contain products based on its attributes."""
-        # No "kemmts eina" because we do it at the end of the year
-        bio_ausgabe = not self.is_credit and self.is_bio
-        verkauf_käse = self.is_credit and self.company_name in [
-            "Hofladen",
-            "Wochenmarkt",
-            "Marktwagen",
-            "Kemmts Eina",
-        ]
-        rechnungs_app = self.source == ReceiptSource.RECHNUNGSAPP.value
-
-        return bio_ausgabe or verkauf_käse or rechnungs_app
-
-
-# Sortiment Table
-class SortimentDB(Base):
-    __tablename__ = "sortiment"
-    id: str = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    name: str = Column(String, unique=True, nullable=False)
-    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
-    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
-
-
-# Regex Table for product classification
-class RegexDB(Base):
-    __tablename__ = "regex"
-    id: str = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    regex: str = Column(String, nullable=False)
-    product_class_id: str = Column(
-        String, ForeignKey("sortiment.id"), nullable=False, index=True
+def _insert_products(session, receipt_pk: int, products: list[ProductDB]) -> None:
+    """Bulk insert products of a receipt in the session's transaction."""
+    if not products:
+        return
+    session.execute(
+        insert(ProductDB),
+        [
+            {"receipt_pk": receipt_pk, **{key: getattr(p, key) for key in _PRODUCT_INSERT_COLUMNS}}
+            for p in products
+        ],
     )
-    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
-    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
 
 
-# Product Table
-class ProductDB(Base):
-    __tablename__ = "products"
-    id: str = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    receipt_id: str = Column(
-        String, ForeignKey("receipts.id"), nullable=False, index=True
+# Shop companies whose credit notes list the sold cheese as products
+PRODUCT_SALE_COMPANIES = ["Hofladen", "Wochenmarkt", "Marktwagen", "Kemmts Eina"]
+
+
+def should_have_products_clause():
+    """SQL version of ReceiptDB.should_have_products."""
+    is_credit = func.coalesce(ReceiptDB.is_credit, False)
+    return or_(
+        and_(not_(is_credit), func.coalesce(ReceiptDB.is_bio, False)),
+        and_(is_credit, ReceiptDB.company_name.in_(PRODUCT_SALE_COMPANIES)),
+        ReceiptDB.source == ReceiptSource.RECHNUNGSAPP.value,
     )
-    name: str | None = Column(String, nullable=True)
-    is_bio: bool | None = Column(Boolean, nullable=True)
-    bio_category: BioCategory | None = Column(SAEnum(BioCategory), nullable=True)
-    amount: float | None = Column(Float, nullable=True)
-    price: float | None = Column(Float, nullable=True)
-    unit: ProductUnit | None = Column(SAEnum(ProductUnit), nullable=True)
-    product_class_reference: str | None = Column(
-        String, ForeignKey("sortiment.id"), nullable=True, index=True
+
+
+def missing_products_clause():
+    """
+    SQL version of the "Missing Products" column of View Receipts: true unless the receipt
+    should have products and has some. Kemmts Eina credit notes are done at the end of the
+    year and never count as expecting products.
+    """
+    should_have = and_(
+        should_have_products_clause(),
+        not_(and_(func.coalesce(ReceiptDB.is_credit, False), ReceiptDB.company_name == "Kemmts Eina")),
     )
-    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
-    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
+    has_products = exists().where(ProductDB.receipt_pk == ReceiptDB.pk)
+    return not_(and_(should_have, has_products))
+
+
+@dataclass
+class ReceiptFilter:
+    """Filters of the receipt list; None means no restriction."""
+    is_credit: Optional[bool] = None
+    is_bio: Optional[bool] = None
+    has_comment: Optional[bool] = None
+    company_id: Optional[int] = None
+    source: Optional[str] = None
+    missing_products: Optional[bool] = None
+    # Receipt date range, both inclusive
+    date_from: Optional[datetime.date] = None
+    date_to: Optional[datetime.date] = None
+
+    def clauses(self) -> list:
+        # Written without COALESCE around indexed columns so SQLite can use the indexes
+        clauses = []
+        if self.is_credit is not None:
+            clauses.append(_flag_clause(ReceiptDB.is_credit, self.is_credit))
+        if self.is_bio is not None:
+            clauses.append(_flag_clause(ReceiptDB.is_bio, self.is_bio))
+        if self.has_comment is not None:
+            has_comment = func.coalesce(ReceiptDB.comment, "") != ""
+            clauses.append(has_comment if self.has_comment else not_(has_comment))
+        if self.company_id is not None:
+            clauses.append(ReceiptDB.company_id == self.company_id)
+        if self.source is not None:
+            source = ReceiptDB.source == self.source
+            if self.source == ReceiptSource.RECEIPT_SCANNER.value:
+                # Receipts from before the source column have none
+                source = or_(source, ReceiptDB.source.is_(None))
+            clauses.append(source)
+        if self.missing_products is not None:
+            missing = missing_products_clause()
+            clauses.append(missing if self.missing_products else not_(missing))
+        if self.date_from is not None:
+            clauses.append(ReceiptDB.receipt_date >= self.date_from)
+        if self.date_to is not None:
+            clauses.append(ReceiptDB.receipt_date <= self.date_to)
+        return clauses
+
+    def apply(self, query):
+        """Add the filters to a Query or select()."""
+        for clause in self.clauses():
+            query = query.filter(clause)
+        return query
+
+
+def _flag_clause(column, value: bool):
+    """column is value, where NULL counts as False."""
+    if value:
+        return column.is_(True)
+    return or_(column.is_(False), column.is_(None))
+
+
+# Columns get_receipts_page can order by; each has an index on (coalesce(column, ''), id).
+# The free-text date column is not one of them, its formats do not sort.
+PAGE_ORDER_COLUMNS = ("created_on", "receipt_date")
+
+
+def _page_key(column: str):
+    """
+    Sort key of the receipt list: the column as stored, '' if it is empty. A NULL would
+    never compare in the (key, id) cursor, so undated receipts would drop out of the list.
+    """
+    # A literal '', not a parameter, so that SQLite matches the expression of the index
+    return func.coalesce(type_coerce(getattr(ReceiptDB, column), String), literal_column("''"))
+
+
+def export_clauses(
+    created_since: Optional[datetime.date] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> list:
+    """
+    Receipts for the Steuerberaterin export: created on or after created_since or dated
+    on or after date_from, and dated on or before date_to. No clauses without bounds.
+    """
+    clauses = []
+    since = []
+    if created_since is not None:
+        since.append(ReceiptDB.created_on >= datetime.datetime.combine(created_since, datetime.time()))
+    if date_from is not None:
+        since.append(ReceiptDB.receipt_date >= date_from)
+    if since:
+        clauses.append(or_(*since))
+    if date_to is not None:
+        clauses.append(ReceiptDB.receipt_date <= date_to)
+    return clauses
+
+
+# Cursor of a receipt list page: (_page_key, id) of the last receipt shown
+ReceiptCursor = tuple[str, str]
+
+
+@dataclass
+class ReceiptPage:
+    receipts: list["ReceiptDB"]
+    # Pass as `after` to get the next page; None on the last page
+    next_cursor: Optional[ReceiptCursor]
 
 
 class ReceiptRepository:
@@ -118,19 +212,31 @@ class ReceiptRepository:
     def init_db(self):
         with SessionLocal() as session:
             Base.metadata.create_all(bind=session.bind)
-
-    def clean_up(self):
-        """Get all paths and compre with local dir /saved_images. Delete images in saved_images that are not in the database"""
-        with SessionLocal() as session:
-            db_paths = session.query(ReceiptDB.file_paths).all()
-            db_paths = set(path for path_group in db_paths for path in path_group[0])
-
-        local_paths = os.listdir("saved_images")
-        for local_path in local_paths:
-            local_path = "saved_images/" + local_path
-            if local_path not in db_paths:
-                os.remove(local_path)
-                print(f"Deleted {local_path}")
+            # create_all skips indexes of tables that already exist; checkfirst cannot see
+            # expression indexes, SQLite does not report them
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    session.execute(CreateIndex(index, if_not_exists=True))
+            for statement in (
+                SEARCH_FTS_DDL
+                + RECEIPT_STATS_DDL
+                + TAX_LINES_DDL
+                + UVA_CACHE_DDL
+                + DATA_VERSION_DDL
+            ):
+                session.execute(text(statement))
+            # Index the rows from before the search triggers existed
+            for index, (table, _) in SEARCH_INDEXES.items():
+                empty = session.execute(text(f"SELECT 1 FROM {index} LIMIT 1")).first() is None
+                if empty and session.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first():
+                    rebuild_search_index(session, index)
+            # Fill the statistics once for receipts from before the triggers existed
+            if not session.query(ReceiptStatsDB).first() and session.query(ReceiptDB.id).first():
+                rebuild_receipt_stats(session)
+            # Backfill the tax lines of receipts from before the triggers existed
+            if not session.query(ReceiptTaxLineDB).first() and session.query(ReceiptDB.pk).first():
+                rebuild_tax_lines(session)
+            session.commit()
 
     def create_receipt(self, db_receipt: ReceiptDB) -> ReceiptDB:
         print(db_receipt)
@@ -140,6 +246,31 @@ class ReceiptRepository:
             session.refresh(db_receipt)
             return db_receipt
 
+    def create_receipt_with_products(
+        self, db_receipt: ReceiptDB, products: list[ProductDB]
+    ) -> ReceiptDB:
+        """
+        Insert a receipt and its products in one transaction, the products as one bulk insert.
+        Args:
+            db_receipt: ReceiptDB, new receipt (its tax_summary is stored with it)
+            products: list of unsaved ProductDB; their receipt_pk is set to the new receipt
+        Returns:
+            ReceiptDB, the created receipt
+        """
+        with SessionLocal() as session:
+            session.add(db_receipt)
+            session.flush()
+            _insert_products(session, db_receipt.pk, products)
+            session.commit()
+            session.refresh(db_receipt)
+            return db_receipt
+
+    def add_products(self, receipt_pk: int, products: list[ProductDB]) -> None:
+        """Insert products of an existing receipt in one transaction."""
+        with SessionLocal() as session:
+            _insert_products(session, receipt_pk, products)
+            session.commit()
+
     def update_receipt(self, receipt_id: int, receipt_data: ReceiptDB) -> None:
         with SessionLocal() as session:
             receipt = (
@@ -154,21 +285,83 @@ class ReceiptRepository:
             session.commit()
 
     def delete_receipt(self, receipt_id: int) -> None:
+        """Delete a receipt with its products and the files no other receipt uses."""
         with SessionLocal() as session:
             receipt = (
                 session.query(ReceiptDB).filter(ReceiptDB.id == receipt_id).first()
             )
             if not receipt:
                 return None
+            file_paths = sorted(receipt_file_paths(receipt.file_paths))
+            session.query(ProductDB).filter(ProductDB.receipt_pk == receipt.pk).delete(
+                synchronize_session=False
+            )
             session.delete(receipt)
             session.commit()
+        remove_unreferenced_files(file_paths)
 
     def get_all_receipts(self):
-        if datetime.datetime.now().minute % 10 == 0:
-            self.clean_up()
         with SessionLocal() as session:
             return session.query(ReceiptDB).order_by(ReceiptDB.created_on.desc()).all()
 
+    def get_receipts_page(
+        self,
+        filters: Optional[ReceiptFilter] = None,
+        after: Optional[ReceiptCursor] = None,
+        limit: int = 50,
+        order_by: str = "created_on",
+    ) -> ReceiptPage:
+        """
+        One page of receipts, newest first, using keyset pagination over (order_by, id).
+        Receipts without a value in order_by come last.
+        Args:
+            filters: ReceiptFilter or None for all receipts
+            after: next_cursor of the previous page, None for the first page
+            limit: int, receipts per page
+            order_by: str, one of PAGE_ORDER_COLUMNS
+        Returns:
+            ReceiptPage with the receipts and the cursor of the next page
+        """
+        if order_by not in PAGE_ORDER_COLUMNS:
+            raise ValueError(f"Cannot page receipts by {order_by}")
+        key = _page_key(order_by)
+        with SessionLocal() as session:
+            query = (filters or ReceiptFilter()).apply(session.query(ReceiptDB, key))
+            if after is not None:
+                query = query.filter(tuple_(key, ReceiptDB.id) < tuple_(*after))
+            rows = query.order_by(key.desc(), ReceiptDB.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = (rows[-1][1], rows[-1][0].id) if has_more else None
+        return ReceiptPage(receipts=[receipt for receipt, _ in rows], next_cursor=next_cursor)
+
+    def count_receipts(self, filters: Optional[ReceiptFilter] = None) -> int:
+        with SessionLocal() as session:
+            query = (filters or ReceiptFilter()).apply(select(func.count()).select_from(ReceiptDB))
+            return session.execute(query).scalar()
+
+    def get_distinct_values(self, column: str) -> list[str]:
+        """Sorted distinct non-empty values of a receipt column, for filter options."""
+        # Companies come from get_companies
+        if column != "source":
+            raise ValueError(f"No distinct values for column {column}")
+        # A plain DISTINCT on the column is answered from ix_receipts_source_receipt_date
+        col = getattr(ReceiptDB, column)
+        with SessionLocal() as session:
+            values = session.execute(select(col).distinct()).scalars().all()
+        if column == "source":
+            values = [value or ReceiptSource.RECEIPT_SCANNER.value for value in values]
+        return sorted({value for value in values if value})
+
+    def get_companies(self) -> dict[int, str]:
+        """Canonical name by company id, sorted by name."""
+        with SessionLocal() as session:
+            return dict(session.execute(select(CompanyDB.id, CompanyDB.name).order_by(CompanyDB.name)).all())
+
     def get_receipt_by_id(self, receipt_id: int):
         with SessionLocal() as session:
             return session.query(ReceiptDB).filter(ReceiptDB.id == receipt_id).first()
+
+    def get_receipts_by_ids(self, receipt_ids: list[str]) -> list[ReceiptDB]:
+        with SessionLocal() as session:
+            return session.query(ReceiptDB).filter(ReceiptDB.id.in_(receipt_ids)).all()
@@ -0,0 +1,94 @@
+"""
+Global search over receipts (company, description, comment, receipt number, transcription)
+and product names, using the trigram FTS5 indexes kept in sync by the triggers in
+SEARCH_FTS_DDL (repository/triggers.py).
+Hits of both kinds are ranked together by bm25 and fetched one page at a time.
+"""
+
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import text
+
+from repository.read_models import receipt_urls
+from repository.receipt_repository import SessionLocal
+from repository.triggers import fold_search_text
+
+SEARCH_KINDS = ("receipt", "product")
+
+# The trigram index cannot match shorter terms
+MIN_TERM_LENGTH = 3
+
+_RECEIPT_HITS = """
+    SELECT 'receipt' AS kind, receipts.id AS receipt_id, receipts.date, receipts.company_name,
+           receipts.receipt_number, receipts.description AS name, receipts.comment,
+           receipts.total_gross_amount AS amount,
+           snippet(receipts_search_fts, -1, '**', '**', '…', 12) AS excerpt,
+           -- Company and receipt number matches count more than the free text
+           bm25(receipts_search_fts, 4.0, 2.0, 1.0, 4.0, 1.0) AS rank
+    FROM receipts_search_fts
+    JOIN receipts ON receipts.rowid = receipts_search_fts.rowid
+    WHERE receipts_search_fts MATCH :query
+"""
+
+_PRODUCT_HITS = """
+    SELECT 'product' AS kind, receipts.id AS receipt_id, receipts.date, receipts.company_name,
+           receipts.receipt_number, products.name, NULL AS comment,
+           products.price AS amount, NULL AS excerpt,
+           bm25(products_search_fts) AS rank
+    FROM products_search_fts
+    JOIN products ON products.rowid = products_search_fts.rowid
+    JOIN receipts ON receipts.pk = products.receipt_pk
+    WHERE products_search_fts MATCH :query
+"""
+
+_HITS = {"receipt": _RECEIPT_HITS, "product": _PRODUCT_HITS}
+_COUNTS = {
+    "receipt": "SELECT COUNT(*) FROM receipts_search_fts WHERE receipts_search_fts MATCH :query",
+    "product": "SELECT COUNT(*) FROM products_search_fts WHERE products_search_fts MATCH :query",
+}
+
+
+@dataclass
+class SearchResults:
+    hits: pd.DataFrame
+    total: int
+
+
+def to_search_query(query: str) -> str:
+    """
+    Turn free text into a query for the trigram indexes: every word must occur somewhere,
+    folded like the indexed text. Words shorter than MIN_TERM_LENGTH are left out.
+    """
+    terms = [term.replace('"', '""') for term in fold_search_text(query).split()]
+    return " ".join(f'"{term}"' for term in terms if len(term) >= MIN_TERM_LENGTH)
+
+
+def search(query: str, kinds=SEARCH_KINDS, limit: int = 25, offset: int = 0) -> SearchResults:
+    """
+    One page of search hits, best first.
+    Args:
+        query: free text, see to_search_query
+        kinds: hit kinds to include, "receipt" and/or "product"
+        limit: page size
+        offset: number of hits on the previous pages
+    Returns:
+        the hits (kind, receipt_id, date, company_name, receipt_number, name, comment,
+        amount, excerpt, rank, receipt_url) and the total number of hits; excerpt is the
+        matching passage of a receipt, folded like the index, with the words in bold
+    """
+    fts_query = to_search_query(query)
+    kinds = [kind for kind in SEARCH_KINDS if kind in kinds]
+    if not fts_query or not kinds:
+        return SearchResults(hits=pd.DataFrame(columns=["kind", "receipt_id", "rank", "receipt_url"]), total=0)
+
+    statement = text(
+        " UNION ALL ".join(_HITS[kind] for kind in kinds)
+        + " ORDER BY rank, kind, receipt_id LIMIT :limit OFFSET :offset"
+    )
+    params = {"query": fts_query, "limit": limit, "offset": offset}
+    with SessionLocal() as session:
+        hits = pd.read_sql(statement, session.connection(), params=params)
+        total = sum(session.execute(text(_COUNTS[kind]), {"query": fts_query}).scalar() for kind in kinds)
+    hits["receipt_url"] = receipt_urls(hits["receipt_id"])
+    return SearchResults(hits=hits, total=total)
@@ -0,0 +1,89 @@
+"""
+Connection settings for the SQLite database, read from the environment (.env).
+The PRAGMAs are applied to every new connection of the pool; see
+scripts/bench_sqlite_settings.py for the measurements behind the defaults.
+"""
+
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class SqliteSettings:
+    # WAL lets page loads read while another connection writes
+    journal_mode: str = "WAL"
+    # NORMAL is durable in WAL mode except for the last transactions on power loss
+    synchronous: str = "NORMAL"
+    # Wait this long for a lock instead of failing with "database is locked"
+    busy_timeout_ms: int = 10_000
+    mmap_size: int = 256 * 1024 * 1024
+    # Page cache per connection in KiB
+    cache_size_kib: int = 16 * 1024
+    foreign_keys: bool = True
+    temp_store: str = "MEMORY"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SqliteSettings":
+        default = cls()
+        return cls(
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", default.journal_mode),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", default.synchronous),
+            busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", default.busy_timeout_ms)),
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", default.mmap_size)),
+            cache_size_kib=int(os.getenv("SQLITE_CACHE_SIZE_KIB", default.cache_size_kib)),
+            foreign_keys=_env_bool("SQLITE_FOREIGN_KEYS", default.foreign_keys),
+            temp_store=os.getenv("SQLITE_TEMP_STORE", default.temp_store),
+            pool_size=int(os.getenv("SQLITE_POOL_SIZE", default.pool_size)),
+            max_overflow=int(os.getenv("SQLITE_MAX_OVERFLOW", default.max_overflow)),
+            pool_timeout=float(os.getenv("SQLITE_POOL_TIMEOUT", default.pool_timeout)),
+        )
+
+    def pragmas(self) -> list[str]:
+        return [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}",
+            f"PRAGMA mmap_size={int(self.mmap_size)}",
+            # Negative values are KiB instead of pages
+            f"PRAGMA cache_size={-int(self.cache_size_kib)}",
+            f"PRAGMA foreign_keys={'ON' if self.foreign_keys else 'OFF'}",
+            f"PRAGMA temp_store={self.temp_store}",
+        ]
+
+    def engine_kwargs(self) -> dict:
+        """Arguments for create_engine besides the URL."""
+        return {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": self.busy_timeout_ms / 1000,
+            },
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+        }
+
+
+def apply_sqlite_settings(engine: Engine, settings: SqliteSettings) -> None:
+    """Run the settings' PRAGMAs on every connection the engine opens."""
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in settings.pragmas():
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
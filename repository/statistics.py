@@ -0,0 +1,33 @@
+"""
+Pre-aggregated receipt totals for the statistics pages, read from receipt_stats.
+The table is maintained by triggers on receipts (see RECEIPT_STATS_DDL) and holds one row
+per month, direction, company and source, so the pages read a few hundred rows instead
+of every receipt. Archives carry the receipt_stats of their year.
+"""
+
+from typing import Iterable
+
+import pandas as pd
+from sqlalchemy import select
+
+from repository.archive import read_frame
+from repository.receipt_repository import ReceiptStatsDB
+
+
+def get_receipt_stats(archive_years: Iterable[int] = ()) -> pd.DataFrame:
+    """
+    Receipt totals per month (a Period, NaT for undated receipts), is_credit, company_name
+    and source (None if missing), with receipt_count and the sums total_gross_amount, total_net_amount and
+    vat_amount in euros. archive_years adds the totals of archived years.
+    """
+    df = read_frame(select(ReceiptStatsDB.__table__), archive_years)
+    df["is_credit"] = df["is_credit"].astype(bool)
+    df["month"] = pd.PeriodIndex(df["month"].replace("", None), freq="M")
+    df[["company_name", "source"]] = df[["company_name", "source"]].replace("", None)
+    for cents, euros in (
+        ("gross_cents", "total_gross_amount"),
+        ("net_cents", "total_net_amount"),
+        ("vat_cents", "vat_amount"),
+    ):
+        df[euros] = df.pop(cents) / 100
+    return df
@@ -0,0 +1,266 @@
+"""
+Database engine, sessions and the ORM tables of receipts.db.
+Outside of this package, import the tables from repository.receipt_repository: importing
+it registers the session listeners of repository/companies.py and repository/file_index.py
+that keep company_id and stored_files in sync on every flush.
+"""
+import datetime
+import uuid
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    text,
+)
+from sqlalchemy import (
+    Enum as SAEnum,
+)
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, validates
+from sqlalchemy.sql import func
+
+from models.product import BioCategory, ProductUnit
+from models.receipt import ReceiptSource
+from receipt_parser.dates import parse_receipt_date
+from repository.sqlite_settings import SqliteSettings, apply_sqlite_settings
+
+DATABASE_URL = "sqlite:///./receipts.db"
+# Database URL (SQLite in this case)
+
+# Setup SQLAlchemy
+sqlite_settings = SqliteSettings.from_env()
+engine = create_engine(DATABASE_URL, **sqlite_settings.engine_kwargs())
+apply_sqlite_settings(engine, sqlite_settings)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+# Create all tables
+Base.metadata.create_all(bind=engine)
+
+# Base = declarative_base()
+# # Define the Receipt table with SQLAlchemy
+
+
+class ReceiptDB(Base):
+    __tablename__ = "receipts"
+    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
+    # Joins go over the integer pk; id is the stable external id used in links (/receipt_detail?id=)
+    pk: int = Column(Integer, primary_key=True)
+    id: str = Column(String, unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    receipt_number: str = Column(String, index=True)
+    date: str = Column(String)  # As printed on the receipt
+    receipt_date: datetime.date | None = Column(Date, nullable=True, index=True)  # Parsed from date
+    total_gross_amount: float = Column(Float)
+    total_net_amount: float = Column(Float)
+    vat_amount: float = Column(Float)
+    # Canonical name of company_id for new receipts; kept as typed when edited, see _assign_companies
+    company_name: str = Column(String)
+    company_id: int | None = Column(Integer, ForeignKey("companies.id"), nullable=True)
+    description: str | None = Column(String)
+    comment: str | None = Column(String)
+    is_credit: bool = Column(Boolean, default=False)
+    is_bio: bool = Column(Boolean, default=False)
+    tax_summary: dict | None = Column(JSON, nullable=True)
+    file_paths: list[str] = Column(JSON)  # Store multiple image paths
+    source: str = Column(String, default=ReceiptSource.RECEIPT_SCANNER.value)
+    transcription: str | None = Column(Text, nullable=True)
+
+    @validates("date")
+    def _validate_date(self, key, value):
+        """Keep receipt_date in sync with date; it stays empty if the date cannot be read."""
+        if isinstance(value, str):
+            value = value.strip() or None
+        self.receipt_date = parse_receipt_date(value)
+        return value
+
+    def should_have_products(self):
+        """Determine if a receipt should contain products based on its attributes."""
+        # No "kemmts eina" because we do it at the end of the year
+        bio_ausgabe = not self.is_credit and self.is_bio
+        verkauf_käse = self.is_credit and self.company_name in [
+            "Hofladen",
+            "Wochenmarkt",
+            "Marktwagen",
+            "Kemmts Eina",
+        ]
+        rechnungs_app = self.source == ReceiptSource.RECHNUNGSAPP.value
+
+        return bio_ausgabe or verkauf_käse or rechnungs_app
+
+    __table_args__ = (
+        # Keyset pagination of the receipt list, newest first, on the key of _page_key
+        Index("ix_receipts_page_created_on", text("coalesce(created_on, '')"), "id"),
+        Index("ix_receipts_page_receipt_date", text("coalesce(receipt_date, '')"), "id"),
+        # Filters of the receipt list (see ReceiptFilter) and the distinct source options
+        Index("ix_receipts_is_credit_company_id_receipt_date", "is_credit", "company_id", "receipt_date"),
+        Index("ix_receipts_company_id_receipt_date", "company_id", "receipt_date"),
+        Index("ix_receipts_source_receipt_date", "source", "receipt_date"),
+        Index("ix_receipts_is_bio_is_credit", "is_bio", "is_credit"),
+        Index("ix_receipts_company_id_page_created_on", "company_id", text("coalesce(created_on, '')"), "id"),
+    )
+
+
+# Companies with their canonical name. Every spelling seen on a receipt is an alias,
+# stored under its company_key; company_trigrams indexes the aliases for the fuzzy
+# lookup in similar_companies (repository/companies.py).
+class CompanyDB(Base):
+    __tablename__ = "companies"
+    id: int = Column(Integer, primary_key=True)
+    name: str = Column(String, unique=True, nullable=False)
+    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CompanyAliasDB(Base):
+    __tablename__ = "company_aliases"
+    key: str = Column(String, primary_key=True)
+    company_id: int = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False, index=True)
+    name: str = Column(String, nullable=False)  # Spelling the alias was first seen in
+    trigram_count: int = Column(Integer, nullable=False)
+
+
+class CompanyTrigramDB(Base):
+    __tablename__ = "company_trigrams"
+    trigram: str = Column(String, primary_key=True)
+    alias_key: str = Column(String, ForeignKey("company_aliases.key", ondelete="CASCADE"), primary_key=True)
+    __table_args__ = {"sqlite_with_rowid": False}
+
+# Sortiment Table
+class SortimentDB(Base):
+    __tablename__ = "sortiment"
+    pk: int = Column(Integer, primary_key=True)
+    id: str = Column(String, unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    name: str = Column(String, unique=True, nullable=False)
+    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+# Regex Table for product classification
+class RegexDB(Base):
+    __tablename__ = "regex"
+    id: str = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    regex: str = Column(String, nullable=False)
+    product_class_id: str = Column(
+        String, ForeignKey("sortiment.id"), nullable=False, index=True
+    )
+    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+# Product Table
+class ProductDB(Base):
+    __tablename__ = "products"
+    pk: int = Column(Integer, primary_key=True)
+    id: str = Column(String, unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    receipt_pk: int = Column(
+        Integer, ForeignKey("receipts.pk", ondelete="CASCADE"), nullable=False, index=True
+    )
+    name: str | None = Column(String, nullable=True)
+    is_bio: bool | None = Column(Boolean, nullable=True)
+    bio_category: BioCategory | None = Column(SAEnum(BioCategory), nullable=True)
+    amount: float | None = Column(Float, nullable=True)
+    price: float | None = Column(Float, nullable=True)
+    unit: ProductUnit | None = Column(SAEnum(ProductUnit), nullable=True)
+    product_class_pk: int | None = Column(
+        Integer, ForeignKey("sortiment.pk", ondelete="SET NULL"), nullable=True, index=True
+    )
+    created_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+    updated_on: datetime = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+# Closed years moved to read-only archive files, see repository/archive.py
+class ArchiveDB(Base):
+    __tablename__ = "archives"
+    year: int = Column(Integer, primary_key=True)
+    path: str = Column(String, nullable=False)
+    receipt_count: int = Column(Integer, nullable=False)
+    product_count: int = Column(Integer, nullable=False)
+    archived_on: datetime = Column(DateTime, nullable=False)
+
+
+# Computed VAT return figures per period ('2025-03' or '2025-Q1'), see repository/uva.py;
+# dropped by the UVA_CACHE_DDL triggers when a receipt of the period changes
+class UvaCacheDB(Base):
+    __tablename__ = "uva_cache"
+    period: str = Column(String, primary_key=True)
+    result: dict = Column(JSON, nullable=False)
+    computed_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Results of the consistency audit, see repository/audit.py
+class AuditFindingDB(Base):
+    __tablename__ = "audit_findings"
+    receipt_id: str = Column(String, primary_key=True)
+    rule: str = Column(String, primary_key=True)
+    score: float = Column(Float, nullable=False)
+    detail: str = Column(String)
+    found_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# What the audit saw of each receipt, to find receipts changed since they were checked
+class AuditStateDB(Base):
+    __tablename__ = "audit_state"
+    receipt_id: str = Column(String, primary_key=True)
+    checked_on: datetime = Column(DateTime(timezone=True), server_default=func.now())
+    product_count: int = Column(Integer, nullable=False, default=0)
+    product_total_cents: int = Column(Integer, nullable=False, default=0)
+
+
+# Receipt totals per month, direction, company and source for the statistics pages.
+# Kept up to date by the RECEIPT_STATS_DDL triggers; empty strings stand for missing values
+# (month '' holds receipts without a readable date).
+class ReceiptStatsDB(Base):
+    __tablename__ = "receipt_stats"
+    month: str = Column(String, primary_key=True)
+    is_credit: bool = Column(Boolean, primary_key=True)
+    company_name: str = Column(String, primary_key=True)
+    source: str = Column(String, primary_key=True)
+    receipt_count: int = Column(Integer, nullable=False, default=0)
+    gross_cents: int = Column(Integer, nullable=False, default=0)
+    net_cents: int = Column(Integer, nullable=False, default=0)
+    vat_cents: int = Column(Integer, nullable=False, default=0)
+
+
+# One row per VAT rate of a receipt's tax_summary, in cents. Derived from tax_summary by the
+# TAX_LINES_DDL triggers, so VAT can be summed per rate in SQL; receipt_date is copied from
+# the receipt for the (rate, receipt_date) index. tax_summary stays the value that is
+# written: the triggers derive the lines in the same statement, also for raw SQL writes.
+class ReceiptTaxLineDB(Base):
+    __tablename__ = "receipt_tax_lines"
+    receipt_pk: int = Column(Integer, ForeignKey("receipts.pk", ondelete="CASCADE"), primary_key=True)
+    rate: int = Column(Integer, primary_key=True)
+    receipt_date: datetime.date | None = Column(Date, nullable=True)
+    net_cents: int = Column(Integer, nullable=False, default=0)
+    tax_cents: int = Column(Integer, nullable=False, default=0)
+    gross_cents: int = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        Index("ix_receipt_tax_lines_rate_receipt_date", "rate", "receipt_date"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+# Change counter per table, bumped by triggers on every written row (see DATA_VERSION_DDL).
+# Cached page datasets are keyed on the versions of the tables they read.
+class DataVersionDB(Base):
+    __tablename__ = "data_versions"
+    table_name: str = Column(String, primary_key=True)
+    version: int = Column(Integer, nullable=False, default=0)
+
+
+# Index of the files in saved_images. receipt_id is NULL for uploads not saved to a receipt
+# yet and for files released by a receipt; those are removed by repository/file_gc.py
+# once registered_on is older than the grace period.
+class StoredFileDB(Base):
+    __tablename__ = "stored_files"
+    path: str = Column(String, primary_key=True)
+    receipt_id: str | None = Column(String, nullable=True, index=True)
+    registered_on: datetime = Column(DateTime, nullable=False)
@@ -0,0 +1,257 @@
+"""
+Tables derived from receipts and products by SQLite triggers: the search indexes,
+receipt_stats, receipt_tax_lines, the uva_cache invalidation and the data_versions
+counters, with the functions that refill them. ReceiptRepository.init_db creates the
+triggers; as triggers they also see raw SQL writes (backfills, migrations, archive_year).
+"""
+from sqlalchemy import select, text
+
+from repository.tables import DataVersionDB, SessionLocal
+
+# Search index over receipt fields, transcriptions and product names for the search page.
+# The trigram tokenizer matches substrings, so "käse" also finds "Bergkäse". The text is
+# stored folded (lower case, umlauts and ß spelled out) and queries are folded the same way,
+# so "Käse" and "Kaese" find each other.
+SEARCH_FOLDING = [("Ä", "ae"), ("ä", "ae"), ("Ö", "oe"), ("ö", "oe"), ("Ü", "ue"), ("ü", "ue"), ("ß", "ss")]
+
+SEARCH_INDEXES = {
+    "receipts_search_fts": ("receipts", ["company_name", "description", "comment", "receipt_number", "transcription"]),
+    "products_search_fts": ("products", ["name"]),
+}
+
+
+def fold_search_text(value: str) -> str:
+    """Python version of the folding applied to the indexed text."""
+    value = value.lower()
+    for char, replacement in SEARCH_FOLDING:
+        value = value.replace(char, replacement)
+    return value
+
+
+def _fold_sql(expression: str) -> str:
+    # lower() only folds ASCII, hence the upper case umlauts in SEARCH_FOLDING
+    sql = f"lower({expression})"
+    for char, replacement in SEARCH_FOLDING:
+        sql = f"replace({sql}, '{char}', '{replacement}')"
+    return sql
+
+
+def _search_insert(index: str, row: str) -> str:
+    table, columns = SEARCH_INDEXES[index]
+    values = ", ".join(_fold_sql(f"{row}.{column}") for column in columns)
+    source = f" FROM {table}" if row == table else ""
+    return f"INSERT INTO {index} (rowid, {', '.join(columns)}) SELECT {row}.rowid, {values}{source};"
+
+
+SEARCH_FTS_DDL = [
+    statement
+    for index, (table, columns) in SEARCH_INDEXES.items()
+    for statement in (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({', '.join(columns)}, tokenize='trigram')",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN
+            {_search_insert(index, "new")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM {index} WHERE rowid = old.rowid;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {', '.join(columns)} ON {table} BEGIN
+            DELETE FROM {index} WHERE rowid = old.rowid;
+            {_search_insert(index, "new")}
+        END
+        """,
+    )
+]
+
+
+def rebuild_search_index(session, index: str) -> None:
+    """Refill a search index from its table."""
+    session.execute(text(f"DELETE FROM {index}"))
+    session.execute(text(_search_insert(index, SEARCH_INDEXES[index][0])))
+
+
+def _stats_key(row: str) -> str:
+    return (
+        f"COALESCE(strftime('%Y-%m', {row}.receipt_date), ''), COALESCE({row}.is_credit, 0), "
+        f"COALESCE({row}.company_name, ''), COALESCE({row}.source, '')"
+    )
+
+
+def _cents(expression: str) -> str:
+    # Rounding to 2 places first matches receipt_parser.money.to_cents on decimal ties
+    return f"CAST(ROUND(ROUND(COALESCE({expression}, 0), 2) * 100) AS INTEGER)"
+
+
+_STATS_COLUMNS = "month, is_credit, company_name, source, receipt_count, gross_cents, net_cents, vat_cents"
+
+
+def _stats_add(row: str) -> str:
+    return f"""
+        INSERT INTO receipt_stats ({_STATS_COLUMNS})
+        VALUES ({_stats_key(row)}, 1, {_cents(f"{row}.total_gross_amount")},
+                {_cents(f"{row}.total_net_amount")}, {_cents(f"{row}.vat_amount")})
+        ON CONFLICT (month, is_credit, company_name, source) DO UPDATE SET
+            receipt_count = receipt_count + 1,
+            gross_cents = gross_cents + excluded.gross_cents,
+            net_cents = net_cents + excluded.net_cents,
+            vat_cents = vat_cents + excluded.vat_cents;
+    """
+
+
+def _stats_remove(row: str) -> str:
+    key = f"(month, is_credit, company_name, source) = ({_stats_key(row)})"
+    return f"""
+        UPDATE receipt_stats SET
+            receipt_count = receipt_count - 1,
+            gross_cents = gross_cents - {_cents(f"{row}.total_gross_amount")},
+            net_cents = net_cents - {_cents(f"{row}.total_net_amount")},
+            vat_cents = vat_cents - {_cents(f"{row}.vat_amount")}
+        WHERE {key};
+        DELETE FROM receipt_stats WHERE {key} AND receipt_count <= 0;
+    """
+
+
+RECEIPT_STATS_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_stats_ai AFTER INSERT ON receipts BEGIN
+        {_stats_add("new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_stats_ad AFTER DELETE ON receipts BEGIN
+        {_stats_remove("old")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_stats_au AFTER UPDATE OF
+        receipt_date, is_credit, company_name, source, total_gross_amount, total_net_amount, vat_amount
+    ON receipts BEGIN
+        {_stats_remove("old")}
+        {_stats_add("new")}
+    END
+    """,
+]
+
+
+def _tax_lines_select(row: str) -> str:
+    # Receipts without a valid tax_summary object have no lines
+    summary = f"{row}.tax_summary"
+    source = "receipts, " if row == "receipts" else ""
+    entries = f"CASE WHEN json_valid({summary}) THEN CASE WHEN json_type({summary}) = 'object' THEN {summary} END END"
+    return f"""
+        SELECT {row}.pk, CAST(e.key AS INTEGER), {row}.receipt_date,
+               {_cents("json_extract(e.value, '$.net_sum')")},
+               {_cents("json_extract(e.value, '$.tax_sum')")},
+               {_cents("json_extract(e.value, '$.gross_sum')")}
+        FROM {source}json_each({entries}) e
+    """
+
+
+_TAX_LINES_INSERT = (
+    "INSERT OR REPLACE INTO receipt_tax_lines (receipt_pk, rate, receipt_date, net_cents, tax_cents, gross_cents)"
+)
+
+# Also used for archives, which have no triggers
+TAX_LINES_FILL = f"{_TAX_LINES_INSERT}{_tax_lines_select('receipts')}"
+
+# The delete trigger also covers connections with foreign keys off (migrations, archive_year)
+TAX_LINES_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_tax_lines_ai AFTER INSERT ON receipts BEGIN
+        {_TAX_LINES_INSERT}{_tax_lines_select("new")};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS receipts_tax_lines_ad AFTER DELETE ON receipts BEGIN
+        DELETE FROM receipt_tax_lines WHERE receipt_pk = old.pk;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_tax_lines_au AFTER UPDATE OF tax_summary, receipt_date ON receipts BEGIN
+        DELETE FROM receipt_tax_lines WHERE receipt_pk = old.pk;
+        {_TAX_LINES_INSERT}{_tax_lines_select("new")};
+    END
+    """,
+]
+
+
+def _period_keys_sql(row: str) -> str:
+    """SQL list of the month and quarter keys of a receipt row, see receipt_parser.dates.period_keys."""
+    day = f"{row}.receipt_date"
+    quarter = f"strftime('%Y', {day}) || '-Q' || ((CAST(strftime('%m', {day}) AS INTEGER) + 2) / 3)"
+    return f"(strftime('%Y-%m', {day}), {quarter})"
+
+
+# Drop the cached VAT return figures of the periods a receipt moves into or out of. As
+# triggers they also see raw SQL writes (backfills, archive_year); undated receipts have no
+# period and match nothing.
+UVA_CACHE_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_uva_cache_ai AFTER INSERT ON receipts BEGIN
+        DELETE FROM uva_cache WHERE period IN {_period_keys_sql("new")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_uva_cache_ad AFTER DELETE ON receipts BEGIN
+        DELETE FROM uva_cache WHERE period IN {_period_keys_sql("old")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_uva_cache_au AFTER UPDATE ON receipts BEGIN
+        DELETE FROM uva_cache WHERE period IN {_period_keys_sql("old")};
+        DELETE FROM uva_cache WHERE period IN {_period_keys_sql("new")};
+    END
+    """,
+]
+
+
+VERSIONED_TABLES = ["receipts", "products", "sortiment", "regex", "companies"]
+
+DATA_VERSION_DDL = [
+    f"INSERT OR IGNORE INTO data_versions (table_name, version) VALUES ('{table}', 0)"
+    for table in VERSIONED_TABLES
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event_name} ON {table} BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+    END
+    """
+    for table in VERSIONED_TABLES
+    for suffix, event_name in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+]
+
+
+def get_data_versions() -> dict[str, int]:
+    """Current change counter of every versioned table."""
+    with SessionLocal() as session:
+        return dict(session.execute(select(DataVersionDB.table_name, DataVersionDB.version)).all())
+
+
+def rebuild_receipt_stats(session) -> int:
+    """Recompute receipt_stats from all receipts. Returns the number of rows."""
+    session.execute(text("DELETE FROM receipt_stats"))
+    session.execute(
+        text(
+            f"""
+            INSERT INTO receipt_stats ({_STATS_COLUMNS})
+            SELECT {_stats_key("receipts")}, COUNT(*),
+                   SUM({_cents("receipts.total_gross_amount")}),
+                   SUM({_cents("receipts.total_net_amount")}),
+                   SUM({_cents("receipts.vat_amount")})
+            FROM receipts
+            GROUP BY 1, 2, 3, 4
+            """
+        )
+    )
+    return session.execute(text("SELECT COUNT(*) FROM receipt_stats")).scalar()
+
+
+def rebuild_tax_lines(session) -> int:
+    """Recompute receipt_tax_lines from the tax_summary of all receipts. Returns the number of rows."""
+    session.execute(text("DELETE FROM receipt_tax_lines"))
+    session.execute(text(TAX_LINES_FILL))
+    return session.execute(text("SELECT COUNT(*) FROM receipt_tax_lines")).scalar()
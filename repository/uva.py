@@ -0,0 +1,162 @@
+"""
+Figures for the Umsatzsteuervoranmeldung (UVA) of a month or quarter.
+Turnover and output VAT per rate are summed in SQL from the tax lines of credit notes
+(receipt_tax_lines); credit notes without a tax_summary get a single rate inferred from
+their totals. Input VAT comes from expense receipts. Results are cached in uva_cache per
+period; triggers on receipts drop the cache rows of a period whenever a receipt dated in it
+is added, changed or deleted.
+"""
+
+import datetime
+
+from sqlalchemy import exists, func, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models.uva import UvaRateLine, UvaResult
+from receipt_parser.dates import period_range
+from receipt_parser.money import to_cents
+from receipt_parser.taxation import build_receipt_tax_summary
+from repository.archive import archived_years_between, attached_archives, in_schema
+from repository.receipt_repository import (
+    DataVersionDB,
+    ReceiptDB,
+    ReceiptTaxLineDB,
+    SessionLocal,
+    UvaCacheDB,
+)
+from repository.triggers import get_data_versions
+
+# Kennzahlen of the U30 form for the taxable turnover per rate
+OUTPUT_VAT_KENNZAHLEN = {20: "022", 10: "029", 13: "006"}
+TURNOVER_KENNZAHL = "000"
+INPUT_VAT_KENNZAHL = "060"
+
+
+def _inferred_breakdown(receipt) -> dict[int, tuple[int, int]] | None:
+    """Net and tax cents of a credit note without tax lines, if a single rate fits its totals."""
+    summary = build_receipt_tax_summary(
+        {
+            "total_gross_amount": receipt.total_gross_amount,
+            "total_net_amount": receipt.total_net_amount,
+            "vat_amount": receipt.vat_amount,
+        }
+    )["tax_summary"]
+    if not summary:
+        return None
+    return {
+        int(rate): (to_cents(entry.get("net_sum") or 0.0), to_cents(entry.get("tax_sum") or 0.0))
+        for rate, entry in summary.items()
+    }
+
+
+def _in_period(session, query, start: datetime.date, end: datetime.date) -> list:
+    """Rows of a query from receipts.db and the archives of the archived years in [start, end)."""
+    years = archived_years_between(start, end - datetime.timedelta(days=1))
+    with attached_archives(session.connection(), years) as schemas:
+        archived = [row for schema in schemas for row in session.execute(in_schema(query, schema)).all()]
+    return archived + session.execute(query).all()
+
+
+def _receipts_in_period(session, start: datetime.date, end: datetime.date):
+    """Receipts dated in [start, end) and whether they have tax lines."""
+    query = select(
+        ReceiptDB.id,
+        ReceiptDB.is_credit,
+        ReceiptDB.total_gross_amount,
+        ReceiptDB.total_net_amount,
+        ReceiptDB.vat_amount,
+        exists().where(ReceiptTaxLineDB.receipt_pk == ReceiptDB.pk).label("has_tax_lines"),
+    ).where(ReceiptDB.receipt_date >= start, ReceiptDB.receipt_date < end)
+    return _in_period(session, query, start, end)
+
+
+def _credit_tax_lines_by_rate(session, start: datetime.date, end: datetime.date) -> list:
+    """(rate, net cents, tax cents) of the tax lines of credit notes dated in [start, end)."""
+    query = (
+        select(ReceiptTaxLineDB.rate, func.sum(ReceiptTaxLineDB.net_cents), func.sum(ReceiptTaxLineDB.tax_cents))
+        .join(ReceiptDB, ReceiptDB.pk == ReceiptTaxLineDB.receipt_pk)
+        .where(
+            ReceiptTaxLineDB.receipt_date >= start,
+            ReceiptTaxLineDB.receipt_date < end,
+            ReceiptDB.is_credit == True,  # noqa: E712
+        )
+        .group_by(ReceiptTaxLineDB.rate)
+    )
+    return _in_period(session, query, start, end)
+
+
+def compute_uva(period: str) -> UvaResult:
+    """Compute the UVA figures of a period key like '2025-03' or '2025-Q1' from the receipts."""
+    start, end = period_range(period)
+    per_rate: dict[int, list[int]] = {}
+    input_vat = 0
+    credit_ids, expense_ids, unresolved_ids = [], [], []
+    with SessionLocal() as session:
+        for receipt in _receipts_in_period(session, start, end):
+            if not receipt.is_credit:
+                expense_ids.append(receipt.id)
+                input_vat += to_cents(receipt.vat_amount or 0.0)
+                continue
+            credit_ids.append(receipt.id)
+            if receipt.has_tax_lines:
+                continue
+            breakdown = _inferred_breakdown(receipt)
+            if breakdown is None:
+                unresolved_ids.append(receipt.id)
+                continue
+            for rate, (net, tax) in breakdown.items():
+                totals = per_rate.setdefault(rate, [0, 0])
+                totals[0] += net
+                totals[1] += tax
+        for rate, net, tax in _credit_tax_lines_by_rate(session, start, end):
+            totals = per_rate.setdefault(rate, [0, 0])
+            totals[0] += net
+            totals[1] += tax
+
+    rates = [
+        UvaRateLine(rate=rate, kennzahl=OUTPUT_VAT_KENNZAHLEN.get(rate), net_cents=net, tax_cents=tax)
+        for rate, (net, tax) in sorted(per_rate.items(), reverse=True)
+    ]
+    return UvaResult(
+        period=period,
+        turnover_cents=sum(line.net_cents for line in rates),
+        rates=rates,
+        input_vat_cents=input_vat,
+        credit_ids=credit_ids,
+        expense_ids=expense_ids,
+        unresolved_ids=unresolved_ids,
+        computed_on=datetime.datetime.now(),
+    )
+
+
+def get_uva(period: str) -> UvaResult:
+    """UVA figures of a period, from the cache if no receipt of the period changed since."""
+    with SessionLocal() as session:
+        cached = session.get(UvaCacheDB, period)
+        if cached is not None:
+            return UvaResult.model_validate(cached.result)
+
+    version = get_data_versions().get("receipts", 0)
+    result = compute_uva(period)
+    # One statement, so checking the version and writing are atomic: a result computed while
+    # receipts changed is returned but not cached, as the triggers may already have run
+    values = select(
+        literal(period), literal(result.model_dump(mode="json"), UvaCacheDB.result.type)
+    ).where(DataVersionDB.table_name == "receipts", DataVersionDB.version == version)
+    insert = sqlite_insert(UvaCacheDB).from_select(["period", "result"], values)
+    with SessionLocal() as session:
+        session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[UvaCacheDB.period],
+                set_={"result": insert.excluded.result, "computed_on": func.now()},
+            )
+        )
+        session.commit()
+    return result
+
+
+def undated_receipt_ids() -> list[str]:
+    """Receipts whose date cannot be parsed and therefore appear in no period."""
+    with SessionLocal() as session:
+        rows = session.query(ReceiptDB.id).filter(ReceiptDB.receipt_date.is_(None)).all()
+    return [receipt_id for (receipt_id,) in rows]
@@ -0,0 +1,71 @@
+"""Move the receipts of a closed year into a read-only archive file.
+
+The receipts dated in YEAR and their products are copied to archive/receipts_YEAR.db,
+verified against receipts.db and then deleted from it. Archived years stay readable:
+the pages and exports attach them when asked for their dates. The current and the
+previous year cannot be archived. Receipts without a readable date are not archived.
+
+The freed pages of receipts.db are reused for new receipts; the file itself only
+shrinks with a VACUUM.
+
+Usage:
+    python scripts/archive_year.py --list
+    python scripts/archive_year.py YEAR [--apply]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from repository.archive import archive_path, archive_year, archived_years, check_archivable, count_archivable
+from repository.receipt_repository import ReceiptRepository
+
+logger = logging.getLogger("archive_year")
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+
+def list_archives():
+    years = archived_years()
+    if not years:
+        logger.info("No archived years.")
+    for year in years:
+        logger.info(f"  {year}: {archive_path(year)}")
+
+
+def archive(year: int, apply: bool = False):
+    try:
+        check_archivable(year)
+    except (ValueError, FileExistsError) as e:
+        logger.error(f"❌ {e}")
+        return
+    receipts, products = count_archivable(year)
+    if not apply:
+        logger.info(f"Would archive {receipts} receipts and {products} products of {year} to {archive_path(year)}.")
+        return
+    result = archive_year(year)
+    logger.info(f"✅ Archived {result.receipt_count} receipts and {result.product_count} products to {result.path}.")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Archive the receipts of a closed year")
+    p.add_argument("year", type=int, nargs="?", help="Year to archive")
+    p.add_argument("--apply", action="store_true", help="Move the receipts (default: dry-run)")
+    p.add_argument("--list", action="store_true", help="List the archived years")
+    args = p.parse_args()
+    if args.year is None and not args.list:
+        p.error("YEAR or --list is required")
+    return args
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    # Creates the archives table if it is missing
+    ReceiptRepository()
+    if args.list:
+        list_archives()
+    else:
+        archive(args.year, apply=bool(args.apply))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Run the consistency audit over the receipts and print the most suspicious ones.
+
+Usage:
+    python scripts/audit_receipts.py [--full] [--top 20]
+
+    Without --full: only receipts changed since they were last checked
+    With --full: check every receipt again
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from repository.audit import get_audit_report, run_audit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check receipts for inconsistent totals")
+    parser.add_argument("--full", action="store_true", help="Check all receipts, not only changed ones")
+    parser.add_argument("--top", type=int, default=20, help="Number of receipts to print")
+    args = parser.parse_args()
+
+    run = run_audit(full=args.full)
+    print(f"🔍 Checked {run.checked} receipt(s) in {run.seconds:.2f}s, {run.findings} new finding(s)")
+
+    report = get_audit_report(limit=args.top)
+    if report.empty:
+        print("✅ No suspicious receipts")
+        return
+    print()
+    for i, row in enumerate(report.itertuples(), 1):
+        print(f"{i}. [{row.score:.1f}] {row.date} {row.company_name} {row.total_gross_amount} €")
+        print(f"   ID: {row.receipt_id}")
+        print(f"   {row.details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Link existing receipts to companies and give them the canonical company name.
+
+Spellings are resolved most frequent first, so the most used spelling of a company
+becomes its canonical name. Only spellings that differ in case, punctuation or legal form
+join a company on their own; the dry-run lists every spelling that would be renamed.
+Similar companies are never merged automatically: --review lists the candidates, --merge
+merges two of them by name, and --split moves a wrongly merged spelling (with the
+receipts still carrying it, or the given receipt ids) back to a company of its own.
+Run after `scripts/migrate.py` to ensure the column exists.
+
+Usage:
+    python scripts/backfill_companies.py [--apply]
+    python scripts/backfill_companies.py --review
+    python scripts/backfill_companies.py --merge "Metro Cash & Carry" "Metro" [--apply]
+    python scripts/backfill_companies.py --split "Kemmts Eina Wien" [--receipts ID ...] [--apply]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import func, select, update
+
+from repository.companies import merge_companies, resolve_company, similar_companies, split_company_alias
+from repository.receipt_repository import (
+    CompanyAliasDB,
+    CompanyDB,
+    ReceiptDB,
+    ReceiptRepository,
+    SessionLocal,
+)
+
+logger = logging.getLogger("backfill_companies")
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+
+def backfill(apply: bool = False):
+    """Resolve the company of every receipt without one. If `apply` is False nothing is written."""
+    linked = 0
+    with SessionLocal() as session:
+        spellings = session.execute(
+            select(ReceiptDB.company_name, func.count())
+            .where(ReceiptDB.company_id.is_(None), ReceiptDB.company_name.is_not(None))
+            .group_by(ReceiptDB.company_name)
+            .order_by(func.count().desc(), ReceiptDB.company_name)
+        ).all()
+        for spelling, count in spellings:
+            company = resolve_company(session.connection(), spelling)
+            if company is None:
+                continue
+            company_id, name = company
+            session.execute(
+                update(ReceiptDB)
+                .where(ReceiptDB.company_name == spelling, ReceiptDB.company_id.is_(None))
+                .values(company_id=company_id, company_name=name)
+            )
+            linked += count
+            if name != spelling:
+                logger.info(f"  {spelling!r} -> {name!r} ({count} receipts)")
+        companies = session.execute(select(func.count()).select_from(CompanyDB)).scalar()
+        if apply:
+            session.commit()
+        else:
+            session.rollback()
+
+    action = "Linked" if apply else "Would link"
+    logger.info(f"{action} {linked} receipts to {companies} companies.")
+
+
+def merge(source: str, target: str, apply: bool = False):
+    """Merge the company named `source` into the one named `target`."""
+    with SessionLocal() as session:
+        ids = dict(session.execute(select(CompanyDB.name, CompanyDB.id).where(CompanyDB.name.in_([source, target]))).all())
+        missing = [name for name in (source, target) if name not in ids]
+        if missing:
+            logger.error(f"No company named {', '.join(map(repr, missing))}")
+            return
+        moved = merge_companies(session, ids[source], ids[target])
+        if apply:
+            session.commit()
+        else:
+            session.rollback()
+    action = "Moved" if apply else "Would move"
+    logger.info(f"{action} {moved} receipts from {source!r} to {target!r}.")
+
+
+def review():
+    """List pairs of companies with similar spellings, the candidates for --merge."""
+    with SessionLocal() as session:
+        names = dict(session.execute(select(CompanyDB.id, CompanyDB.name)).all())
+        counts = dict(
+            session.execute(
+                select(ReceiptDB.company_id, func.count()).where(ReceiptDB.company_id.is_not(None)).group_by(ReceiptDB.company_id)
+            ).all()
+        )
+        pairs = {}
+        for company_id, spelling in session.execute(select(CompanyAliasDB.company_id, CompanyAliasDB.name)):
+            for other_id, similarity in similar_companies(session.connection(), spelling):
+                if other_id != company_id:
+                    pair = tuple(sorted((company_id, other_id)))
+                    pairs[pair] = max(similarity, pairs.get(pair, 0.0))
+    if not pairs:
+        logger.info("No similar companies.")
+        return
+    for (first, second), similarity in sorted(pairs.items(), key=lambda item: -item[1]):
+        # Suggest merging the less used company into the more used one
+        source, target = sorted((first, second), key=lambda company_id: counts.get(company_id, 0))
+        logger.info(
+            f"  {similarity:.2f}  {names[source]!r} ({counts.get(source, 0)} receipts) -> "
+            f"{names[target]!r} ({counts.get(target, 0)} receipts)"
+        )
+    logger.info(f"{len(pairs)} candidate(s); merge with --merge SOURCE TARGET after checking them.")
+
+
+def split(spelling: str, receipt_ids: list[str], apply: bool = False):
+    """Give a spelling that was merged into the wrong company a company of its own."""
+    with SessionLocal() as session:
+        try:
+            _, moved = split_company_alias(session, spelling, receipt_ids)
+        except ValueError as e:
+            logger.error(str(e))
+            return
+        if apply:
+            session.commit()
+        else:
+            session.rollback()
+    action = "Moved" if apply else "Would move"
+    logger.info(f"{action} {spelling!r} and {moved} receipts to a company of its own.")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Backfill receipts.company_id and canonical company names")
+    p.add_argument("--apply", action="store_true", help="Write the changes (default: dry-run)")
+    p.add_argument("--merge", nargs=2, metavar=("SOURCE", "TARGET"), help="Merge company SOURCE into TARGET")
+    p.add_argument("--review", action="store_true", help="List similar companies that may need a merge")
+    p.add_argument("--split", metavar="SPELLING", help="Move SPELLING from its company to a company of its own")
+    p.add_argument("--receipts", nargs="+", default=[], metavar="ID", help="Receipts to move along with --split")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    # Creates the company tables if they are missing
+    ReceiptRepository()
+    if args.review:
+        review()
+    elif args.merge:
+        merge(*args.merge, apply=bool(args.apply))
+    elif args.split:
+        split(args.split, args.receipts, apply=bool(args.apply))
+    else:
+        backfill(apply=bool(args.apply))
@@ -0,0 +1,81 @@
+"""Fill `receipt_date` from the free-text `date` of existing receipts.
+
+Works through the receipts in chunks ordered by id, committing after each chunk, so a
+large database is not locked for the whole run and an interrupted run can be resumed.
+Dates that cannot be parsed are left empty and listed; they show up in the audit
+(rule unparseable_date) until they are corrected on the receipt.
+Run after `scripts/migrate.py` to ensure the column exists.
+
+Usage:
+    python scripts/backfill_receipt_dates.py [--apply] [--chunk-size N]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import text
+
+from receipt_parser.dates import parse_receipt_date
+from repository.receipt_repository import SessionLocal
+
+logger = logging.getLogger("backfill_receipt_dates")
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+
+def backfill(apply: bool = False, chunk_size: int = 1000):
+    """Parse the dates of receipts without receipt_date.
+
+    If `apply` is False the script only counts what would be filled.
+    """
+    filled = 0
+    unparseable: list[tuple[str, str]] = []
+    last_id = ""
+    update = text("UPDATE receipts SET receipt_date = :receipt_date WHERE id = :id")
+
+    with SessionLocal() as session:
+        while True:
+            rows = session.execute(
+                text(
+                    "SELECT id, date FROM receipts WHERE id > :last_id AND receipt_date IS NULL "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": chunk_size},
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            updates = []
+            for receipt_id, date in rows:
+                day = parse_receipt_date(date)
+                if day is None:
+                    unparseable.append((receipt_id, date))
+                else:
+                    updates.append({"id": receipt_id, "receipt_date": day.isoformat()})
+            if apply and updates:
+                session.execute(update, updates)
+                session.commit()
+            filled += len(updates)
+            logger.info(f"... {filled} dates parsed so far")
+
+    action = "Filled" if apply else "Would fill"
+    logger.info(f"{action} {filled} receipt dates; {len(unparseable)} dates could not be parsed.")
+    for receipt_id, date in unparseable[:50]:
+        logger.info(f"  {receipt_id}: {date!r}")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Backfill receipts.receipt_date")
+    p.add_argument("--apply", action="store_true", help="Write the parsed dates (default: dry-run)")
+    p.add_argument("--chunk-size", type=int, default=1000, help="Receipts per transaction")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    backfill(apply=bool(args.apply), chunk_size=args.chunk_size)
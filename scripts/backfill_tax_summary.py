@@ -1,6 +1,6 @@
 """Backfill existing receipts with a best-effort `tax_summary`.
 
-Run after running `scripts/update_schema.py` to ensure columns exist.
+Run after `scripts/migrate.py` to ensure columns exist.
 
 Usage:
     python scripts/backfill_tax_summary.py
@@ -9,8 +9,11 @@ import argparse
 import logging
 import os
 import shutil
+
+import numpy as np
+
 from repository.receipt_repository import SessionLocal, ReceiptDB
-from receipt_parser.taxation import build_receipt_tax_summary
+from receipt_parser.taxation import build_tax_summaries
 
 
 logger = logging.getLogger("backfill")
@@ -36,7 +39,13 @@ def backfill(db_path: str = None, apply: bool = False, backup_path: str | None =
 
     with SessionLocal() as session:
         receipts = session.query(ReceiptDB).all()
-        for r in receipts:
+        # Compute summaries from totals for all receipts at once (None becomes NaN)
+        computed = build_tax_summaries(
+            np.array([r.total_gross_amount for r in receipts], dtype=np.float64),
+            np.array([r.total_net_amount for r in receipts], dtype=np.float64),
+            np.array([r.vat_amount for r in receipts], dtype=np.float64),
+        )
+        for row, r in enumerate(receipts):
             try:
                 existing = r.tax_summary if isinstance(r.tax_summary, dict) else {}
 
@@ -44,13 +53,8 @@ def backfill(db_path: str = None, apply: bool = False, backup_path: str | None =
                     # Preserve manually-entered summaries; just fix has_mixed_taxes
                     tax_summary = existing
                 else:
-                    # No summary yet — try to compute one from totals
-                    rs = build_receipt_tax_summary({
-                        "total_gross_amount": r.total_gross_amount,
-                        "total_net_amount": r.total_net_amount,
-                        "vat_amount": r.vat_amount,
-                    })
-                    tax_summary = rs["tax_summary"]
+                    # No summary yet — use the one computed from totals
+                    tax_summary = computed.tax_summary(row)
 
                 if apply:
                     r.tax_summary = tax_summary
@@ -0,0 +1,76 @@
+"""Backfill `transcription` for receipts extracted before transcriptions were stored.
+
+Each receipt costs one small LLM query (responses are cached in cache.json).
+Run after `scripts/migrate.py` to ensure the column and index exist.
+
+Usage:
+    python scripts/backfill_transcriptions.py [--apply] [--limit N]
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import dotenv
+
+dotenv.load_dotenv()
+
+from receipt_parser.llm import transcribe_receipt
+from repository.receipt_repository import ReceiptDB, SessionLocal
+
+
+logger = logging.getLogger("backfill_transcriptions")
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+
+def backfill(apply: bool = False, limit: int | None = None):
+    """Transcribe receipts without a transcription.
+
+    If `apply` is False the script only lists the receipts that would be transcribed.
+    """
+    transcribed = 0
+    failed_ids: list[str] = []
+
+    with SessionLocal() as session:
+        query = session.query(ReceiptDB).filter(ReceiptDB.transcription.is_(None))
+        if limit:
+            query = query.limit(limit)
+        receipts = query.all()
+        logger.info(f"{len(receipts)} receipts without transcription.")
+        if not apply:
+            return
+
+        for r in receipts:
+            file_paths = [p for p in (r.file_paths or []) if os.path.exists(p)]
+            try:
+                transcription = transcribe_receipt(file_paths) if file_paths else None
+            except Exception as exc:
+                logger.error(f"Error transcribing receipt id={r.id}: {exc}")
+                transcription = None
+            if not transcription:
+                failed_ids.append(r.id)
+                continue
+            r.transcription = transcription
+            session.commit()
+            transcribed += 1
+
+    logger.info(f"Transcribed {transcribed} receipts; {len(failed_ids)} failed or without files.")
+    if failed_ids:
+        logger.info(f"Sample failed receipt ids: {failed_ids[:20]}")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Backfill receipts.transcription")
+    p.add_argument("--apply", action="store_true", help="Query the LLM and write transcriptions (default: dry-run)")
+    p.add_argument("--limit", type=int, help="Only process this many receipts")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    backfill(apply=bool(args.apply), limit=args.limit)
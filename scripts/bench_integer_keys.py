@@ -0,0 +1,141 @@
+"""Time the main join queries before and after the integer key migration (migration 8).
+
+Works on a copy of a database that is still on string keys, e.g. a backup taken before
+running scripts/migrate.py: the queries are timed on the copy, the copy is migrated and
+the same queries, joined over the integer keys, are timed again. The real database is
+never written.
+
+Usage:
+    python scripts/bench_integer_keys.py [--db receipts.db] [--rounds 20]
+"""
+import argparse
+import logging
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from repository.migrations import connect, get_schema_version, run_migrations
+
+INTEGER_KEYS_VERSION = 8
+
+# name -> (string keys, integer keys); both return the same rows
+QUERIES = {
+    "products with receipt and class": (
+        """
+        SELECT p.id, r.id, p.name, p.amount, p.price, s.name, r.company_name, r.is_credit, r.date
+        FROM products p
+        JOIN receipts r ON p.receipt_id = r.id
+        LEFT JOIN sortiment s ON p.product_class_reference = s.id
+        """,
+        """
+        SELECT p.id, r.id, p.name, p.amount, p.price, s.name, r.company_name, r.is_credit, r.date
+        FROM products p
+        JOIN receipts r ON p.receipt_pk = r.pk
+        LEFT JOIN sortiment s ON p.product_class_pk = s.pk
+        """,
+    ),
+    "receipts without products": (
+        "SELECT r.id FROM receipts r WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.receipt_id = r.id)",
+        "SELECT r.id FROM receipts r WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.receipt_pk = r.pk)",
+    ),
+    "product counts of the receipt list": (
+        """
+        SELECT r.id, COUNT(p.id) FROM receipts r JOIN products p ON p.receipt_id = r.id
+        WHERE r.id IN (SELECT id FROM receipts ORDER BY created_on DESC, id DESC LIMIT 50)
+        GROUP BY r.id
+        """,
+        """
+        SELECT r.id, COUNT(p.pk) FROM receipts r JOIN products p ON p.receipt_pk = r.pk
+        WHERE r.id IN (SELECT id FROM receipts ORDER BY created_on DESC, id DESC LIMIT 50)
+        GROUP BY r.pk
+        """,
+    ),
+    "product totals per receipt (audit)": (
+        """
+        SELECT r.id, t.total_cents FROM receipts r
+        JOIN (
+            SELECT receipt_id, SUM(CAST(ROUND(amount * price * 100) AS INTEGER)) AS total_cents
+            FROM products GROUP BY receipt_id
+        ) t ON t.receipt_id = r.id
+        """,
+        """
+        SELECT r.id, t.total_cents FROM receipts r
+        JOIN (
+            SELECT receipt_pk, SUM(CAST(ROUND(amount * price * 100) AS INTEGER)) AS total_cents
+            FROM products GROUP BY receipt_pk
+        ) t ON t.receipt_pk = r.pk
+        """,
+    ),
+}
+
+
+def _time_queries(db_path: Path, variant: int, rounds: int) -> dict[str, tuple[float, list]]:
+    """Median milliseconds and the sorted result of each query."""
+    conn = sqlite3.connect(db_path)
+    try:
+        results = {}
+        for name, queries in QUERIES.items():
+            rows = sorted(conn.execute(queries[variant]).fetchall(), key=repr)  # warm the cache
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                conn.execute(queries[variant]).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = (statistics.median(timings), rows)
+        return results
+    finally:
+        conn.close()
+
+
+def bench(db: Path, rounds: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / "receipts.db"
+        with sqlite3.connect(db) as source, sqlite3.connect(copy) as target:
+            source.backup(target)
+        conn = connect(str(copy))
+        try:
+            if get_schema_version(conn) >= INTEGER_KEYS_VERSION:
+                print(f"❌ {db} already has integer keys; use a backup from before scripts/migrate.py")
+                return
+            # Both sides are timed on freshly packed files
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        size_before = copy.stat().st_size
+
+        before = _time_queries(copy, 0, rounds)
+        start = time.perf_counter()
+        run_migrations(str(copy))
+        migration_seconds = time.perf_counter() - start
+        conn = connect(str(copy))
+        conn.execute("VACUUM")
+        conn.close()
+        after = _time_queries(copy, 1, rounds)
+
+        print(f"Migration took {migration_seconds:.1f} s; {rounds} rounds per query, median ms\n")
+        print(f"{'query':<38} {'string keys':>12} {'integer keys':>13} {'speedup':>8}")
+        for name in QUERIES:
+            (old_ms, old_rows), (new_ms, new_rows) = before[name], after[name]
+            same = "" if old_rows == new_rows else "  ⚠️ results differ"
+            print(f"{name:<38} {old_ms:>12.2f} {new_ms:>13.2f} {old_ms / new_ms:>7.1f}x{same}")
+        print(f"\nFile size: {size_before / 1e6:.1f} MB -> {copy.stat().st_size / 1e6:.1f} MB")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Benchmark the join queries on string vs integer keys")
+    p.add_argument("--db", type=Path, default=Path("receipts.db"), help="Database on string keys (not modified)")
+    p.add_argument("--rounds", type=int, default=20, help="Runs per query")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = _parse_args()
+    bench(args.db, args.rounds)
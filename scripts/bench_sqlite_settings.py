@@ -0,0 +1,171 @@
+"""Measure read/write throughput of the SQLite settings against the library defaults.
+
+Works on copies of the database (the real one is never written), so the numbers reflect
+our data sizes. Two workloads are run for each configuration:
+  writes: small transactions one after another, like saving receipts and products
+  mixed:  several threads loading the receipt list and product counts while one thread writes
+
+Usage:
+    python scripts/bench_sqlite_settings.py [--db receipts.db] [--seconds 10] [--readers 4] [--writes 300]
+"""
+import argparse
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from repository.sqlite_settings import SqliteSettings, apply_sqlite_settings
+
+READ_QUERIES = [
+    "SELECT * FROM receipts ORDER BY created_on DESC",
+    "SELECT receipt_pk, COUNT(*) FROM products GROUP BY receipt_pk",
+]
+
+
+def _make_engine(db_path: Path, tuned: bool):
+    url = f"sqlite:///{db_path}"
+    if not tuned:
+        # What the repository used before: rollback journal and sqlite3's defaults
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        return create_engine(url, connect_args={"check_same_thread": False})
+    settings = SqliteSettings.from_env()
+    engine = create_engine(url, **settings.engine_kwargs())
+    apply_sqlite_settings(engine, settings)
+    return engine
+
+
+def _write_once(engine, receipt_id_holder: list) -> None:
+    """One receipt with three products and an update of an existing receipt, in one transaction."""
+    receipt_id = str(uuid.uuid4())
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO receipts (id, created_on, date, total_gross_amount, total_net_amount, vat_amount, "
+                "company_name, is_credit, is_bio, file_paths) "
+                "VALUES (:id, CURRENT_TIMESTAMP, '2025-01-01', 12.0, 10.0, 2.0, 'Benchmark', 0, 0, '[]')"
+            ),
+            {"id": receipt_id},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO products (id, receipt_pk, name, amount, price) "
+                "SELECT :id, pk, 'x', 1, 4 FROM receipts WHERE id = :receipt_id"
+            ),
+            [{"id": str(uuid.uuid4()), "receipt_id": receipt_id} for _ in range(3)],
+        )
+        if receipt_id_holder:
+            conn.execute(
+                text("UPDATE receipts SET comment = :c WHERE id = :id"),
+                {"c": receipt_id, "id": receipt_id_holder[-1]},
+            )
+    receipt_id_holder.append(receipt_id)
+
+
+def bench_writes(engine, count: int) -> dict:
+    ids: list[str] = []
+    start = time.perf_counter()
+    for _ in range(count):
+        _write_once(engine, ids)
+    seconds = time.perf_counter() - start
+    return {"writes/s": count / seconds}
+
+
+def bench_mixed(engine, seconds: float, readers: int) -> dict:
+    stop = time.perf_counter() + seconds
+    latencies: list[float] = []
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def reader():
+        i = 0
+        while time.perf_counter() < stop:
+            query = READ_QUERIES[i % len(READ_QUERIES)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(query)).fetchall()
+            except OperationalError:
+                with lock:
+                    counts["locked"] += 1
+                continue
+            with lock:
+                counts["reads"] += 1
+                latencies.append(time.perf_counter() - start)
+
+    def writer():
+        ids: list[str] = []
+        while time.perf_counter() < stop:
+            try:
+                _write_once(engine, ids)
+            except OperationalError:
+                with lock:
+                    counts["locked"] += 1
+                continue
+            with lock:
+                counts["writes"] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) >= 20 else float("nan")
+    return {
+        "reads/s": counts["reads"] / seconds,
+        "read p95 ms": p95,
+        "writes/s": counts["writes"] / seconds,
+        "locked errors": counts["locked"],
+    }
+
+
+def run(db: Path, seconds: float, readers: int, writes: int) -> None:
+    with sqlite3.connect(db) as conn:
+        receipts = conn.execute("SELECT COUNT(*) FROM receipts").fetchone()[0]
+        products = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+    print(f"Database: {db} ({db.stat().st_size / 1e6:.1f} MB, {receipts} receipts, {products} products)")
+    print(f"Tuned settings: {SqliteSettings.from_env()}")
+    print()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, tuned in (("defaults", False), ("tuned", True)):
+            copy = Path(tmp) / f"{name}.db"
+            shutil.copy(db, copy)
+            engine = _make_engine(copy, tuned)
+            results[name] = {**bench_writes(engine, writes), **{f"mixed {k}": v for k, v in bench_mixed(engine, seconds, readers).items()}}
+            engine.dispose()
+
+    metrics = list(results["defaults"])
+    print(f"{'metric':<24}{'defaults':>12}{'tuned':>12}{'change':>10}")
+    for metric in metrics:
+        before, after = results["defaults"][metric], results["tuned"][metric]
+        change = f"{after / before:.1f}x" if before else "-"
+        print(f"{metric:<24}{before:>12.1f}{after:>12.1f}{change:>10}")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Compare SQLite settings on a copy of the database")
+    p.add_argument("--db", type=Path, default=project_root / "receipts.db")
+    p.add_argument("--seconds", type=float, default=10, help="Duration of the mixed workload")
+    p.add_argument("--readers", type=int, default=4, help="Concurrent reader threads in the mixed workload")
+    p.add_argument("--writes", type=int, default=300, help="Transactions in the write workload")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(args.db, args.seconds, args.readers, args.writes)
@@ -0,0 +1,113 @@
+"""Check and time the vectorized tax-summary functions against the scalar ones.
+
+Generates random receipts (exact single-rate totals, totals off by about the
+tolerance, decimal ties like x.xx5, missing values, noise), asserts that
+`build_tax_summaries` returns exactly what `build_receipt_tax_summary` returns
+row by row, and prints both timings.
+
+Usage:
+    python scripts/bench_tax_batch.py [--rows 100000] [--rounds 5] [--seed 0]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from receipt_parser.taxation import DEFAULT_RATES, build_receipt_tax_summary, build_tax_summaries
+
+
+def _random_amount(rng: random.Random) -> float:
+    kind = rng.random()
+    if kind < 0.4:
+        return rng.randint(-100_000, 10_000_000) / 100
+    if kind < 0.7:
+        # Three decimals, many of them ties like 12.345
+        return rng.randint(-100_000, 10_000_000) / 1000
+    return rng.uniform(-1_000, 100_000)
+
+
+def _random_receipt(rng: random.Random) -> dict:
+    rate = rng.choice(DEFAULT_RATES) / 100
+    kind = rng.random()
+    if kind < 0.5:
+        # Consistent single-rate receipt
+        net = rng.randint(1, 1_000_000) / 100
+        vat = round(net * rate, 2)
+        gross = round(net + vat, 2)
+    elif kind < 0.6:
+        # Off by about the tolerance, where rounding decides whether a rate fits
+        net = rng.randint(1, 1_000_000) / 100
+        vat = round(net * rate + rng.choice((-1, 1)) * rng.randint(40, 60) / 1000, 3)
+        gross = round(net * (1 + rate) + rng.choice((-1, 1)) * rng.randint(40, 60) / 1000, 3)
+    elif kind < 0.7:
+        # Built from gross, as extracted from a register receipt
+        gross = rng.randint(1, 1_000_000) / 100
+        net = round(gross / (1 + rate), 3)
+        vat = round(gross - net, 3)
+    else:
+        gross, net, vat = (_random_amount(rng) for _ in range(3))
+    # Drop values like a partial extraction does
+    values = [gross, net, vat]
+    for i in range(3):
+        if rng.random() < 0.15:
+            values[i] = None
+    return dict(zip(("total_gross_amount", "total_net_amount", "vat_amount"), values))
+
+
+def _column(receipts: list[dict], key: str) -> np.ndarray:
+    return np.array([np.nan if r[key] is None else r[key] for r in receipts], dtype=np.float64)
+
+
+def run(rows: int, rounds: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for round_no in range(rounds):
+        receipts = [_random_receipt(rng) for _ in range(rows)]
+        gross = _column(receipts, "total_gross_amount")
+        net = _column(receipts, "total_net_amount")
+        vat = _column(receipts, "vat_amount")
+
+        start = time.perf_counter()
+        expected = [build_receipt_tax_summary(r) for r in receipts]
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = build_tax_summaries(gross, net, vat)
+        batch_time = time.perf_counter() - start
+        actual = batch.summaries()
+        materialize_time = time.perf_counter() - start
+
+        mismatches = [
+            (receipts[i], expected[i], actual[i])
+            for i in range(rows)
+            if expected[i] != actual[i]
+        ]
+        if mismatches:
+            for receipt, exp, act in mismatches[:10]:
+                print(f"MISMATCH {receipt}: scalar={exp} batch={act}")
+            sys.exit(1)
+
+        print(
+            f"round {round_no}: {rows} rows identical | scalar {scalar_time:.3f}s | "
+            f"batch {batch_time:.4f}s ({scalar_time / batch_time:.0f}x) | "
+            f"batch incl. dicts {materialize_time:.3f}s ({scalar_time / materialize_time:.0f}x)"
+        )
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Compare scalar and vectorized tax summaries")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(args.rows, args.rounds, args.seed)
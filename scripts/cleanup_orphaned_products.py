@@ -1,13 +1,13 @@
 #!/usr/bin/env python
 """
 Script to identify and remove orphaned products (products without corresponding receipts).
-Also adds database constraint to prevent this in the future.
+The ON DELETE CASCADE constraint that prevents them is added by scripts/migrate.py.
 
 Usage:
     python scripts/cleanup_orphaned_products.py [--fix]
     
     Without --fix: Only shows orphaned products (dry-run)
-    With --fix: Removes orphaned products and adds constraint
+    With --fix: Removes orphaned products
 """
 
 import sys
@@ -24,10 +24,10 @@ from repository.receipt_repository import SessionLocal, ProductDB, ReceiptDB
 def find_orphaned_products():
     """Find all products that don't have a corresponding receipt."""
     with SessionLocal() as session:
-        # Find products where receipt_id doesn't exist in receipts table
+        # Find products where receipt_pk doesn't exist in receipts table
         orphaned = session.query(ProductDB).filter(
-            ~ProductDB.receipt_id.in_(
-                session.query(ReceiptDB.id)
+            ~ProductDB.receipt_pk.in_(
+                session.query(ReceiptDB.pk)
             )
         ).all()
         return orphaned
@@ -56,87 +56,6 @@ def remove_orphaned_products():
     return count
 
 
-def add_cascade_delete_constraint(db_path="receipts.db"):
-    """
-    Add ON DELETE CASCADE constraint to prevent orphaned products.
-    Note: SQLite doesn't support modifying foreign keys directly,
-    so we need to recreate the table with the proper constraint.
-    """
-    import sqlite3
-    
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    
-    try:
-        # First disable and enable foreign keys to ensure clean slate
-        cur.execute("PRAGMA foreign_keys=OFF;")
-        
-        # Check if the constraint already has CASCADE by querying the table info
-        cur.execute("PRAGMA foreign_key_list(products);")
-        fk_info = cur.fetchall()
-        
-        has_cascade = any(row[5] == 'CASCADE' for row in fk_info if row[3] == 'receipts')
-        
-        if has_cascade:
-            print("✅ ON DELETE CASCADE constraint already exists")
-            cur.execute("PRAGMA foreign_keys=ON;")
-            return True
-        
-        # Rename the old products table
-        cur.execute("ALTER TABLE products RENAME TO products_old;")
-        
-        # Create new products table with ON DELETE CASCADE
-        cur.execute("""
-            CREATE TABLE products (
-                id TEXT PRIMARY KEY,
-                receipt_id TEXT NOT NULL,
-                name TEXT,
-                is_bio BOOLEAN,
-                bio_category TEXT,
-                amount FLOAT,
-                price FLOAT,
-                unit TEXT,
-                product_class_reference TEXT,
-                created_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (receipt_id) REFERENCES receipts(id) ON DELETE CASCADE,
-                FOREIGN KEY (product_class_reference) REFERENCES sortiment(id) ON DELETE SET NULL
-            );
-        """)
-        
-        # Copy data from old table to new table
-        cur.execute("""
-            INSERT INTO products 
-            SELECT * FROM products_old;
-        """)
-        
-        # Drop the old table
-        cur.execute("DROP TABLE products_old;")
-        
-        # Recreate indexes
-        cur.execute("""
-            CREATE INDEX IF NOT EXISTS ix_products_receipt_id 
-            ON products(receipt_id);
-        """)
-        cur.execute("""
-            CREATE INDEX IF NOT EXISTS ix_products_product_class_reference 
-            ON products(product_class_reference);
-        """)
-        
-        conn.commit()
-        cur.execute("PRAGMA foreign_keys=ON;")
-        print("✅ Added ON DELETE CASCADE constraint to products table")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error adding constraint: {e}")
-        conn.rollback()
-        cur.execute("PRAGMA foreign_keys=ON;")
-        return False
-    finally:
-        conn.close()
-
-
 def main():
     """Main function."""
     if len(sys.argv) > 1 and sys.argv[1] == "--fix":
@@ -152,7 +71,7 @@ def main():
             print(f"⚠️  Found {count} orphaned product(s)")
             orphaned = find_orphaned_products()
             for p in orphaned:
-                print(f"   - Product: {p.name} (ID: {p.id}, Receipt ID: {p.receipt_id})")
+                print(f"   - Product: {p.name} (ID: {p.id}, Receipt pk: {p.receipt_pk})")
             print()
             
             # Remove them
@@ -160,11 +79,7 @@ def main():
             print(f"✅ Removed {removed} orphaned product(s)")
         
         print()
-        print("🔐 Adding CASCADE DELETE constraint to prevent future orphans...")
-        if add_cascade_delete_constraint():
-            print("✅ Constraint added successfully!")
-        else:
-            print("⚠️  Could not add constraint (it may already exist)")
+        print("🔐 Run scripts/migrate.py to add the CASCADE DELETE constraint that prevents future orphans.")
         
         print()
         print("✨ Cleanup complete!")
@@ -182,10 +97,10 @@ def main():
             for i, p in enumerate(orphaned, 1):
                 print(f"{i}. Product: {p.name}")
                 print(f"   ID: {p.id}")
-                print(f"   Receipt ID: {p.receipt_id} (DOES NOT EXIST)")
+                print(f"   Receipt pk: {p.receipt_pk} (DOES NOT EXIST)")
                 print()
             
-            print("Run with --fix flag to remove these products and add constraint:")
+            print("Run with --fix flag to remove these products:")
             print("  python scripts/cleanup_orphaned_products.py --fix")
 
 
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Remove files in saved_images that no receipt references.
+
+Usage:
+    python scripts/gc_files.py [--apply] [--reconcile] [--grace-hours 24]
+
+    Without --apply: only lists the files that would be deleted (dry-run)
+    With --reconcile: rebuild the file index from the receipts and the directory first
+"""
+
+import argparse
+import datetime
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from repository.file_gc import GRACE_PERIOD, collect, find_garbage, reconcile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete unreferenced receipt files")
+    parser.add_argument("--apply", action="store_true", help="Delete the files (default: dry-run)")
+    parser.add_argument("--reconcile", action="store_true", help="Rebuild the file index first")
+    parser.add_argument(
+        "--grace-hours",
+        type=float,
+        default=GRACE_PERIOD.total_seconds() / 3600,
+        help="Keep unreferenced files younger than this",
+    )
+    args = parser.parse_args()
+    grace_period = datetime.timedelta(hours=args.grace_hours)
+
+    if args.reconcile:
+        print(f"🔄 Reconciled file index: {reconcile()}")
+
+    if args.apply:
+        removed = collect(grace_period)
+        print(f"🗑️  Deleted {len(removed)} file(s)")
+        return
+
+    garbage = find_garbage(grace_period)
+    if not garbage:
+        print("✅ No unreferenced files")
+        return
+    print(f"⚠️  {len(garbage)} unreferenced file(s) would be deleted:")
+    for path in garbage:
+        print(f"   {path}")
+    print()
+    print("Run with --apply to delete them.")
+
+
+if __name__ == "__main__":
+    main()
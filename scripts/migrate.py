@@ -0,0 +1,63 @@
+"""Bring the database schema up to date.
+
+Applies the pending migrations of repository/migrations.py in order and records them in
+schema_migrations, then creates missing tables, indexes and triggers. Table rebuilds copy
+in chunks and can be interrupted; running the script again continues them.
+
+Usage:
+    python scripts/migrate.py --status
+    python scripts/migrate.py [--chunk-size 2000]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from repository import migrations
+from repository.receipt_repository import ReceiptRepository
+
+
+def status():
+    conn = migrations.connect()
+    try:
+        print(f"Schema version: {migrations.get_schema_version(conn)}")
+        pending = migrations.pending_migrations(conn)
+        for migration in pending:
+            print(f"  pending {migration.version}: {migration.name}")
+        for table, last_rowid, copied in conn.execute("SELECT * FROM schema_rebuilds"):
+            print(f"  interrupted rebuild of {table}: {copied} rows copied (up to rowid {last_rowid})")
+        if not pending:
+            print("✅ Up to date")
+    finally:
+        conn.close()
+
+
+def migrate(chunk_size: int):
+    migrations.REBUILD_CHUNK_SIZE = chunk_size
+    run = migrations.run_migrations()
+    # Tables, indexes and triggers of the current models
+    ReceiptRepository()
+    if run.applied:
+        print(f"✅ Applied {len(run.applied)} migration(s), schema version {run.schema_version}")
+    else:
+        print(f"✅ Already up to date, schema version {run.schema_version}")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Apply pending schema migrations")
+    p.add_argument("--status", action="store_true", help="Only show the schema version and pending migrations")
+    p.add_argument("--chunk-size", type=int, default=migrations.REBUILD_CHUNK_SIZE, help="Rows per copy transaction of table rebuilds")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.status:
+        status()
+    else:
+        migrate(args.chunk_size)
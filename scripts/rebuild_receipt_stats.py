@@ -0,0 +1,58 @@
+"""Recompute the receipt_stats table used by the statistics pages from all receipts.
+
+The table is kept up to date by triggers on receipts; run this after changing the
+triggers or when receipts were written with the triggers missing. --check only reports
+whether the stored totals match a fresh computation.
+
+Usage:
+    python scripts/rebuild_receipt_stats.py [--check]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import text
+
+from repository.receipt_repository import ReceiptRepository, SessionLocal
+from repository.triggers import rebuild_receipt_stats
+
+STATS_QUERY = text("SELECT * FROM receipt_stats ORDER BY month, is_credit, company_name, source")
+
+
+def rebuild(check: bool = False):
+    # Creates the table and triggers if they are missing
+    ReceiptRepository()
+    with SessionLocal() as session:
+        stored = session.execute(STATS_QUERY).all()
+        rows = rebuild_receipt_stats(session)
+        fresh = session.execute(STATS_QUERY).all()
+        if check:
+            session.rollback()
+        else:
+            session.commit()
+
+    stored_by_key = {tuple(row[:4]): row for row in stored}
+    fresh_by_key = {tuple(row[:4]): row for row in fresh}
+    differing = sum(
+        stored_by_key.get(key) != fresh_by_key.get(key) for key in stored_by_key.keys() | fresh_by_key.keys()
+    )
+    if check:
+        status = "✅ up to date" if not differing else f"❌ {differing} rows differ, run without --check to fix"
+        print(f"receipt_stats: {len(stored)} rows, {status}")
+    else:
+        print(f"✅ Rebuilt receipt_stats: {rows} rows ({differing} rows changed)")
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Rebuild the receipt_stats aggregate table")
+    p.add_argument("--check", action="store_true", help="Only compare with a fresh computation")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    rebuild(check=bool(args.check))
@@ -1,129 +1,25 @@
-"""DB schema migrations — run this before backfill_tax_summary.py.
+"""Apply the pending schema migrations; kept for the old hand-run entry point.
+
+The hand-run ALTER helpers this script used to hold are the versioned migrations in
+repository/migrations.py now, so this only runs scripts/migrate.py.
 
 Server migration order:
-    1. python scripts/update_schema.py
+    1. python scripts/migrate.py
     2. python scripts/backfill_tax_summary.py --apply --backup receipts.db.bak
+    3. python scripts/backfill_transcriptions.py --apply  (optional, queries the LLM)
+    4. python scripts/backfill_receipt_dates.py --apply
+    5. python scripts/backfill_companies.py --apply  (review the dry-run first)
 
-Both scripts are idempotent and safe to re-run.
+All of them are idempotent and safe to re-run.
 """
-import sqlite3
-
-DB_PATH = "receipts.db"  # Change this if your DB file has a different name
-
-def add_source_column(db_path):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    # Add the new column if it doesn't exist
-    try:
-        cur.execute("ALTER TABLE receipts ADD COLUMN source TEXT;")
-        print("Added 'source' column to 'receipts' table.")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e):
-            print("'source' column already exists.")
-        else:
-            raise
-    # Set default value for existing rows
-    cur.execute("UPDATE receipts SET source = 'RECEIPT_SCANNER' WHERE source IS NULL;")
-    conn.commit()
-    conn.close()
-    print("Set default value for existing rows.")
-
-
-def add_products_table(db_path):
-    # drop products table if it exists
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute("DROP TABLE IF EXISTS products;")
-    conn.commit()
-    conn.close()
-
-
-def create_sortiment_table(db_path):
-    """Create the sortiment table for product classification."""
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS sortiment (
-                id TEXT PRIMARY KEY,
-                name TEXT UNIQUE NOT NULL,
-                created_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-        print("Created 'sortiment' table.")
-    except sqlite3.OperationalError as e:
-        print(f"Error creating sortiment table: {e}")
-    finally:
-        conn.close()
+import sys
+from pathlib import Path
 
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
 
-def create_regex_table(db_path):
-    """Create the regex table for pattern matching."""
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS regex (
-                id TEXT PRIMARY KEY,
-                regex TEXT NOT NULL,
-                product_class_id TEXT NOT NULL,
-                created_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_class_id) REFERENCES sortiment(id)
-            )
-        """)
-        conn.commit()
-        print("Created 'regex' table.")
-    except sqlite3.OperationalError as e:
-        print(f"Error creating regex table: {e}")
-    finally:
-        conn.close()
-
-
-def add_product_class_reference(db_path):
-    """Add product_class_reference column to products table."""
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            "ALTER TABLE products ADD COLUMN product_class_reference TEXT;"
-        )
-        print("Added 'product_class_reference' column to 'products' table.")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e):
-            print("'product_class_reference' column already exists.")
-        else:
-            print(f"Error adding product_class_reference column: {e}")
-    finally:
-        conn.commit()
-        conn.close()
-
-
-def add_tax_columns(db_path):
-    """Add receipt-level taxation column: tax_summary (JSON/text)."""
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    try:
-        cur.execute("ALTER TABLE receipts ADD COLUMN tax_summary TEXT;")
-        print("Added 'tax_summary' column to 'receipts' table.")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e).lower():
-            print("'tax_summary' column already exists.")
-        else:
-            print(f"Error adding tax_summary column: {e}")
-    finally:
-        conn.commit()
-        conn.close()
-
+from scripts.migrate import migrate
 
 if __name__ == "__main__":
-
-    # Uncomment to run migrations
-    # add_source_column(DB_PATH)
-    # add_products_table(DB_PATH)
-    # create_sortiment_table(DB_PATH)
-    # create_regex_table(DB_PATH)
-    # add_product_class_reference(DB_PATH)
-    add_tax_columns(DB_PATH)
\ No newline at end of file
+    migrate(chunk_size=2000)
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# receipts.db, archive/ and saved_images/ are relative to the working directory and the
+# engine fixes its path on import, so switch to a scratch directory before any test
+# module imports the repository
+os.chdir(tempfile.mkdtemp(prefix="receipt_scanner_tests_"))
+# receipt_parser.llm creates its OpenAI client on import; the tests never reach the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
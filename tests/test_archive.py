@@ -0,0 +1,77 @@
+import datetime
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from repository.archive import archive_year, attached_archives, find_archived_receipt, read_frame
+from repository.read_models import receipts_frame
+from repository.receipt_repository import ProductDB, ReceiptDB, ReceiptRepository, SessionLocal
+from repository.statistics import get_receipt_stats
+from repository.uva import get_uva
+
+YEAR = 2017
+COMPANY = "Archivtest"
+
+OF_THE_TEST = ReceiptDB.company_name == COMPANY
+PRODUCTS = select(ProductDB.id, ProductDB.name, ProductDB.price)
+
+
+def _save_year():
+    repository = ReceiptRepository()
+    saved = []
+    for date, gross in (("15.01.2017", 11.0), ("20.06.2017", 22.0), ("31.12.2017", 33.0), ("02.01.2018", 44.0)):
+        saved.append(
+            repository.create_receipt_with_products(
+                ReceiptDB(
+                    date=date,
+                    company_name=COMPANY,
+                    is_credit=True,
+                    total_gross_amount=gross,
+                    total_net_amount=gross / 1.1,
+                    vat_amount=gross - gross / 1.1,
+                    tax_summary={"10": {"net_sum": gross / 1.1, "tax_sum": gross - gross / 1.1, "gross_sum": gross}},
+                ),
+                [ProductDB(name=f"Käse {date}", amount=1, unit="KILO", price=gross)],
+            )
+        )
+    undated = repository.create_receipt(ReceiptDB(date="Sommer 2017", company_name=COMPANY))
+    return saved, undated
+
+
+def test_archived_year_reads_back_the_same_rows():
+    saved, undated = _save_year()
+    receipts = receipts_frame(OF_THE_TEST).sort_values("id", ignore_index=True)
+    products = read_frame(PRODUCTS).sort_values("id", ignore_index=True)
+    stats = get_receipt_stats()
+    stats = stats[stats["company_name"] == COMPANY].sort_values("month", ignore_index=True)
+    uva = get_uva("2017-Q2")
+
+    result = archive_year(YEAR)
+    assert (result.receipt_count, result.product_count) == (3, 3)
+
+    # Receipts of 2018 and undated ones stay in receipts.db
+    hot = receipts_frame(OF_THE_TEST)
+    assert set(hot["id"]) == {saved[3].id, undated.id}
+
+    archived = receipts_frame(OF_THE_TEST, archive_years=(YEAR,)).sort_values("id", ignore_index=True)
+    assert archived.equals(receipts)
+    assert read_frame(PRODUCTS, (YEAR,)).sort_values("id", ignore_index=True).equals(products)
+    archived_stats = get_receipt_stats((YEAR,))
+    archived_stats = archived_stats[archived_stats["company_name"] == COMPANY].sort_values("month", ignore_index=True)
+    assert archived_stats.equals(stats)
+    assert get_uva("2017-Q2").model_dump(exclude={"computed_on"}) == uva.model_dump(exclude={"computed_on"})
+
+    year, receipt, receipt_products = find_archived_receipt(saved[1].id)
+    assert (year, receipt.total_gross_amount, [p.name for p in receipt_products]) == (YEAR, 22.0, ["Käse 20.06.2017"])
+
+    with SessionLocal() as session, attached_archives(session.connection(), [YEAR]) as (schema,):
+        with pytest.raises(OperationalError, match="readonly"):
+            session.execute(text(f"DELETE FROM {schema}.receipts"))
+    with pytest.raises(FileExistsError):
+        archive_year(YEAR)
+
+
+def test_open_years_stay_in_receipts_db():
+    with pytest.raises(ValueError):
+        archive_year(datetime.date.today().year - 1)
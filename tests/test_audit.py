@@ -0,0 +1,85 @@
+from sqlalchemy import text
+
+from repository.audit import get_audit_report, run_audit
+from repository.receipt_repository import ProductDB, ReceiptDB, ReceiptRepository, SessionLocal
+
+
+def _create(gross: float, net: float, vat: float, company: str = "Audit-Test", **fields) -> ReceiptDB:
+    receipt = ReceiptRepository().create_receipt(
+        ReceiptDB(
+            date=fields.pop("date", "05.03.2024"),
+            company_name=company,
+            is_credit=False,
+            total_gross_amount=gross,
+            total_net_amount=net,
+            vat_amount=vat,
+            **fields,
+        )
+    )
+    # Saved long before the audit runs, so only real changes make it check them again
+    with SessionLocal() as session:
+        session.execute(text("UPDATE receipts SET created_on = '2024-03-05 12:00:00' WHERE pk = :pk"), {"pk": receipt.pk})
+        session.commit()
+    return receipt
+
+
+def _rules() -> dict[str, set[str]]:
+    report = get_audit_report()
+    return {row.receipt_id: set(row.rules.split(", ")) for row in report.itertuples()}
+
+
+def test_full_run_reports_each_rule_ranked_by_discrepancy():
+    clean = _create(12.0, 10.0, 2.0)
+    small = _create(12.5, 10.0, 2.0, company="Audit-Test klein")
+    large = _create(120.0, 10.0, 2.0, company="Audit-Test groß")
+    summary = _create(
+        12.0,
+        10.0,
+        2.0,
+        company="Audit-Test Aufschlüsselung",
+        tax_summary={"20": {"net_sum": 10.0, "tax_sum": 1.0, "gross_sum": 12.0}},
+    )
+    undated = _create(12.0, 10.0, 2.0, company="Audit-Test Datum", date="irgendwann")
+    duplicates = [_create(30.0, 25.0, 5.0, company="Audit-Test doppelt") for _ in range(2)]
+
+    run_audit(full=True)
+    rules = _rules()
+    assert clean.id not in rules
+    assert rules[small.id] == rules[large.id] == {"gross_net_vat"}
+    assert rules[summary.id] == {"tax_summary_vat", "tax_summary_entry"}
+    assert rules[undated.id] == {"unparseable_date"}
+    assert all(rules[receipt.id] == {"duplicate"} for receipt in duplicates)
+
+    ranked = get_audit_report()["receipt_id"].tolist()
+    assert ranked.index(large.id) < ranked.index(small.id)
+
+
+def test_incremental_run_checks_only_changed_receipts():
+    fixed = _create(12.5, 10.0, 2.0, company="Audit-Test korrigiert")
+    untouched = _create(12.0, 10.0, 2.0, company="Audit-Test unverändert")
+    with_products = _create(12.0, 10.0, 2.0, company="Audit-Test Produkte")
+    kept = _create(30.0, 25.0, 5.0, company="Audit-Test einmal")
+    dropped = _create(30.0, 25.0, 5.0, company="Audit-Test einmal")
+    run_audit(full=True)
+    assert {fixed.id, kept.id} <= set(_rules())
+
+    with SessionLocal() as session:
+        session.get(ReceiptDB, fixed.pk).total_gross_amount = 12.0
+        session.commit()
+    ReceiptRepository().add_products(with_products.pk, [ProductDB(name="Kraftfutter", amount=2, unit="PIECE", price=25.0)])
+    ReceiptRepository().delete_receipt(dropped.id)
+    # Past the ORM and without updated_on, so only a full run sees it
+    with SessionLocal() as session:
+        session.execute(text("UPDATE receipts SET vat_amount = 9 WHERE pk = :pk"), {"pk": untouched.pk})
+        session.commit()
+
+    run_audit()
+    rules = _rules()
+    assert fixed.id not in rules
+    assert rules[with_products.id] == {"products_total"}
+    # Duplicates are compared over the whole table on every run
+    assert kept.id not in rules
+    assert untouched.id not in rules
+
+    run_audit(full=True)
+    assert _rules()[untouched.id] == {"gross_net_vat"}
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import text
+
+from pages import cached_data
+from repository.receipt_repository import ProductDB, ReceiptDB, ReceiptRepository, SessionLocal, SortimentDB
+from repository.triggers import get_data_versions
+
+
+def _bumped(before: dict[str, int]) -> dict[str, int]:
+    after = get_data_versions()
+    return {table: after[table] - before[table] for table in after if after[table] != before[table]}
+
+
+def test_every_write_bumps_only_its_tables_version():
+    repository = ReceiptRepository()
+    before = get_data_versions()
+    receipt = repository.create_receipt(ReceiptDB(date="01.08.2027", company_name="Versionstest"))
+    # The receipt and its new company
+    assert _bumped(before) == {"receipts": 1, "companies": 1}
+
+    before = get_data_versions()
+    repository.add_products(receipt.pk, [ProductDB(name="Heu"), ProductDB(name="Stroh")])
+    assert _bumped(before) == {"products": 2}
+
+    before = get_data_versions()
+    with SessionLocal() as session:
+        # Raw SQL, as the scripts write
+        session.execute(text("UPDATE products SET price = 4.5 WHERE receipt_pk = :pk"), {"pk": receipt.pk})
+        session.add(SortimentDB(name="Raufutter Versionstest"))
+        session.commit()
+    assert _bumped(before) == {"products": 2, "sortiment": 1}
+
+    before = get_data_versions()
+    repository.delete_receipt(receipt.id)
+    assert _bumped(before) == {"receipts": 1, "products": 2}
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Count the loads of the cached products loader that reach the database"""
+    counted = []
+    products_frame = cached_data.products_frame
+
+    def counting(**kwargs):
+        counted.append(kwargs)
+        return products_frame(**kwargs)
+
+    monkeypatch.setattr(cached_data, "products_frame", counting)
+    cached_data._products.clear()
+    yield counted
+    cached_data._products.clear()
+
+
+def test_loaders_reload_only_after_writes_to_their_tables(loads):
+    repository = ReceiptRepository()
+    receipt = repository.create_receipt(ReceiptDB(date="02.08.2027", company_name="Cachetest"))
+    first = cached_data.load_products()
+    assert len(cached_data.load_products()) == len(first)
+    assert len(loads) == 1
+
+    # Companies are not read by the products dataset
+    with SessionLocal() as session:
+        session.execute(text("UPDATE companies SET name = name"))
+        session.commit()
+    cached_data.load_products()
+    assert len(loads) == 1
+
+    repository.add_products(receipt.pk, [ProductDB(name="Cachetest-Heu")])
+    products = cached_data.load_products()
+    assert len(loads) == 2
+    assert "Cachetest-Heu" in set(products["name"])
@@ -0,0 +1,60 @@
+from sqlalchemy import insert
+
+from repository.companies import company_key, company_trigrams, split_company_alias
+from repository.receipt_repository import (
+    CompanyAliasDB,
+    CompanyDB,
+    ReceiptDB,
+    ReceiptRepository,
+    SessionLocal,
+)
+
+
+def _create(name: str) -> str:
+    return ReceiptRepository().create_receipt(ReceiptDB(date="2025-05-02", company_name=name)).id
+
+
+def _company(receipt_id: str) -> tuple[str, str]:
+    """(company_name of the receipt, name of its linked company)"""
+    with SessionLocal() as session:
+        receipt = session.query(ReceiptDB).filter(ReceiptDB.id == receipt_id).one()
+        return receipt.company_name, session.get(CompanyDB, receipt.company_id).name
+
+
+def test_only_exact_spellings_join_a_company():
+    _create("Marktstand")
+    assert _company(_create("MARKTSTAND GmbH")) == ("Marktstand", "Marktstand")
+    # Similar, but a different company
+    assert _company(_create("Marktstand Bio")) == ("Marktstand Bio", "Marktstand Bio")
+
+
+def test_edited_company_name_is_kept_as_typed():
+    receipt_id = _create("Gemüsekiste")
+    with SessionLocal() as session:
+        session.query(ReceiptDB).filter(ReceiptDB.id == receipt_id).one().company_name = "gemüsekiste gmbh"
+        session.commit()
+    assert _company(receipt_id) == ("gemüsekiste gmbh", "Gemüsekiste")
+
+
+def test_split_moves_a_wrongly_merged_spelling_to_its_own_company():
+    receipt_id = _create("Bauernladen")
+    # A spelling linked to the wrong company, as the earlier similarity matching did
+    with SessionLocal() as session:
+        company_id = session.query(CompanyDB.id).filter(CompanyDB.name == "Bauernladen").scalar()
+        key = company_key("Bauernladen Nord")
+        session.execute(
+            insert(CompanyAliasDB).values(
+                key=key, company_id=company_id, name="Bauernladen Nord", trigram_count=len(company_trigrams(key))
+            )
+        )
+        session.commit()
+    wrong = _create("Bauernladen Nord")
+    assert _company(wrong) == ("Bauernladen", "Bauernladen")
+
+    with SessionLocal() as session:
+        assert split_company_alias(session, "Bauernladen Nord", [wrong])[1] == 1
+        session.commit()
+
+    assert _company(wrong) == ("Bauernladen Nord", "Bauernladen Nord")
+    assert _company(_create("Bauernladen Nord")) == ("Bauernladen Nord", "Bauernladen Nord")
+    assert _company(receipt_id) == ("Bauernladen", "Bauernladen")
@@ -0,0 +1,70 @@
+import datetime
+import os
+
+import pytest
+
+from repository.archive import archive_year
+from repository.file_gc import FILE_DIR, collect, find_garbage, reconcile
+from repository.receipt_repository import ReceiptDB, ReceiptRepository, SessionLocal, StoredFileDB
+
+NO_GRACE = datetime.timedelta(0)
+THIS_YEAR = datetime.date.today().year
+
+
+@pytest.fixture
+def repo():
+    # All tests share the scratch receipts.db of conftest.py, so each archives its own year
+    os.makedirs(FILE_DIR, exist_ok=True)
+    return ReceiptRepository()
+
+
+def _store_file(name: str) -> str:
+    path = os.path.join(FILE_DIR, name)
+    with open(path, "wb") as f:
+        f.write(b"receipt")
+    return path
+
+
+def _create_receipt(repo: ReceiptRepository, date: str, file_paths: list[str]) -> ReceiptDB:
+    return repo.create_receipt(ReceiptDB(date=date, company_name="Hofladen", file_paths=file_paths))
+
+
+def _stored_receipt_id(path: str):
+    with SessionLocal() as session:
+        return session.get(StoredFileDB, path).receipt_id
+
+
+def test_files_of_archived_receipts_survive_reconcile_and_collect(repo):
+    archived_file = _store_file("archived_2020.jpg")
+    current_file = _store_file("current.jpg")
+    orphan_file = _store_file("orphan.jpg")
+    archived = _create_receipt(repo, "2020-03-15", [archived_file])
+    _create_receipt(repo, f"{THIS_YEAR}-01-10", [current_file])
+    reconcile()
+
+    archive_year(2020)
+    reconcile()
+
+    assert _stored_receipt_id(archived_file) == archived.id
+    garbage = find_garbage(NO_GRACE)
+    assert orphan_file in garbage
+    assert archived_file not in garbage
+    removed = collect(NO_GRACE)
+    assert orphan_file in removed
+    assert os.path.exists(archived_file)
+    assert os.path.exists(current_file)
+
+
+def test_collect_keeps_released_files_of_archived_receipts(repo):
+    shared_file = _store_file("shared_2019.jpg")
+    archived = _create_receipt(repo, "2019-06-01", [shared_file])
+    duplicate = _create_receipt(repo, f"{THIS_YEAR}-02-01", [shared_file])
+    archive_year(2019)
+
+    # Deleting the copy in receipts.db releases the file in the index
+    repo.delete_receipt(duplicate.id)
+    assert os.path.exists(shared_file)
+
+    assert shared_file not in collect(NO_GRACE)
+    assert os.path.exists(shared_file)
+    assert _stored_receipt_id(shared_file) == archived.id
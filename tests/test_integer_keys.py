@@ -0,0 +1,81 @@
+import uuid
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+
+from repository.receipt_repository import (
+    ProductDB,
+    ReceiptDB,
+    ReceiptRepository,
+    ReceiptTaxLineDB,
+    SessionLocal,
+    SortimentDB,
+)
+
+
+def _save(product_class: str) -> tuple[ReceiptDB, int]:
+    repository = ReceiptRepository()
+    with SessionLocal() as session:
+        sortiment = SortimentDB(name=product_class)
+        session.add(sortiment)
+        session.commit()
+        class_pk = sortiment.pk
+    receipt = repository.create_receipt_with_products(
+        ReceiptDB(
+            date="09.09.2027",
+            company_name="Schlüsseltest",
+            tax_summary={"10": {"net_sum": 10.0, "tax_sum": 1.0, "gross_sum": 11.0}},
+        ),
+        [ProductDB(name="Topfen", product_class_pk=class_pk), ProductDB(name="Butter")],
+    )
+    return receipt, class_pk
+
+
+def _products(receipt_pk: int) -> dict[str, int | None]:
+    with SessionLocal() as session:
+        rows = session.query(ProductDB.name, ProductDB.product_class_pk).filter(ProductDB.receipt_pk == receipt_pk)
+        return dict(rows.all())
+
+
+def test_receipts_are_found_by_their_uuid():
+    receipt, class_pk = _save("Milchprodukte Schlüsseltest")
+    assert isinstance(receipt.pk, int)
+    # /receipt_detail?id= links keep resolving the UUID
+    assert str(uuid.UUID(receipt.id)) == receipt.id
+    assert ReceiptRepository().get_receipt_by_id(receipt.id).pk == receipt.pk
+    assert _products(receipt.pk) == {"Topfen": class_pk, "Butter": None}
+
+
+def test_deletes_follow_the_integer_foreign_keys():
+    receipt, class_pk = _save("Käserei Schlüsseltest")
+    with SessionLocal() as session:
+        # Raw SQL, so the foreign keys do the work rather than the repository
+        session.execute(text("DELETE FROM sortiment WHERE pk = :pk"), {"pk": class_pk})
+        session.commit()
+    assert _products(receipt.pk) == {"Topfen": None, "Butter": None}
+
+    with SessionLocal() as session:
+        session.execute(text("DELETE FROM receipts WHERE pk = :pk"), {"pk": receipt.pk})
+        session.commit()
+        assert session.query(ReceiptTaxLineDB).filter(ReceiptTaxLineDB.receipt_pk == receipt.pk).count() == 0
+    assert _products(receipt.pk) == {}
+
+
+def test_products_need_an_existing_receipt():
+    ReceiptRepository()
+    with SessionLocal() as session, pytest.raises(IntegrityError):
+        session.execute(insert(ProductDB).values(name="Waise", receipt_pk=987654321))
+        session.commit()
+
+
+def test_product_joins_search_the_integer_index():
+    with SessionLocal() as session:
+        plan = session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT products.name, receipts.date FROM receipts "
+                "JOIN products ON products.receipt_pk = receipts.pk WHERE receipts.id = :id"
+            ),
+            {"id": "x"},
+        ).all()
+    assert "SEARCH products USING INDEX ix_products_receipt_pk (receipt_pk=?)" in [row[3] for row in plan]
@@ -0,0 +1,164 @@
+import sqlite3
+
+import pytest
+
+from repository import migrations
+
+# receipts.db as the first release created it: UUID string keys, no later columns
+BASELINE_SCHEMA = """
+    CREATE TABLE receipts (
+        created_on DATETIME DEFAULT CURRENT_TIMESTAMP, updated_on DATETIME, id VARCHAR NOT NULL,
+        receipt_number VARCHAR, date VARCHAR, total_gross_amount FLOAT, total_net_amount FLOAT,
+        vat_amount FLOAT, company_name VARCHAR, description VARCHAR, comment VARCHAR, is_credit BOOLEAN,
+        is_bio BOOLEAN, tax_summary JSON, file_paths JSON, source VARCHAR, PRIMARY KEY (id)
+    );
+    CREATE INDEX ix_receipts_receipt_number ON receipts (receipt_number);
+    CREATE TABLE sortiment (
+        id VARCHAR NOT NULL, name VARCHAR NOT NULL, created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_on DATETIME, PRIMARY KEY (id), UNIQUE (name)
+    );
+    CREATE TABLE products (
+        id VARCHAR NOT NULL, receipt_id VARCHAR NOT NULL, name VARCHAR, is_bio BOOLEAN,
+        bio_category VARCHAR(24), amount FLOAT, price FLOAT, unit VARCHAR(5), product_class_reference VARCHAR,
+        created_on DATETIME DEFAULT CURRENT_TIMESTAMP, updated_on DATETIME, PRIMARY KEY (id),
+        FOREIGN KEY(receipt_id) REFERENCES receipts (id), FOREIGN KEY(product_class_reference) REFERENCES sortiment (id)
+    );
+    CREATE INDEX ix_products_receipt_id ON products (receipt_id);
+"""
+
+TAX_SUMMARY = '{"10": {"net_sum": 1.0, "tax_sum": 0.1, "gross_sum": 1.1}}'
+RECEIPTS = "SELECT id, date, total_gross_amount, company_name, is_credit, tax_summary, file_paths FROM receipts"
+PRODUCTS = """
+    SELECT products.id, receipts.id, products.name, products.amount, products.price, products.unit, sortiment.name
+    FROM products JOIN receipts ON {receipt_join} LEFT JOIN sortiment ON {class_join}
+"""
+
+
+def _baseline(path, receipts: int = 40) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO sortiment (id, name) VALUES ('class-1', 'Käse'), ('class-2', 'Futter')")
+    for i in range(receipts):
+        conn.execute(
+            "INSERT INTO receipts (id, date, total_gross_amount, company_name, is_credit, tax_summary, file_paths) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                f"receipt-{i}",
+                f"{i % 28 + 1:02d}.03.2024",
+                i * 1.1,
+                f"Firma {i % 3}",
+                i % 2,
+                TAX_SUMMARY,
+                f'["saved_images/{i}.jpg"]',
+            ),
+        )
+        for j in range(3):
+            conn.execute(
+                "INSERT INTO products (id, receipt_id, name, amount, price, unit, product_class_reference) "
+                "VALUES (?, ?, ?, ?, ?, 'PIECE', ?)",
+                (f"product-{i}-{j}", f"receipt-{i}", f"Artikel {j}", j + 1, i + j / 10, f"class-{j}" if j else None),
+            )
+    # A product whose receipt is gone, as the old delete left them behind
+    conn.execute("INSERT INTO products (id, receipt_id, name) VALUES ('orphan', 'deleted-receipt', 'Waise')")
+    conn.commit()
+    return conn
+
+
+def _rows(conn, query: str) -> list[tuple]:
+    return sorted(conn.execute(query).fetchall())
+
+
+def test_baseline_database_migrates_with_its_data_intact(tmp_path):
+    path = tmp_path / "receipts.db"
+    conn = _baseline(path)
+    receipts = _rows(conn, RECEIPTS)
+    products = _rows(
+        conn,
+        PRODUCTS.format(
+            receipt_join="receipts.id = products.receipt_id",
+            class_join="sortiment.id = products.product_class_reference",
+        ),
+    )
+    rowids = dict(conn.execute("SELECT id, rowid FROM receipts"))
+
+    run = migrations.run_migrations(str(path))
+    assert run.schema_version == migrations.MIGRATIONS[-1].version
+    assert len(run.applied) == len(migrations.MIGRATIONS)
+    assert migrations.run_migrations(str(path)).applied == []
+
+    assert _rows(conn, RECEIPTS) == receipts
+    migrated = PRODUCTS.format(
+        receipt_join="receipts.pk = products.receipt_pk", class_join="sortiment.pk = products.product_class_pk"
+    )
+    assert _rows(conn, migrated) == products
+    # Existing links by id keep working; the integer keys are the old rowids
+    assert dict(conn.execute("SELECT id, pk FROM receipts")) == rowids
+    assert conn.execute("SELECT COUNT(*) FROM products WHERE id = 'orphan'").fetchone()[0] == 0
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert not conn.execute("SELECT * FROM schema_rebuilds").fetchall()
+    conn.close()
+
+
+def _values_table(path, rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("CREATE TABLE items (name TEXT, code TEXT)")
+    conn.executemany("INSERT INTO items VALUES (?, ?)", [(f"item {i}", f"{i:03d}") for i in range(rows)])
+    conn.execute("CREATE INDEX ix_items_name ON items (name)")
+    return conn
+
+
+ITEMS_WITH_CHECK = "CREATE TABLE {table} (name TEXT NOT NULL, code TEXT, CHECK (length(code) = 3))"
+
+
+class _Interrupt(Exception):
+    pass
+
+
+def test_interrupted_rebuild_resumes_and_mirrors_writes(tmp_path, monkeypatch):
+    path = str(tmp_path / "items.db")
+    writer = _values_table(path, 25)
+    chunks = []
+
+    class Progress:
+        """Writes from another connection between chunks, then stops the rebuild midway"""
+
+        def info(self, message, *args):
+            if "copied" not in message:
+                return
+            chunks.append(args[1])
+            if len(chunks) == 1:
+                writer.execute("UPDATE items SET name = 'renamed' WHERE code = '000'")
+                writer.execute("DELETE FROM items WHERE code = '001'")
+                writer.execute("INSERT INTO items VALUES ('late', '999')")
+            if len(chunks) == 3:
+                raise _Interrupt
+
+    monkeypatch.setattr(migrations, "logger", Progress())
+    conn = migrations.connect(path)
+    with pytest.raises(_Interrupt):
+        migrations.rebuild_table(conn, "items", ITEMS_WITH_CHECK, chunk_size=4)
+    assert conn.execute("SELECT last_rowid FROM schema_rebuilds WHERE table_name = 'items'").fetchone() == (12,)
+
+    migrations.rebuild_table(conn, "items", ITEMS_WITH_CHECK, chunk_size=4)
+    # Continued after row 12 instead of starting over
+    assert chunks[3] > 12
+    expected = [(f"item {i}", f"{i:03d}") for i in range(2, 25)] + [("late", "999"), ("renamed", "000")]
+    assert sorted(conn.execute("SELECT name, code FROM items")) == sorted(expected)
+    assert "CHECK" in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'items'").fetchone()[0]
+    # The index is back and the mirror triggers are gone
+    schema = conn.execute("SELECT type, name FROM sqlite_master WHERE tbl_name = 'items' AND type != 'table'")
+    assert schema.fetchall() == [("index", "ix_items_name")]
+    conn.close()
+    writer.close()
+
+
+def test_copy_that_does_not_match_is_not_swapped_in(tmp_path):
+    path = str(tmp_path / "items.db")
+    _values_table(path, 10).close()
+    conn = migrations.connect(path)
+    # INTEGER affinity turns the code '007' into 7, so the checksums differ
+    with pytest.raises(RuntimeError, match="does not match"):
+        migrations.rebuild_table(conn, "items", "CREATE TABLE {table} (name TEXT, code INTEGER)")
+    assert conn.execute("SELECT code FROM items WHERE name = 'item 7'").fetchone() == ("007",)
+    assert "code TEXT" in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'items'").fetchone()[0]
+    conn.close()
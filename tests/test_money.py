@@ -0,0 +1,54 @@
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+
+from pages.utils import sum_euros_by
+from receipt_parser.money import Money, sum_euros, to_cents, to_cents_array
+
+
+def _decimal_cents(value: float) -> int:
+    """Half-up cents of the value as written, the way _round used to compute them"""
+    return int(Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) * 100)
+
+
+def _amounts(rng: random.Random, count: int) -> list[float]:
+    # Cents, three decimals (many of them ties like 2.675) and arbitrary floats, both signs
+    return [
+        rng.choice(
+            (
+                rng.randint(-10**9, 10**9) / 100,
+                rng.randint(-10**9, 10**9) / 1000,
+                rng.uniform(-10**6, 10**6),
+            )
+        )
+        for _ in range(count)
+    ]
+
+
+def test_scalar_and_bulk_cents_round_half_up_as_written():
+    values = _amounts(random.Random(33), 20_000) + [1.005, -1.005, 2.675, 0.125, 0.0, -0.0]
+    expected = [_decimal_cents(value) for value in values]
+    assert [to_cents(value) for value in values] == expected
+    assert to_cents_array(values).tolist() == expected
+    assert to_cents_array([np.nan, None]).tolist() == [0, 0]
+
+
+def test_sums_do_not_drift():
+    assert sum_euros([0.1] * 10) == 1.0
+    assert sum_euros([19.99] * 1000 + [-0.01] * 10) == 19989.9
+
+    frame = pd.DataFrame({"month": ["05", "05", "06"], "gross": [0.1, 0.2, 1.005]})
+    assert sum_euros_by(frame, "month", ["gross"])["gross"].to_dict() == {"05": 0.3, "06": 1.01}
+    assert sum_euros_by(frame.iloc[:0], "month", ["gross"]).empty
+
+
+def test_money_derives_net_and_tax_in_cents():
+    gross = Money.of(11.0)
+    net = gross.net_from_gross(10)
+    assert (net, net.tax_at(10)) == (Money(1000), Money(100))
+    assert Money.of(1.0).net_from_tax(20) == Money(500)
+    # 0.05 net at 10 % is half a cent of tax, rounded up
+    assert Money.of(0.05).tax_at(10) == Money(1)
+    assert (Money.of(-0.05).tax_at(10), str(Money.of(None) - Money.of(2.5))) == (Money(-1), "-2.50")
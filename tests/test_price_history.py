@@ -0,0 +1,61 @@
+from repository.price_history import PriceHistoryIndex
+from repository.receipt_repository import ProductDB, ReceiptDB, ReceiptRepository, SessionLocal
+
+COMPANY = "Lagerhaus Preistest"
+PRODUCT = "Legemehl 25 kg"
+
+
+def _buy(price: float, name: str = PRODUCT, company: str = COMPANY) -> int:
+    """Save a receipt with one product and return the product's pk"""
+    receipt = ReceiptRepository().create_receipt_with_products(
+        ReceiptDB(date="2025-07-01", company_name=company),
+        [ProductDB(name=name, amount=1, unit="PIECE", price=price)],
+    )
+    with SessionLocal() as session:
+        return session.query(ProductDB.pk).filter(ProductDB.receipt_pk == receipt.pk).scalar()
+
+
+def test_misread_decimal_is_flagged_against_the_history():
+    for price in (12.90, 13.50, 12.40):
+        _buy(price)
+    index = PriceHistoryIndex()
+    index.refresh()
+
+    outlier = index.check("LEGEMEHL, 25 kg", COMPANY, 129.0)
+    assert outlier is not None and outlier.history_count == 3
+    assert 9 < outlier.ratio < 11
+    assert index.check(PRODUCT, COMPANY, 13.20) is None
+    # A new supplier is judged by the product's history at every company
+    assert index.check(PRODUCT, "Neuer Händler", 1.29) is not None
+    assert index.check("Unbekanntes Futter", COMPANY, 129.0) is None
+
+
+def test_saved_price_is_left_out_of_its_own_history():
+    name = "Mineralfutter Preistest"
+    for price in (24.0, 25.0, 23.5):
+        _buy(price, name)
+    misread = _buy(245.0, name)
+    index = PriceHistoryIndex()
+    index.refresh()
+    assert index.check(name, COMPANY, 245.0, product_pk=misread) is not None
+
+
+def test_refresh_appends_new_products_and_rereads_after_edits():
+    name = "Hühnerfutter Preistest"
+    pks = [_buy(price, name) for price in (18.0, 18.5, 19.0)]
+    index = PriceHistoryIndex()
+    index.refresh()
+    assert index.refresh() == 0
+
+    _buy(18.2, name)
+    assert index.refresh() == 1
+    assert index.check(name, COMPANY, 182.0).history_count == 4
+
+    # Correcting a misread price in the history reads everything again
+    with SessionLocal() as session:
+        for pk in pks:
+            session.get(ProductDB, pk).name = "Entenfutter Preistest"
+        session.commit()
+    assert index.refresh() > 1
+    assert index.check(name, COMPANY, 182.0) is None
+    assert index.check("Entenfutter Preistest", COMPANY, 182.0).history_count == 3
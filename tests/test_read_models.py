@@ -0,0 +1,84 @@
+import pandas as pd
+from sqlalchemy import update
+
+from models.product import BioCategory, ProductUnit
+from repository.read_models import RECEIPT_COLUMNS, bio_products_frame, products_frame, receipts_frame
+from repository.receipt_repository import ProductDB, ReceiptDB, ReceiptRepository, SessionLocal, SortimentDB
+
+COMPANY = "Lesemodell-Test"
+TAX_SUMMARY = {
+    "10": {"net_sum": 20.0, "tax_sum": 2.0, "gross_sum": 22.0},
+    "20": {"net_sum": 7.67, "tax_sum": 1.53, "gross_sum": 9.2},
+}
+
+
+def _save(product_class: str) -> ReceiptDB:
+    repository = ReceiptRepository()
+    with SessionLocal() as session:
+        kraftfutter = SortimentDB(name=product_class)
+        session.add(kraftfutter)
+        session.commit()
+        class_pk = kraftfutter.pk
+    return repository.create_receipt_with_products(
+        ReceiptDB(
+            date="02.04.2027",
+            company_name=COMPANY,
+            receipt_number="R-77",
+            is_credit=False,
+            total_gross_amount=31.2,
+            tax_summary=TAX_SUMMARY,
+        ),
+        [
+            ProductDB(
+                name="Legemehl",
+                amount=2,
+                unit=ProductUnit.KILO,
+                price=11.0,
+                is_bio=True,
+                bio_category=BioCategory.TIERHALTUNG,
+                product_class_pk=class_pk,
+            ),
+            ProductDB(name="Seife", amount=1, unit=ProductUnit.PIECE, price=9.2, is_bio=False),
+        ],
+    )
+
+
+def test_frames_match_the_orm_objects():
+    receipt = _save("Kraftfutter Lesemodell")
+    with SessionLocal() as session:
+        stored = session.get(ReceiptDB, receipt.pk)
+        expected = {column.key: getattr(stored, column.key) for column in RECEIPT_COLUMNS}
+        products = {p.name: p for p in session.query(ProductDB).filter(ProductDB.receipt_pk == receipt.pk)}
+        product_ids = {name: p.id for name, p in products.items()}
+
+    receipts = receipts_frame(ReceiptDB.company_name == COMPANY, vat_rates=(10, 13, 20))
+    assert len(receipts) == 1
+    row = receipts.iloc[0]
+    assert {key: row[key] for key in ("id", "company_name", "receipt_number", "total_gross_amount")} == {
+        key: expected[key] for key in ("id", "company_name", "receipt_number", "total_gross_amount")
+    }
+    assert "pk" not in receipts and "transcription" not in receipts
+    assert (row["vat_10"], row["vat_13"], row["vat_20"]) == (2.0, 0.0, 1.53)
+    # Receipts from before the source column count as scanned
+    assert row["source"] == "RECEIPT_SCANNER"
+
+    frame = products_frame(ReceiptDB.company_name == COMPANY).set_index("name")
+    legemehl = frame.loc["Legemehl"]
+    assert legemehl["id"] == product_ids["Legemehl"]
+    assert (legemehl["unit"], legemehl["bio_category"]) == ("KILO", "Tierhaltung")
+    assert legemehl["product_class"] == "Kraftfutter Lesemodell"
+    assert (legemehl["receipt_id"], legemehl["receipt_number"]) == (receipt.id, "R-77")
+    assert legemehl["receipt_url"] == f"/receipt_detail?id={receipt.id}"
+    assert pd.isna(frame.loc["Seife", "product_class"])
+
+    bio = bio_products_frame()
+    assert set(bio.loc[bio["company_name"] == COMPANY, "name"]) == {"Legemehl"}
+
+
+def test_credit_notes_are_not_bio_purchases():
+    receipt = _save("Kraftfutter Gutschrift")
+    with SessionLocal() as session:
+        session.execute(update(ReceiptDB).where(ReceiptDB.pk == receipt.pk).values(is_credit=True))
+        session.commit()
+    bio = bio_products_frame()
+    assert receipt.id not in set(bio["receipt_id"])
@@ -0,0 +1,78 @@
+import datetime
+import uuid
+
+import pytest
+from sqlalchemy import insert
+
+from receipt_parser.dates import parse_receipt_date, period_range
+from repository.receipt_repository import ReceiptDB, ReceiptFilter, ReceiptRepository, SessionLocal
+from scripts.backfill_receipt_dates import backfill
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2025-03-14", datetime.date(2025, 3, 14)),
+        # Day first, as printed on Austrian receipts
+        ("04.03.2025", datetime.date(2025, 3, 4)),
+        ("04.03.25", datetime.date(2025, 3, 4)),
+        ("04/03/2025", datetime.date(2025, 3, 4)),
+        (" 2025-03-14T10:22:00 ", datetime.date(2025, 3, 14)),
+        ("31.02.2025", None),
+        ("März 2025", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_receipt_dates_are_parsed_day_first(value, expected):
+    assert parse_receipt_date(value) == expected
+
+
+def test_period_range_spans_year_ends():
+    assert period_range("2025-12") == (datetime.date(2025, 12, 1), datetime.date(2026, 1, 1))
+    assert period_range("2025-Q4") == (datetime.date(2025, 10, 1), datetime.date(2026, 1, 1))
+
+
+def _receipt_date(receipt_id: str):
+    with SessionLocal() as session:
+        return session.query(ReceiptDB.receipt_date).filter(ReceiptDB.id == receipt_id).scalar()
+
+
+def test_receipt_date_follows_every_write_of_date():
+    receipt = ReceiptRepository().create_receipt(ReceiptDB(date="07.11.2026", company_name="Datumstest"))
+    assert _receipt_date(receipt.id) == datetime.date(2026, 11, 7)
+    with SessionLocal() as session:
+        session.get(ReceiptDB, receipt.pk).date = "unleserlich"
+        session.commit()
+    assert _receipt_date(receipt.id) is None
+    ReceiptRepository().update_receipt(receipt.id, ReceiptDB(date="2026-11-08", company_name="Datumstest"))
+    assert _receipt_date(receipt.id) == datetime.date(2026, 11, 8)
+
+
+def test_backfill_fills_dates_in_chunks_and_leaves_unreadable_ones_empty():
+    ReceiptRepository()
+    rows = [
+        {"id": str(uuid.uuid4()), "date": date, "source": "DATE_BACKFILL", "is_credit": False}
+        for date in ("01.12.2026", "2026-12-02", "03.12.26", "gestern", "04.12.2026")
+    ]
+    with SessionLocal() as session:
+        # Rows written before the column existed
+        session.execute(insert(ReceiptDB), rows)
+        session.commit()
+    assert all(_receipt_date(row["id"]) is None for row in rows)
+
+    backfill(apply=False, chunk_size=2)
+    assert all(_receipt_date(row["id"]) is None for row in rows)
+
+    backfill(apply=True, chunk_size=2)
+    assert [_receipt_date(row["id"]) for row in rows] == [
+        datetime.date(2026, 12, 1),
+        datetime.date(2026, 12, 2),
+        datetime.date(2026, 12, 3),
+        None,
+        datetime.date(2026, 12, 4),
+    ]
+    december = ReceiptFilter(
+        source="DATE_BACKFILL", date_from=datetime.date(2026, 12, 2), date_to=datetime.date(2026, 12, 3)
+    )
+    assert ReceiptRepository().count_receipts(december) == 2
@@ -0,0 +1,53 @@
+import datetime
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+from repository import migrations
+from repository.receipt_repository import Base, ReceiptDB, ReceiptFilter, ReceiptRepository, SessionLocal, engine
+
+DATES = {"date_from": datetime.date(2024, 1, 1), "date_to": datetime.date(2024, 12, 31)}
+
+
+def _query_plan(receipt_filter: ReceiptFilter) -> str:
+    statement = receipt_filter.apply(select(ReceiptDB.pk))
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with SessionLocal() as session:
+        return "\n".join(row[3] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+@pytest.mark.parametrize(
+    "receipt_filter, index",
+    [
+        (ReceiptFilter(is_credit=True, company_id=3, **DATES), "ix_receipts_is_credit_company_id_receipt_date"),
+        (ReceiptFilter(is_credit=False, company_id=3, **DATES), "ix_receipts_company_id_receipt_date"),
+        (ReceiptFilter(company_id=3, **DATES), "ix_receipts_company_id_receipt_date"),
+        (ReceiptFilter(source="RECHNUNGSAPP", **DATES), "ix_receipts_source_receipt_date"),
+        (ReceiptFilter(source="RECEIPT_SCANNER"), "ix_receipts_source_receipt_date"),
+        (ReceiptFilter(is_bio=True, is_credit=False), "ix_receipts_is_bio_is_credit"),
+        (ReceiptFilter(**DATES), "ix_receipts_receipt_date"),
+    ],
+)
+def test_filters_search_an_index(receipt_filter, index):
+    ReceiptRepository()
+    plan = _query_plan(receipt_filter)
+    assert f"INDEX {index} (" in plan
+    assert "SCAN receipts" not in plan
+
+
+def test_migration_replaces_the_dead_filter_indexes(tmp_path):
+    path = tmp_path / "receipts.db"
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE INDEX ix_receipts_company_date ON receipts (company_name, date)")
+    conn.execute("CREATE INDEX ix_receipts_source_date ON receipts (source, date)")
+    conn.execute("DROP INDEX ix_receipts_source_receipt_date")
+    conn.commit()
+
+    migrations.run_migrations(str(path))
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert not indexes & set(migrations.DEAD_FILTER_INDEXES)
+    assert {index.name for index in ReceiptDB.__table__.indexes} <= indexes
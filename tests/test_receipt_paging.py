@@ -0,0 +1,102 @@
+import datetime
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, insert, update
+
+from repository import migrations
+from repository.receipt_repository import Base, ReceiptDB, ReceiptFilter, ReceiptRepository, SessionLocal
+
+ADDED = datetime.datetime(2025, 3, 1, 12, 0)
+DATED = datetime.date(2025, 2, 1)
+
+
+def _insert(source: str, rows: list[dict]) -> list[dict]:
+    """Receipts of their own source, so each test pages only its own"""
+    ReceiptRepository()
+    rows = [{"id": str(uuid.uuid4()), "source": source, "is_credit": False, **row} for row in rows]
+    with SessionLocal() as session:
+        session.execute(insert(ReceiptDB), rows)
+        # Rows from before created_on had a default; the insert fills it in for None
+        legacy = [row["id"] for row in rows if "created_on" in row and row["created_on"] is None]
+        session.execute(update(ReceiptDB).where(ReceiptDB.id.in_(legacy)).values(created_on=None))
+        session.commit()
+    return rows
+
+
+def _page_through(receipt_filter: ReceiptFilter, order_by: str, limit: int) -> list[str]:
+    ids = []
+    page = ReceiptRepository().get_receipts_page(receipt_filter, limit=limit, order_by=order_by)
+    while True:
+        assert len(page.receipts) <= limit
+        ids += [receipt.id for receipt in page.receipts]
+        if page.next_cursor is None:
+            return ids
+        page = ReceiptRepository().get_receipts_page(receipt_filter, after=page.next_cursor, limit=limit, order_by=order_by)
+
+
+def _newest_first(rows: list[dict], order_by: str) -> list[str]:
+    # Empty keys last, ties newest id first
+    return [row["id"] for row in sorted(rows, key=lambda row: (str(row[order_by] or ""), row["id"]), reverse=True)]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 100])
+def test_pages_list_every_receipt_once_with_ties_on_created_on(limit):
+    source = f"PAGING_TIES_{limit}"
+    rows = _insert(
+        source,
+        # Three receipts added in the same second, one from before created_on had a default
+        [{"created_on": ADDED}] * 3
+        + [{"created_on": ADDED + datetime.timedelta(days=1)}, {"created_on": ADDED - datetime.timedelta(days=1)}]
+        + [{"created_on": None}],
+    )
+    ids = _page_through(ReceiptFilter(source=source), "created_on", limit)
+    assert ids == _newest_first(rows, "created_on")
+    assert ids[-1] == next(row["id"] for row in rows if row["created_on"] is None)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5])
+def test_undated_receipts_come_last_when_paging_by_receipt_date(limit):
+    source = f"PAGING_DATES_{limit}"
+    rows = _insert(
+        source,
+        [{"receipt_date": DATED + datetime.timedelta(days=days), "created_on": ADDED} for days in (0, 30, 0, -30)]
+        + [{"receipt_date": None, "created_on": ADDED}] * 2,
+    )
+    ids = _page_through(ReceiptFilter(source=source), "receipt_date", limit)
+    assert ids == _newest_first(rows, "receipt_date")
+    assert {row["id"] for row in rows if row["receipt_date"] is None} == set(ids[-2:])
+
+
+def test_filters_apply_on_every_page():
+    source = "PAGING_FILTERED"
+    rows = _insert(
+        source,
+        [{"is_credit": days % 3 == 0, "receipt_date": DATED + datetime.timedelta(days=days)} for days in range(12)],
+    )
+    receipt_filter = ReceiptFilter(source=source, is_credit=True, date_to=DATED + datetime.timedelta(days=8))
+    credits = [row for row in rows if row["is_credit"] and row["receipt_date"] <= receipt_filter.date_to]
+    assert _page_through(receipt_filter, "receipt_date", 1) == _newest_first(credits, "receipt_date")
+    assert ReceiptRepository().count_receipts(receipt_filter) == len(credits) == 3
+
+
+def test_unknown_order_column_is_refused():
+    with pytest.raises(ValueError):
+        ReceiptRepository().get_receipts_page(order_by="date")
+
+
+def test_migration_replaces_the_page_indexes(tmp_path):
+    path = tmp_path / "receipts.db"
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX ix_receipts_page_created_on")
+    conn.execute("CREATE INDEX ix_receipts_created_on_id ON receipts (created_on, id)")
+    conn.commit()
+
+    migrations.run_migrations(str(path))
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert "ix_receipts_created_on_id" not in indexes
+    assert "ix_receipts_page_created_on" in indexes
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from repository.receipt_repository import (
+    ProductDB,
+    ReceiptDB,
+    ReceiptRepository,
+    ReceiptTaxLineDB,
+    SessionLocal,
+    engine,
+)
+
+TAX_SUMMARY = {
+    "10": {"net_sum": 50.0, "tax_sum": 5.0, "gross_sum": 55.0},
+    "20": {"net_sum": 10.0, "tax_sum": 2.0, "gross_sum": 12.0},
+}
+
+
+def _products(count: int, **fields) -> list[ProductDB]:
+    return [ProductDB(name=f"Artikel {i}", amount=1, unit="PIECE", price=1.0, **fields) for i in range(count)]
+
+
+@pytest.fixture
+def commits():
+    """Commits on the engine; ReceiptRepository() itself commits the schema, create it first"""
+    counted = []
+    listener = lambda connection: counted.append(connection)  # noqa: E731
+    event.listen(engine, "commit", listener)
+    yield counted
+    event.remove(engine, "commit", listener)
+
+
+def test_receipt_products_and_tax_lines_are_saved_in_one_commit(commits):
+    repository = ReceiptRepository()
+    commits.clear()
+    receipt = repository.create_receipt_with_products(
+        ReceiptDB(date="12.03.2027", company_name="Speichertest", tax_summary=TAX_SUMMARY), _products(60)
+    )
+    assert len(commits) == 1
+    with SessionLocal() as session:
+        names = session.query(ProductDB.name).filter(ProductDB.receipt_pk == receipt.pk).order_by(ProductDB.pk)
+        assert [name for (name,) in names] == [f"Artikel {i}" for i in range(60)]
+        rates = session.query(ReceiptTaxLineDB.rate).filter(ReceiptTaxLineDB.receipt_pk == receipt.pk)
+        assert sorted(rate for (rate,) in rates) == [10, 20]
+
+
+def test_failing_product_leaves_no_receipt_behind():
+    # A product class that does not exist breaks the foreign key on the last line
+    products = _products(5) + _products(1, product_class_pk=987654)
+    with pytest.raises(IntegrityError):
+        ReceiptRepository().create_receipt_with_products(
+            ReceiptDB(date="12.03.2027", company_name="Speichertest halb"), products
+        )
+    with SessionLocal() as session:
+        assert session.query(ReceiptDB).filter(ReceiptDB.company_name == "Speichertest halb").count() == 0
+
+
+def test_products_added_later_share_one_commit(commits):
+    repository = ReceiptRepository()
+    receipt = repository.create_receipt(ReceiptDB(date="13.03.2027", company_name="Speichertest später"))
+    commits.clear()
+    repository.add_products(receipt.pk, _products(20))
+    assert len(commits) == 1
+    with SessionLocal() as session:
+        assert session.query(ProductDB).filter(ProductDB.receipt_pk == receipt.pk).count() == 20
@@ -0,0 +1,122 @@
+import random
+from collections import defaultdict
+
+import pandas as pd
+from sqlalchemy import text
+
+from receipt_parser.money import to_cents
+from repository.receipt_repository import ReceiptDB, ReceiptRepository, ReceiptStatsDB, SessionLocal
+from repository.statistics import get_receipt_stats
+from repository.triggers import rebuild_receipt_stats
+
+COMPANIES = ["Statistiktest Hofladen", "Statistiktest Lagerhaus", None]
+DATES = ["03.01.2029", "28.01.2029", "2029-02-14", "unleserlich", None]
+
+
+def _amount(rng: random.Random):
+    # Half-cent ties and missing amounts included
+    return rng.choice((None, rng.randint(-5000, 50000) / 100, rng.randint(0, 50000) / 1000))
+
+
+def _random_fields(rng: random.Random) -> dict:
+    return {
+        "date": rng.choice(DATES),
+        "company_name": rng.choice(COMPANIES),
+        "is_credit": rng.random() < 0.5,
+        "source": rng.choice(("STATS_TEST", "STATS_TEST_APP")),
+        "total_gross_amount": _amount(rng),
+        "total_net_amount": _amount(rng),
+        "vat_amount": _amount(rng),
+    }
+
+
+def _stats() -> dict[tuple, tuple]:
+    with SessionLocal() as session:
+        rows = session.query(ReceiptStatsDB).filter(ReceiptStatsDB.source.in_(("STATS_TEST", "STATS_TEST_APP")))
+        return {
+            (row.month, row.is_credit, row.company_name, row.source): (
+                row.receipt_count,
+                row.gross_cents,
+                row.net_cents,
+                row.vat_cents,
+            )
+            for row in rows
+        }
+
+
+def _expected() -> dict[tuple, tuple]:
+    """The same totals summed in Python from the receipts"""
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    with SessionLocal() as session:
+        receipts = session.query(ReceiptDB).filter(ReceiptDB.source.in_(("STATS_TEST", "STATS_TEST_APP")))
+        for receipt in receipts:
+            month = receipt.receipt_date.strftime("%Y-%m") if receipt.receipt_date else ""
+            key = (month, bool(receipt.is_credit), receipt.company_name or "", receipt.source)
+            row = totals[key]
+            row[0] += 1
+            for i, amount in enumerate((receipt.total_gross_amount, receipt.total_net_amount, receipt.vat_amount), 1):
+                row[i] += to_cents(amount or 0.0)
+    return {key: tuple(row) for key, row in totals.items()}
+
+
+def test_triggers_keep_the_totals_of_random_edits_and_rebuild_agrees():
+    rng = random.Random(41)
+    repository = ReceiptRepository()
+    pks = []
+    for step in range(300):
+        action = rng.random()
+        if not pks or action < 0.4:
+            pks.append(repository.create_receipt(ReceiptDB(**_random_fields(rng))).pk)
+        elif action < 0.7:
+            with SessionLocal() as session:
+                receipt = session.get(ReceiptDB, rng.choice(pks))
+                for field, value in rng.sample(sorted(_random_fields(rng).items()), 2):
+                    setattr(receipt, field, value)
+                session.commit()
+        elif action < 0.85:
+            # Raw SQL, as the backfills write
+            with SessionLocal() as session:
+                session.execute(
+                    text("UPDATE receipts SET vat_amount = :vat, company_name = :company WHERE pk = :pk"),
+                    {"vat": _amount(rng), "company": rng.choice(COMPANIES), "pk": rng.choice(pks)},
+                )
+                session.commit()
+        else:
+            pk = pks.pop(rng.randrange(len(pks)))
+            with SessionLocal() as session:
+                receipt_id = session.get(ReceiptDB, pk).id
+            repository.delete_receipt(receipt_id)
+        if step % 50 == 0:
+            assert _stats() == _expected()
+
+    stats = _stats()
+    assert stats == _expected()
+    # No rows of emptied groups are left behind
+    assert all(count > 0 for count, *_ in stats.values())
+
+    with SessionLocal() as session:
+        rebuild_receipt_stats(session)
+        session.commit()
+    assert _stats() == stats
+
+
+def test_stats_frame_is_in_euros_with_missing_keys_empty():
+    ReceiptRepository().create_receipt(
+        ReceiptDB(
+            date="unleserlich",
+            source="STATS_FRAME",
+            is_credit=True,
+            total_gross_amount=12.345,
+            total_net_amount=11.0,
+            vat_amount=None,
+        )
+    )
+    df = get_receipt_stats()
+    row = df[df["source"] == "STATS_FRAME"].iloc[0]
+    assert pd.isna(row["month"]) and pd.isna(row["company_name"]) and bool(row["is_credit"])
+    assert (row["receipt_count"], row["total_gross_amount"], row["total_net_amount"], row["vat_amount"]) == (
+        1,
+        12.35,
+        11.0,
+        0.0,
+    )
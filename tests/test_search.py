@@ -0,0 +1,52 @@
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from repository import migrations
+from repository.receipt_repository import Base, ReceiptDB, ReceiptRepository, SessionLocal
+from repository.search import search
+
+
+def _create(**fields) -> str:
+    return ReceiptRepository().create_receipt(ReceiptDB(date="2025-06-03", company_name="Hofladen", **fields)).id
+
+
+def _receipt_hits(query: str) -> list[str]:
+    return search(query, kinds=("receipt",), limit=100).hits["receipt_id"].tolist()
+
+
+def test_transcriptions_are_searched_folded_and_inside_words():
+    receipt_id = _create(transcription="1x Euterwollsalbe 12,90\n2x Ziegenkäse 4,50")
+    assert receipt_id in _receipt_hits("euterwoll")
+    # Folded like the other fields and matched inside words
+    assert receipt_id in _receipt_hits("KAESE ziegen")
+    hits = search("euterwoll", kinds=("receipt",)).hits
+    assert "**euterwoll**" in hits.loc[hits["receipt_id"] == receipt_id, "excerpt"].item()
+
+
+def test_edited_transcription_is_reindexed():
+    receipt_id = _create(transcription="Melkfett")
+    with SessionLocal() as session:
+        session.query(ReceiptDB).filter(ReceiptDB.id == receipt_id).one().transcription = "Klauenpflege"
+        session.commit()
+    assert receipt_id not in _receipt_hits("melkfett")
+    assert receipt_id in _receipt_hits("klauenpflege")
+
+
+def test_migration_drops_the_separate_transcription_index(tmp_path):
+    path = tmp_path / "receipts.db"
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE VIRTUAL TABLE receipt_transcriptions_fts USING fts5(transcription, content='receipts')")
+    conn.execute(
+        "CREATE TRIGGER receipts_transcription_ai AFTER INSERT ON receipts BEGIN "
+        "INSERT INTO receipt_transcriptions_fts(rowid, transcription) VALUES (new.rowid, new.transcription); END"
+    )
+    conn.execute("CREATE VIRTUAL TABLE receipts_search_fts USING fts5(company_name, tokenize='trigram')")
+    conn.commit()
+
+    migrations.run_migrations(str(path))
+
+    left = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    conn.close()
+    assert not left & {"receipt_transcriptions_fts", "receipts_search_fts", *migrations.DEAD_SEARCH_TRIGGERS}
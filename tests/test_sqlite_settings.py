@@ -0,0 +1,61 @@
+import threading
+
+from sqlalchemy import create_engine, text
+
+from repository.receipt_repository import engine
+from repository.sqlite_settings import SqliteSettings, apply_sqlite_settings
+
+
+def _pragma(connection, name: str):
+    return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_app_connections_get_the_pragmas():
+    with engine.connect() as connection:
+        assert _pragma(connection, "journal_mode") == "wal"
+        # NORMAL, MEMORY
+        assert (_pragma(connection, "synchronous"), _pragma(connection, "temp_store")) == (1, 2)
+        assert _pragma(connection, "busy_timeout") == 10_000
+        assert _pragma(connection, "foreign_keys") == 1
+        assert _pragma(connection, "cache_size") == -16 * 1024
+
+
+def test_settings_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "250")
+    monkeypatch.setenv("SQLITE_FOREIGN_KEYS", "off")
+    settings = SqliteSettings.from_env()
+    assert (settings.synchronous, settings.busy_timeout_ms, settings.foreign_keys) == ("FULL", 250, False)
+    assert settings.engine_kwargs()["connect_args"]["timeout"] == 0.25
+    assert "PRAGMA foreign_keys=OFF" in settings.pragmas()
+
+
+def test_readers_do_not_block_and_writers_wait_for_the_lock(tmp_path):
+    settings = SqliteSettings(busy_timeout_ms=5_000)
+    db = create_engine(f"sqlite:///{tmp_path / 'locks.db'}", **settings.engine_kwargs())
+    apply_sqlite_settings(db, settings)
+    with db.begin() as connection:
+        connection.execute(text("CREATE TABLE counter (n INTEGER)"))
+        connection.execute(text("INSERT INTO counter VALUES (0)"))
+
+    writing = threading.Event()
+
+    def hold_write_lock():
+        with db.begin() as connection:
+            connection.execute(text("UPDATE counter SET n = n + 1"))
+            writing.set()
+            threading.Event().wait(0.3)
+
+    writer = threading.Thread(target=hold_write_lock)
+    writer.start()
+    writing.wait()
+    with db.connect() as connection:
+        # WAL: the last committed value, without waiting for the writer
+        assert connection.execute(text("SELECT n FROM counter")).scalar() == 0
+    # The second writer waits for the lock instead of failing with "database is locked"
+    with db.begin() as connection:
+        connection.execute(text("UPDATE counter SET n = n + 1"))
+    writer.join()
+    with db.connect() as connection:
+        assert connection.execute(text("SELECT n FROM counter")).scalar() == 2
+    db.dispose()
@@ -0,0 +1,50 @@
+import numpy as np
+from PIL import Image
+
+from receipt_parser.stitching import MAX_TILE_ASPECT, TILE_WIDTH, find_overlap, split_into_tiles, stitch_images
+
+
+def _receipt(width: int, height: int, seed: int) -> np.ndarray:
+    """Grayscale receipt: white paper with text lines of random length and darkness"""
+    rng = np.random.default_rng(seed)
+    paper = np.full((height, width), 250, dtype=np.uint8)
+    top = 10
+    while top < height - 30:
+        line_height = int(rng.integers(12, 24))
+        length = int(rng.integers(width // 5, width - 20))
+        paper[top : top + line_height, 10 : 10 + length] = rng.integers(0, 120, (line_height, length))
+        top += line_height + int(rng.integers(8, 30))
+    return paper
+
+
+def _photos(receipt: np.ndarray, cuts: list[tuple[int, int]]) -> list[Image.Image]:
+    return [Image.fromarray(receipt[top:bottom]).convert("RGB") for top, bottom in cuts]
+
+
+def test_overlapping_photos_are_stitched_back_into_the_receipt():
+    receipt = _receipt(512, 2400, seed=1)
+    photos = _photos(receipt, [(0, 1000), (700, 1700), (1350, 2400)])
+    assert abs(find_overlap(photos[0], photos[1]) - 300) <= 2
+
+    stitched = np.asarray(stitch_images(photos).convert("L"), dtype=np.int16)
+    assert abs(stitched.shape[0] - receipt.shape[0]) <= 4
+    rows = min(stitched.shape[0], receipt.shape[0])
+    # Off by at most a row or two where the matching scale rounds
+    assert np.mean(np.abs(stitched[:rows] - receipt[:rows]) > 40) < 0.05
+
+
+def test_photos_without_overlap_are_stacked_whole():
+    photos = _photos(_receipt(512, 900, seed=2), [(0, 900)]) + _photos(_receipt(512, 900, seed=3), [(0, 900)])
+    assert find_overlap(*photos) == 0
+    assert stitch_images(photos).size == (512, 1800)
+
+
+def test_tall_image_is_cut_into_model_tiles_between_text_lines():
+    receipt = Image.fromarray(_receipt(1024, 6000, seed=4))
+    tiles = split_into_tiles(receipt)
+    assert len(tiles) > 1
+    assert all(tile.width == TILE_WIDTH and tile.height <= TILE_WIDTH * MAX_TILE_ASPECT for tile in tiles)
+    assert sum(tile.height for tile in tiles) == round(6000 * TILE_WIDTH / 1024)
+    for tile in tiles[1:]:
+        # Each cut lies on blank paper, not through a line of text
+        assert np.asarray(tile.convert("L"))[0].min() > 200
@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+import pytest
+
+from receipt_parser.taxation import DEFAULT_RATES, build_receipt_tax_summary, build_tax_summaries
+
+KEYS = ("total_gross_amount", "total_net_amount", "vat_amount")
+
+
+def _amount(rng: random.Random, scale: int) -> float:
+    # Cents or three decimals, many of them ties like 12.345; negative for credit notes
+    return rng.randint(-scale, scale) / rng.choice((100, 1000))
+
+
+def _off_by_tolerance(rng: random.Random) -> float:
+    # 0.030-0.070 either way, so rounding to the cent decides whether a rate fits
+    return rng.choice((-1, 1)) * rng.randint(30, 70) / 1000
+
+
+def _random_receipt(rng: random.Random) -> dict:
+    scale = rng.choice((10**4, 10**7, 10**11, 10**13))
+    rate = rng.choice(DEFAULT_RATES) / 100
+    net = _amount(rng, scale)
+    kind = rng.random()
+    if kind < 0.4:
+        vat = round(net * rate, 2)
+        gross = round(net + vat, 2)
+    elif kind < 0.7:
+        vat = round(net * rate + _off_by_tolerance(rng), 3)
+        gross = round(net * (1 + rate) + _off_by_tolerance(rng), 3)
+    else:
+        gross, vat = _amount(rng, scale), _amount(rng, scale)
+    values = [value if rng.random() > 0.2 else None for value in (gross, net, vat)]
+    return dict(zip(KEYS, values))
+
+
+def _columns(receipts: list[dict]) -> list[np.ndarray]:
+    # Missing amounts are NaN in the columns, as in a DataFrame
+    return [np.array([np.nan if r[key] is None else r[key] for r in receipts], dtype=np.float64) for key in KEYS]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_scalar_on_random_receipts(seed):
+    rng = random.Random(seed)
+    receipts = [_random_receipt(rng) for _ in range(5_000)]
+    batch = build_tax_summaries(*_columns(receipts))
+    expected = [build_receipt_tax_summary(r) for r in receipts]
+    assert batch.summaries() == expected
+    assert [batch.tax_summary(row) for row in range(len(receipts))] == [e["tax_summary"] for e in expected]
+
+
+def test_batch_matches_scalar_on_edge_cases():
+    receipts = [
+        dict(zip(KEYS, values))
+        for values in [
+            (None, None, None),
+            (110.0, None, None),
+            (None, 100.0, 10.0),
+            (110.0, 100.0, 10.0),
+            (-110.0, -100.0, -10.0),  # credit note
+            (0.0, 0.0, 0.0),
+            (113.0, 100.0, None),
+            (120.0, None, 20.0),
+            (1.005, 1.005, 0.0),
+            (1_100_000_000.0, 1_000_000_000.0, 100_000_000.0),
+            (-11_300_000_000.5, None, -1_300_000_000.06),
+        ]
+    ]
+    assert build_tax_summaries(*_columns(receipts)).summaries() == [build_receipt_tax_summary(r) for r in receipts]
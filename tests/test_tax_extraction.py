@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from receipt_parser import llm
+from receipt_parser.llm import Prompt, extract_receipt_data
+from receipt_parser.taxation import solve_mixed_rates
+
+
+def _product(name: str, amount: float, price: float | None, tax_rate: int | None) -> dict:
+    return {"name": name, "amount": amount, "unit": "PIECE", "price": price, "tax_rate": tax_rate}
+
+
+# Farm shop sale: cheese and bread at 10 %, wine at 20 %. Its totals happen to be exactly
+# 13 % of the net, which the single-rate shortcut took for a 13 % receipt.
+FARM_SHOP = {
+    "is_credit": True,
+    "total_gross_amount": 113.0,
+    "total_net_amount": 100.0,
+    "vat_amount": 13.0,
+    "products": [
+        _product("Bergkäse", 2.5, 22.80, 10),
+        _product("Bauernbrot", 4, 5.00, 10),
+        _product("Zweigelt", 4, 9.00, 20),
+    ],
+}
+FARM_SHOP_SUMMARY = {
+    "10": {"net_sum": 70.0, "tax_sum": 7.0, "gross_sum": 77.0},
+    "20": {"net_sum": 30.0, "tax_sum": 6.0, "gross_sum": 36.0},
+}
+
+# Market stand: vegetables at 10 %, soap at 20 %; 15.3 % overall fits no single rate and
+# two rate pairs
+MARKET = {
+    "is_credit": True,
+    "total_gross_amount": 23.4,
+    "total_net_amount": 20.64,
+    "vat_amount": 2.76,
+    "products": [
+        _product("Karotten", 3, 2.50, 10),
+        _product("Erdäpfel", 1, 7.50, 10),
+        _product("Ziegenmilchseife", 2, 4.20, 20),
+    ],
+}
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Answer the primary extraction with the receipt of the test and record follow-up queries."""
+    calls = {"prices": [], "tax_summary": 0}
+
+    def extract(receipt: dict, prices: dict | None = None, tax_summary: dict | None = None) -> dict:
+        monkeypatch.setattr(llm, "query_openai", lambda query: json.dumps(receipt))
+        monkeypatch.setattr(llm, "get_prompt", lambda *args: {})
+
+        def extract_product_prices(img_paths, names):
+            calls["prices"].append(names)
+            return {name: price for name, price in (prices or {}).items() if name in names}
+
+        def extract_tax_summary(img_paths, receipt_data, stitch=False):
+            calls["tax_summary"] += 1
+            return tax_summary or {}
+
+        monkeypatch.setattr(llm, "extract_product_prices", extract_product_prices)
+        monkeypatch.setattr(llm, "extract_tax_summary", extract_tax_summary)
+        return extract_receipt_data([], Prompt.WOCHENMARKT, None)
+
+    extract.calls = calls
+    return extract
+
+
+def test_lines_split_a_mixed_receipt_whose_totals_fit_one_rate(llm_calls):
+    parsed = llm_calls(FARM_SHOP)
+    assert parsed["tax_summary"] == FARM_SHOP_SUMMARY
+    assert parsed["has_mixed_taxes"] is True
+    assert llm_calls.calls == {"prices": [], "tax_summary": 0}
+
+
+def test_lines_settle_totals_that_alone_are_ambiguous(llm_calls):
+    lines = [(p["amount"] * p["price"], p["tax_rate"]) for p in MARKET["products"]]
+    assert solve_mixed_rates(23.4, 20.64, 2.76).status == "ambiguous"
+    assert solve_mixed_rates(23.4, 20.64, 2.76, lines).status == "unique"
+
+    parsed = llm_calls(MARKET)
+    assert parsed["tax_summary"] == {
+        "10": {"net_sum": 13.64, "tax_sum": 1.36, "gross_sum": 15.0},
+        "20": {"net_sum": 7.0, "tax_sum": 1.4, "gross_sum": 8.4},
+    }
+    assert llm_calls.calls["tax_summary"] == 0
+
+
+def test_missing_line_prices_are_re_read_before_asking_for_the_tax_summary(llm_calls):
+    # Only the soap shows its rate, without a price: 10 % + 20 % and 13 % + 20 % both fit
+    receipt = {
+        **MARKET,
+        "products": [
+            _product("Karotten", 3, 2.50, None),
+            _product("Erdäpfel", 1, 7.50, None),
+            _product("Ziegenmilchseife", 2, None, 20),
+        ],
+    }
+    parsed = llm_calls(receipt, prices={"Ziegenmilchseife": 4.20})
+    # At 4.20 the soap alone is more than the 20 % part of 13 % + 20 %
+    assert llm_calls.calls == {"prices": [["Ziegenmilchseife"]], "tax_summary": 0}
+    assert parsed["tax_summary"] == {
+        "10": {"net_sum": 13.68, "tax_sum": 1.37, "gross_sum": 15.05},
+        "20": {"net_sum": 6.96, "tax_sum": 1.39, "gross_sum": 8.35},
+    }
+
+
+def test_truly_ambiguous_receipts_ask_for_the_tax_summary(llm_calls):
+    receipt = {**MARKET, "products": [{**p, "tax_rate": None} for p in MARKET["products"]]}
+    answer = {"has_mixed_taxes": True, "tax_summary": {"10": {}, "20": {}}}
+    parsed = llm_calls(receipt, tax_summary=answer)
+    assert llm_calls.calls == {"prices": [], "tax_summary": 1}
+    assert parsed["tax_summary"] == answer["tax_summary"]
+
+
+def test_single_rate_receipt_needs_no_follow_up(llm_calls):
+    receipt = {
+        "is_credit": True,
+        "total_gross_amount": 26.4,
+        "total_net_amount": 24.0,
+        "vat_amount": 2.4,
+        "products": [_product("Eier", 24, 1.10, None)],
+    }
+    parsed = llm_calls(receipt)
+    assert parsed["tax_summary"] == {"10": {"net_sum": 24.0, "tax_sum": 2.4, "gross_sum": 26.4}}
+    assert parsed["has_mixed_taxes"] is False
+    assert llm_calls.calls == {"prices": [], "tax_summary": 0}
@@ -0,0 +1,72 @@
+from repository.receipt_repository import (
+    ReceiptDB,
+    ReceiptRepository,
+    ReceiptStatsDB,
+    ReceiptTaxLineDB,
+    SessionLocal,
+    UvaCacheDB,
+)
+from repository.uva import get_uva
+
+SINGLE_RATE = {"10": {"net_sum": 100.0, "tax_sum": 10.0, "gross_sum": 110.0}}
+MIXED = {
+    "10": {"net_sum": 70.0, "tax_sum": 7.0, "gross_sum": 77.0},
+    "20": {"net_sum": 30.0, "tax_sum": 6.0, "gross_sum": 36.0},
+}
+
+
+def _tax_lines(receipt_pk: int) -> dict[int, tuple[int, int, int]]:
+    with SessionLocal() as session:
+        rows = session.query(ReceiptTaxLineDB).filter(ReceiptTaxLineDB.receipt_pk == receipt_pk)
+        return {line.rate: (line.net_cents, line.tax_cents, line.gross_cents) for line in rows}
+
+
+def _stats(company_name: str) -> tuple[int, int, int]:
+    with SessionLocal() as session:
+        row = session.query(ReceiptStatsDB).filter(
+            ReceiptStatsDB.month == "2031-04", ReceiptStatsDB.company_name == company_name
+        ).one()
+        return row.gross_cents, row.net_cents, row.vat_cents
+
+
+def _cached_periods() -> set[str]:
+    with SessionLocal() as session:
+        return {period for (period,) in session.query(UvaCacheDB.period)}
+
+
+def test_editing_the_tax_summary_updates_lines_stats_and_uva_cache():
+    receipt = ReceiptRepository().create_receipt(
+        ReceiptDB(
+            date="10.04.2031",
+            company_name="Hofladen Steuertest",
+            is_credit=True,
+            total_gross_amount=110.0,
+            total_net_amount=100.0,
+            vat_amount=10.0,
+            tax_summary=SINGLE_RATE,
+        )
+    )
+    assert _tax_lines(receipt.pk) == {10: (10000, 1000, 11000)}
+    assert _stats("Hofladen Steuertest") == (11000, 10000, 1000)
+    assert [(line.rate, line.tax_cents) for line in get_uva("2031-04").rates] == [(10, 1000)]
+    get_uva("2031-Q2")
+    assert {"2031-04", "2031-Q2"} <= _cached_periods()
+
+    # As the receipt detail page saves a corrected breakdown
+    with SessionLocal() as session:
+        stored = session.get(ReceiptDB, receipt.pk)
+        stored.tax_summary = MIXED
+        stored.total_gross_amount, stored.total_net_amount, stored.vat_amount = 113.0, 100.0, 13.0
+        session.commit()
+
+    assert _tax_lines(receipt.pk) == {10: (7000, 700, 7700), 20: (3000, 600, 3600)}
+    assert _stats("Hofladen Steuertest") == (11300, 10000, 1300)
+    assert not {"2031-04", "2031-Q2"} & _cached_periods()
+    assert [(line.rate, line.tax_cents) for line in get_uva("2031-04").rates] == [(20, 600), (10, 700)]
+
+    # Dropping the breakdown drops the lines; the UVA infers the rate from the totals again
+    with SessionLocal() as session:
+        session.get(ReceiptDB, receipt.pk).tax_summary = None
+        session.commit()
+    assert _tax_lines(receipt.pk) == {}
+    assert "2031-04" not in _cached_periods()
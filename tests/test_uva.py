@@ -0,0 +1,87 @@
+from sqlalchemy import text
+
+from repository import uva
+from repository.receipt_repository import ReceiptDB, ReceiptRepository, SessionLocal, UvaCacheDB
+from repository.uva import get_uva
+
+
+def _create(date: str, is_credit: bool, gross: float, net: float, vat: float, **fields) -> ReceiptDB:
+    return ReceiptRepository().create_receipt(
+        ReceiptDB(
+            date=date,
+            company_name="Hofladen UVA-Test",
+            is_credit=is_credit,
+            total_gross_amount=gross,
+            total_net_amount=net,
+            vat_amount=vat,
+            **fields,
+        )
+    )
+
+
+def _cached_periods() -> set[str]:
+    with SessionLocal() as session:
+        return {period for (period,) in session.query(UvaCacheDB.period)}
+
+
+def test_period_figures_from_tax_lines_inferred_rates_and_expenses():
+    mixed = _create(
+        "03.05.2032",
+        True,
+        113.0,
+        100.0,
+        13.0,
+        tax_summary={
+            "10": {"net_sum": 70.0, "tax_sum": 7.0, "gross_sum": 77.0},
+            "20": {"net_sum": 30.0, "tax_sum": 6.0, "gross_sum": 36.0},
+        },
+    )
+    inferred = _create("20.06.2032", True, 55.0, 50.0, 5.0)
+    expense = _create("21.06.2032", False, 24.0, 20.0, 4.0)
+
+    result = get_uva("2032-Q2")
+    assert [(line.rate, line.kennzahl, line.net_cents, line.tax_cents) for line in result.rates] == [
+        (20, "022", 3000, 600),
+        (10, "029", 12000, 1200),
+    ]
+    assert (result.turnover_cents, result.input_vat_cents) == (15000, 400)
+    assert (set(result.credit_ids), result.expense_ids) == ({mixed.id, inferred.id}, [expense.id])
+    assert get_uva("2032-05").credit_ids == [mixed.id]
+
+
+def test_cached_result_is_dropped_by_raw_sql_writes():
+    receipt = _create("10.07.2032", True, 11.0, 10.0, 1.0)
+    first = get_uva("2032-07")
+    assert get_uva("2032-07").computed_on == first.computed_on
+    get_uva("2032-08")
+    assert {"2032-07", "2032-08"} <= _cached_periods()
+
+    # A backfill moving the receipt to August, past the ORM
+    with SessionLocal() as session:
+        session.execute(
+            text("UPDATE receipts SET receipt_date = :date WHERE id = :id"),
+            {"date": "2032-08-01", "id": receipt.id},
+        )
+        session.commit()
+    assert not {"2032-07", "2032-08", "2032-Q3"} & _cached_periods()
+    assert get_uva("2032-07").credit_ids == []
+    assert get_uva("2032-08").credit_ids == [receipt.id]
+
+
+def test_result_computed_while_receipts_change_is_not_cached(monkeypatch):
+    _create("10.09.2032", True, 11.0, 10.0, 1.0)
+    compute = uva.compute_uva
+
+    def compute_during_an_edit(period):
+        result = compute(period)
+        # Saved after the computation read the period, in a month the triggers don't touch
+        _create("10.01.2033", False, 12.0, 10.0, 2.0)
+        return result
+
+    monkeypatch.setattr(uva, "compute_uva", compute_during_an_edit)
+    assert len(get_uva("2032-09").credit_ids) == 1
+    assert "2032-09" not in _cached_periods()
+
+    monkeypatch.setattr(uva, "compute_uva", compute)
+    get_uva("2032-09")
+    assert "2032-09" in _cached_periods()